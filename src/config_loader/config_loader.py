@@ -1,19 +1,111 @@
+import hashlib
+import json
+import logging
+import os
 from pathlib import Path
-from typing import Type, TypeVar
+from typing import Optional, Type, TypeVar
 
+import pydantic
 import yaml
 
 T = TypeVar("T", bound="BaseModel")
 
+logger = logging.getLogger(__name__)
+
 class ConfigLoader:
+    # 快照文件后缀（与 YAML 同目录存放；内容为 JSON，读取时不执行任何代码）
+    SNAPSHOT_SUFFIX = ".snapshot"
+
     @classmethod
-    def load_config(cls, config_path: Path, model: Type[T]) -> T:
-        """安全加载并验证配置"""
+    def load_config(cls, config_path: Path, model: Type[T], use_snapshot: bool = True) -> T:
+        """安全加载并验证配置（优先读取已校验的快照）"""
+        config_path = Path(config_path)
+        if use_snapshot:
+            cached = cls._load_snapshot(config_path, model)
+            if cached is not None:
+                return cached
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                raw_config = yaml.safe_load(f)
-                return model(**raw_config)
+            with open(config_path, "rb") as f:
+                raw_bytes = f.read()
+            raw_config = yaml.safe_load(raw_bytes.decode("utf-8"))
+            config = model(**raw_config)
         except FileNotFoundError:
             raise RuntimeError(f"配置文件不存在: {config_path}")
         except yaml.YAMLError as e:
-            raise RuntimeError(f"YAML解析失败: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"YAML解析失败: {str(e)}")
+        if use_snapshot:
+            cls._save_snapshot(config_path, model, config, raw_bytes)
+        return config
+
+    @classmethod
+    def snapshot_path(cls, config_path: Path) -> Path:
+        return config_path.with_name(config_path.name + cls.SNAPSHOT_SUFFIX)
+
+    @staticmethod
+    def _schema_key(model: Type[T]) -> str:
+        """模型结构标识：类名 + JSON Schema 哈希（含嵌套模型的字段与约束）+ pydantic 版本"""
+        schema = json.dumps(model.model_json_schema(), sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+        return f"{model.__module__}.{model.__qualname__}:{digest}:pydantic-{pydantic.VERSION}"
+
+    @classmethod
+    def _load_snapshot(cls, config_path: Path, model: Type[T]) -> Optional[T]:
+        """快照命中则直接返回已校验模型，过期或损坏返回 None"""
+        snapshot = cls.snapshot_path(config_path)
+        try:
+            stat = config_path.stat()
+            with open(snapshot, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("schema") != cls._schema_key(model):
+                    logger.debug(f"配置快照结构版本不一致: {snapshot}")
+                    return None
+                if (header.get("size"), header.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+                    # mtime 变化但内容可能未变（如 git checkout），再比对内容哈希
+                    with open(config_path, "rb") as cf:
+                        digest = hashlib.sha256(cf.read()).hexdigest()
+                    if digest != header.get("sha256"):
+                        logger.debug(f"配置快照已过期: {snapshot}")
+                        return None
+                    touched = True
+                else:
+                    touched = False
+                config = model.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"配置快照读取失败，回退到 YAML 解析: {e}")
+            return None
+        if touched:
+            cls._write_snapshot(snapshot, {**header, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, config)
+        logger.debug(f"命中配置快照: {snapshot}")
+        return config
+
+    @classmethod
+    def _save_snapshot(cls, config_path: Path, model: Type[T], config: T, raw_bytes: bytes):
+        try:
+            stat = config_path.stat()
+        except OSError:
+            return
+        header = {
+            "schema": cls._schema_key(model),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": hashlib.sha256(raw_bytes).hexdigest(),
+        }
+        cls._write_snapshot(cls.snapshot_path(config_path), header, config)
+
+    @staticmethod
+    def _write_snapshot(snapshot: Path, header: dict, config) -> None:
+        """原子写入快照：首行为头部 JSON，其余为已校验配置的 JSON（只读目录等失败情况仅记录日志）"""
+        tmp_path = snapshot.with_name(f"{snapshot.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(config.model_dump_json().encode("utf-8"))
+            os.replace(tmp_path, snapshot)
+        except Exception as e:
+            logger.debug(f"配置快照写入失败: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
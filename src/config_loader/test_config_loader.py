@@ -0,0 +1,56 @@
+# test_config_loader.py
+import json
+from typing import Dict
+
+from pydantic import BaseModel, create_model
+
+from src.config_loader import ConfigLoader
+
+
+class _Inner(BaseModel):
+    value: int = 1
+
+
+class _Config(BaseModel):
+    name: str
+    inner: _Inner
+    extra: Dict[str, int] = {}
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "config.yaml"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_snapshot_is_json_and_round_trips(tmp_path):
+    path = _write(tmp_path, "name: a\ninner: {value: 3}\nextra: {x: 1}\n")
+    first = ConfigLoader.load_config(path, _Config)
+    snapshot = ConfigLoader.snapshot_path(path)
+    header, body = snapshot.read_bytes().split(b"\n", 1)
+    assert json.loads(header)["schema"].startswith(f"{_Config.__module__}._Config:")
+    assert json.loads(body) == first.model_dump(mode="json")
+    assert ConfigLoader.load_config(path, _Config) == first
+
+
+def test_snapshot_invalidated_by_nested_schema_change(tmp_path):
+    path = _write(tmp_path, "name: a\ninner: {value: 3}\n")
+    ConfigLoader.load_config(path, _Config)
+
+    # 同名模型只改嵌套字段：旧快照的结构标识不再匹配
+    inner = create_model("_Inner", value=(int, 1), added=(str, "new"))
+    changed = create_model("_Config", __module__=_Config.__module__, name=(str, ...), inner=(inner, ...),
+                           extra=(Dict[str, int], {}))
+    assert changed.__qualname__ == _Config.__qualname__
+
+    assert ConfigLoader._load_snapshot(path, changed) is None
+    assert ConfigLoader.load_config(path, changed).inner.added == "new"
+
+
+def test_edited_yaml_and_corrupt_snapshot_fall_back(tmp_path):
+    path = _write(tmp_path, "name: a\ninner: {value: 3}\n")
+    ConfigLoader.load_config(path, _Config)
+    path.write_text("name: b\ninner: {value: 4}\n", encoding="utf-8")
+    assert ConfigLoader.load_config(path, _Config).name == "b"
+    ConfigLoader.snapshot_path(path).write_bytes(b"not json\n\x80\x04garbage")
+    assert ConfigLoader.load_config(path, _Config).inner.value == 4
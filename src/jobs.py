@@ -0,0 +1,70 @@
+"""
+调度任务命令行（通过本地水印服务 python -m src.serve 提交与查询）
+
+    python -m src.jobs submit normal D:/照片/客户A D:/输出/客户A --priority 10 --param opacity=60
+    python -m src.jobs status [编号]
+    python -m src.jobs cancel 编号
+"""
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+
+
+def _request(url: str, method: str = "GET", payload: dict = None) -> dict:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        sys.exit(f"请求失败 ({e.code}): {json.loads(e.read()).get('error')}")
+    except urllib.error.URLError as e:
+        sys.exit(f"无法连接水印服务 {url}: {e.reason}")
+
+
+def _print_job(job: dict):
+    eta = f" | 预计剩余 {job['eta']:.0f}s" if job.get('eta') is not None else ""
+    error = f" | {job['error']}" if job.get('error') else ""
+    print(f"#{job['id']} {job['name']} [{job['wm_type']}] 优先级 {job['priority']} | {job['state']} | "
+          f"进度 {job['succeeded'] + job['failed']}/{job['total']} ({job['progress']:.0%}) | 失败 {job['failed']} | "
+          f"耗时 {job['elapsed']:.1f}s{eta}{error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水印调度任务")
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="水印服务地址")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit = commands.add_parser("submit", help="提交任务")
+    submit.add_argument("type", help="水印类型")
+    submit.add_argument("input", help="输入目录（须在服务的 path_root 内）")
+    submit.add_argument("output", help="输出目录（须在服务的 path_root 内）")
+    submit.add_argument("--priority", type=int, default=0, help="优先级，越大越先执行（加急任务设为正数）")
+    submit.add_argument("--name", help="任务名称（默认输入目录名）")
+    submit.add_argument("--param", action="append", default=[], metavar="KEY=VALUE", help="图像参数（透明度、输出高度、质量等），可重复")
+    status = commands.add_parser("status", help="查询任务状态")
+    status.add_argument("id", nargs="?", help="任务编号（省略时列出全部任务）")
+    cancel = commands.add_parser("cancel", help="取消任务")
+    cancel.add_argument("id", help="任务编号")
+    args = parser.parse_args()
+
+    base = args.url.rstrip('/')
+    if args.command == "submit":
+        params = dict(item.split("=", 1) for item in args.param)
+        _print_job(_request(f"{base}/jobs", "POST", {
+            'type': args.type, 'input': args.input, 'output': args.output,
+            'priority': args.priority, 'name': args.name, 'params': params,
+        }))
+    elif args.command == "status":
+        if args.id:
+            _print_job(_request(f"{base}/jobs/{args.id}"))
+        else:
+            for job in _request(f"{base}/jobs")['jobs']:
+                _print_job(job)
+    else:
+        _print_job(_request(f"{base}/jobs/{args.id}", "DELETE"))
+
+
+if __name__ == "__main__":
+    main()
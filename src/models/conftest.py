@@ -0,0 +1,69 @@
+# conftest.py
+"""处理器测试公用夹具：小尺寸水印、临时状态目录与合成输入图片"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+from PIL import Image
+
+from src.models.interfaces.impl.foggy_processor import FoggyWatermarkProcessor
+from src.models.interfaces.impl.normal_processor import NormalWatermarkProcessor
+from src.models.pipeline.arena import STATS as ARENA_STATS, set_resident_limit
+
+_CONFIG = Path(__file__).resolve().parent.parent / "config.yaml"
+_PROCESSORS = {'normal': NormalWatermarkProcessor, 'foggy': FoggyWatermarkProcessor}
+# 测试输出高度：足够小以保证速度，又大于文件内条带并行的最小行数
+OUTPUT_HEIGHT = 160
+
+
+def write_image(path: Path, size=(240, 180), mode="RGB", seed=0, fmt=None) -> Path:
+    """写出一张带噪声的测试图片（噪声保证编码大小随质量变化）"""
+    rng = np.random.default_rng(seed)
+    channels = len(mode)
+    pixels = rng.integers(0, 256, (size[1], size[0], channels), dtype=np.uint8)
+    image = Image.fromarray(pixels if channels > 1 else pixels[..., 0], mode)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image.save(path, fmt)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def arena_limit():
+    """批处理按内存预算改写进程级的缓冲区常驻上限，测试结束后恢复"""
+    previous = ARENA_STATS.limit
+    yield
+    set_resident_limit(previous)
+
+
+@pytest.fixture
+def watermark_npy(tmp_path) -> Path:
+    rng = np.random.default_rng(42)
+    data = rng.integers(0, 256, (OUTPUT_HEIGHT * 2, OUTPUT_HEIGHT * 2, 4), dtype=np.uint8)
+    path = tmp_path / "watermark.npy"
+    np.save(path, data)
+    return path
+
+
+@pytest.fixture
+def make_processor(tmp_path, watermark_npy):
+    """按 src/config.yaml 的类型配置创建处理器；状态目录放在临时目录，关键字覆盖类型配置"""
+    with open(_CONFIG, encoding="utf-8") as f:
+        types = yaml.safe_load(f)['model_params']['watermark_types']
+    created = []
+
+    def make(wm_type: str = 'normal', **overrides):
+        config = dict(types[wm_type], npy_path=str(watermark_npy))
+        config['params'] = {name: dict(spec) for name, spec in config['params'].items()}
+        config['params']['output_height']['default'] = OUTPUT_HEIGHT
+        config.update(output_height=OUTPUT_HEIGHT, composite_backend='pillow-native',
+                      tuning_state_path=str(tmp_path / "state" / "worker_tuning.json"),
+                      base_cache_dir=str(tmp_path / "state" / "base_cache"))
+        config.update(overrides)
+        processor = _PROCESSORS[wm_type](config, str(watermark_npy))
+        created.append(processor)
+        return processor
+
+    yield make
+    for processor in created:
+        processor.shutdown_executor()
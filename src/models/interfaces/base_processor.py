@@ -1,17 +1,125 @@
+import asyncio
+import io
 import logging
 import os
 import sys
+import tempfile
 import time
 import queue
 import threading
 from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Tuple, Iterable, runtime_checkable, Protocol, TypeVar, Generic
-from concurrent.futures import ThreadPoolExecutor
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple, Iterable, runtime_checkable, Protocol, TypeVar, Generic
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import partial
 
+import numpy as np
+from PIL import Image
 from pydantic import ValidationError, BaseModel
 
+from ..pipeline.arena import ArenaUsage, track_usage
+from ..pipeline.archive import OutputNamer, archive_kind, is_archive_input, open_sink, open_source
+from ..pipeline.base_cache import BaseImageCache, content_hash
+from ..pipeline.backends import (
+    AUTO, OVERLAY, PreparedWatermarkCache, benchmark_timings, fastest_backend, get_backend, prepare_watermark
+)
+from ..pipeline.modes import GRAY_MODES, has_transparency, is_gray_watermark, is_jpeg_output, to_mode, working_mode
+from ..pipeline.autotune import AdaptiveConcurrencyController, ConcurrencyGate, WorkerTuningStore
+from ..pipeline.dedup import DedupResult, dedupe_tasks, link_or_copy, task_digest
+from ..pipeline.encoders import (
+    JPEG, LEGACY_PROFILE, PNG, PNG_CANDIDATES, EncoderProfile, benchmark_profiles, format_benchmark, format_extension,
+    load_profiles, output_format, resolve_profile
+)
+from ..pipeline.governor import default_memory_budget, estimate_working_set, split_memory_budget
+from ..pipeline.planner import StagePlan, plan_stages
+from ..pipeline.sizefit import TargetSizeEncoder
+from ..pipeline.parallel import INTRA_MIN_PIXELS, band_map, choose_intra_parallelism, split_rows
+from ..pipeline.prescan import prescan_tasks, schedule_lpt
+from ..pipeline.results import DUPLICATE, FAILED, OK, FileResult
+from ..pipeline.scanner import BatchTask, OutputDirCache, ParallelDirScanner, TaskGroup
+from ..pipeline.streaming import (allow_large_images, draft_for_output, iter_bands, resize_band, should_stream,
+                                  with_context)
+
+
+# 数组输出保留 alpha：按 PNG 输出决定合成工作模式
+_ARRAY_OUTPUT = Path("array.png")
+
+
+def _describe(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _merge_schedule_stats(total: dict, chunk: dict) -> None:
+    """分块的调度统计累加到整个批次（各块依次执行，预测成本与完工时间相加）"""
+    for key in ('total_cost', 'makespan_scan_order', 'makespan_lpt', 'groups', 'grouped_files'):
+        total[key] = total.get(key, 0) + chunk.get(key, 0)
+    for key in ('workers', 'intra_parallelism'):
+        total[key] = max(total.get(key, 1), chunk.get(key, 1))
+
+
+@dataclass
+class _BatchPlan:
+    """批处理计划：扫描得到的任务、调度单元与线程池配置"""
+    tasks: List[BatchTask]
+    units: List
+    pool_size: int
+    tuning_key: Optional[str]
+    started: float
+    # 累计提交处理单元的耗时
+    submit_time: float = 0.0
+
+    def run(self, executor, run_unit: Callable[[object], List[FileResult]], limit: int, primaries: set,
+            succeeded: set, logger: logging.Logger) -> Iterator[FileResult]:
+        """
+        在线程池中执行全部处理单元，按完成顺序产出各文件的结果记录
+
+        在途单元不超过 limit；成功的去重首个任务计入 succeeded；单元抛出异常时其中的文件记为失败。
+        提前结束迭代时取消尚未开始的单元（已开始的单元在后台处理完）
+        """
+        pending, units = {}, iter(self.units)
+        try:
+            while True:
+                submit_start = time.perf_counter()
+                for unit in units:
+                    pending[executor.submit(run_unit, unit)] = unit
+                    if len(pending) >= limit:
+                        break
+                self.submit_time += time.perf_counter() - submit_start
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = pending.pop(future)
+                    try:
+                        records = future.result()
+                    except Exception as e:
+                        logger.error(f"任务失败: {e}", exc_info=True)
+                        tasks = getattr(unit, 'tasks', [unit])
+                        records = [FileResult(FAILED, task.input_path, task.output_path, error=_describe(e))
+                                   for task in tasks]
+                    for record in records:
+                        if record.ok and record.output_path in primaries:
+                            succeeded.add(record.output_path)
+                        yield record
+        finally:
+            cancelled = sum(future.cancel() for future in pending)
+            if cancelled:
+                logger.warning(f"批处理提前结束 | 取消未开始的处理单元: {cancelled}")
+
 
 # 线程安全的日志系统
 class LogSystem:
@@ -84,6 +192,15 @@ class ProcessorParams(BaseModel):
     output_height: int = 1000
     quality: int = 30
     enhancement: bool = True
+    memory_budget_mb: int = 0  # 在途像素内存预算，0 表示自动（物理内存的一半）
+    adaptive_workers: bool = True  # 运行中根据吞吐量自动调整并发数
+    stream_threshold_mp: int = 64  # 超过该像素数（百万）的输入走条带流式处理，0 表示关闭
+    max_image_mp: int = 2000  # 允许打开的最大像素数（百万），替代 Pillow 默认的解压炸弹上限
+    composite_backend: str = AUTO  # 合成后端：auto 按本机基准测试选最快，或 pillow-native/numpy-float/numpy-fixed
+    dedup_inputs: bool = True  # 内容相同的输入只处理一次，其余输出以硬链接/复制生成
+    base_cache_mb: int = 0  # 降质底图磁盘缓存上限（MB），>0 时只改透明度/增强重跑跳过解码缩放降质，0 表示关闭
+    output_profile: str = LEGACY_PROFILE  # 输出编码档位（config 中 encoder_profiles 的名称或内置档位）
+    target_size_kb: int = 0  # 输出文件大小上限（KB），>0 时有损输出取不超限的最高质量、PNG 依次尝试调色板量化，0 表示关闭
     output_dir: Path
 
 # 泛型参数约束
@@ -93,15 +210,66 @@ class BaseWatermarkProcessor(Generic[T]):
     """优化后的多线程水印处理器（日志增强版）"""
 
     _SUPPORTED_EXT = {'.jpg', '.jpeg', '.png'}
+    # 处理器级调优项：可直接写在 model_params 的水印类型配置下
+    _TUNING_KEYS = ('memory_budget_mb', 'adaptive_workers', 'stream_threshold_mp', 'max_image_mp',
+                    'composite_backend', 'base_cache_mb', 'dedup_inputs', 'output_profile',
+                    'target_size_kb')
+    # 水印类型标识（用于按类型记录调优结果）
+    watermark_type = None
+    # 批量向量化合成时每组最多图像数
+    _GROUP_MAX = 8
 
     def __init__(self, config):
         self._config = config
         self._timings = defaultdict(float)
         self._task_stats = defaultdict(_default_stats)
+        self._schedule_stats = {}
+        self._memory_stats = {}
+        self._autotune_stats = {}
+        self._arena_stats = {}
+        # 本批次的临时缓冲区命中计数（仅累加处理本批次文件的线程，调度器中并发的其他任务不计入）
+        self._arena_usage = ArenaUsage()
+        self._backend_stats = {}
+        # 源图模式 → 合成工作模式 的文件计数
+        self._mode_stats = defaultdict(int)
+        # 阶段规划统计：(阶段, 是否执行) → 文件数
+        self._plan_stats = defaultdict(int)
+        self._base_cache_stats = {}
+        self._dedup = DedupResult(unique=[])
+        self._dedup_stats = {}
+        self._encode_stats = {}
+        self._archive_stats = {}
+        # 批次统计计数由多个工作线程（服务模式下还有请求线程）并发累加，更新时加锁
+        self._stats_lock = threading.Lock()
+        self._size_fitter = None
+        # 输出子目录在写出文件时才创建（失败的文件不留下空目录）
+        self._output_dirs = OutputDirCache()
+        # 当前线程正在处理的文件的结果记录（阶段耗时、写出字节数、错误）
+        self._trace = threading.local()
+        # 异步接口的常驻线程池（首次使用时创建）
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # 内存接口按大小上限复用的编码器
+        self._memory_fitters = {}
+        self._memory_lock = threading.Lock()
+        self._gray_watermark = None
+        self._autotuner = None
+        # 按尺寸/透明度预处理好的水印，同尺寸图像间复用
+        self._watermark_cache = PreparedWatermarkCache()
+        # 文件内条带并行度（由批处理调度根据任务数与图像尺寸决定）
+        self._intra_parallelism = 1
+        self._tuning_store = WorkerTuningStore(config.get('tuning_state_path'))
         self._log_system = LogSystem()
         self._log_queue = self._log_system.log_queue
         self._init_logger()
         self.default_params = self._parse_config(config)
+        # 当前批次的流水线参数（process_single 单独调用时使用默认值）
+        self._pipeline_params = ProcessorParams(**self.default_params, output_dir=Path("output"))
+        self._base_cache = BaseImageCache(
+            config.get('base_cache_dir'), self._pipeline_params.base_cache_mb * 1024 * 1024
+        )
+        self._encoder_profiles = load_profiles(config.get('encoder_profiles'))
+        self._encoder = resolve_profile(self._encoder_profiles, self._pipeline_params.output_profile)
 
     def get_resource_path(self, filename):
         """获取资源文件的绝对路径"""
@@ -127,6 +295,7 @@ class BaseWatermarkProcessor(Generic[T]):
         """打印详细的耗时统计"""
         print("\n======== 性能分析报告 ========")
         print(f"[线程池初始化] {self._timings['pool_init']:.2f}s")
+        print(f"[文件头预扫描] {self._timings['prescan']:.2f}s")
         print(f"[任务分发] {self._timings['task_distribute']:.2f}s")
         print(f"[结果收集] {self._timings['result_collect']:.2f}s")
         print(f"[总耗时] {self._timings['total']:.2f}s\n")
@@ -136,107 +305,827 @@ class BaseWatermarkProcessor(Generic[T]):
             avg = stat['total'] / stat['count'] if stat['count'] else 0
             print(f"{task_type}: 平均{avg:.2f}s | 总数{stat['total']:.2f}s | 次数{stat['count']}")
 
+        if self._schedule_stats:
+            sched = self._schedule_stats
+            before, after = sched['makespan_scan_order'], sched['makespan_lpt']
+            gain = round(1 - after / before, 4) + 0.0 if before else 0.0
+            print("\n=== 调度统计（LPT 最大任务优先） ===")
+            print(f"预测总成本: {sched['total_cost']:.1f} MP | 工作线程: {sched['workers']}")
+            print(f"预测完工时间: 扫描顺序 {before:.1f} → LPT {after:.1f} (缩短 {gain:.1%})")
+            intra = sched.get('intra_parallelism', 1)
+            print(f"并行策略: {'文件内条带并行 x' + str(intra) if intra > 1 else '文件间并行'}")
+            if sched.get('groups'):
+                print(f"批量合成: {sched['groups']} 组 | 覆盖文件: {sched['grouped_files']} 个")
+
+        if self._memory_stats:
+            mem = self._memory_stats
+            print("\n=== 内存预算 ===")
+            print(f"预算: {mem['budget_mb']:.0f}MB | 峰值预留: {mem['peak_mb']:.0f}MB | "
+                  f"等待次数: {mem['waits']} | 等待总时长: {mem['wait_time']:.2f}s")
+
+        if self._autotune_stats:
+            tune = self._autotune_stats
+            print("\n=== 自适应并发 ===")
+            print(f"并发数: 初始 {tune['initial']} → 结束 {tune['final']} | 调整次数: {tune['adjustments']}")
+            print(f"最佳并发: {tune['best_workers']} ({tune['best_throughput']:.2f} 文件/s) | "
+                  f"CPU利用率: {tune['cpu_utilization']:.0%}")
+
+        if self._arena_stats.get('hits') or self._arena_stats.get('misses'):
+            arena = self._arena_stats
+            print("\n=== 临时缓冲区复用 ===")
+            print(f"命中率: {arena['hit_rate']:.1%} (命中 {arena['hits']} / 分配 {arena['misses']}) | "
+                  f"常驻: {arena['resident_mb']:.0f}MB | 峰值常驻: {arena['peak_resident_mb']:.0f}MB | "
+                  f"常驻上限（全部线程）: {arena['limit_mb']:.0f}MB")
+
+        if self._plan_stats:
+            plan = self._plan_stats
+            print("\n=== 阶段规划 ===")
+            print(" | ".join(
+                f"{name}: 执行 {plan[(stage, True)]} / 跳过 {plan[(stage, False)]}"
+                for stage, name in (('resize', '缩放'), ('degrade', '降质'), ('convert', '模式转换'))
+            ))
+
+        if self._dedup_stats:
+            dedup = self._dedup_stats
+            print("\n=== 重复输入去重 ===")
+            print(f"重复文件: {dedup['duplicates']} 个 (免处理输入 {dedup['saved_mb']:.1f}MB) | "
+                  f"硬链接: {dedup['links']} | 复制: {dedup['copies']}")
+            print(f"部分哈希: {dedup['partial_hashed']} 个 | 完整哈希: {dedup['full_hashed']} 个 | "
+                  f"耗时: {dedup['elapsed']:.2f}s")
+
+        if self._archive_stats:
+            archive = self._archive_stats
+            print("\n=== 压缩包输入/输出 ===")
+            print(f"输入: {archive['source']} | 输出: {archive['sink']} | 成员: {archive['members']} 个 | "
+                  f"跳过: {archive['skipped']} 个")
+            print(f"读取: {archive['read_mb']:.1f}MB | 写入: {archive['written_mb']:.1f}MB | "
+                  f"在途上限: {archive['window']} 个 | 临时文件: 0")
+
+        if self._base_cache_stats:
+            cache = self._base_cache_stats
+            print("\n=== 底图缓存 ===")
+            print(f"命中率: {cache['hit_rate']:.1%} (命中 {cache['hits']} / 未命中 {cache['misses']}) | "
+                  f"写入: {cache['stores']} | 淘汰: {cache['evictions']} | 占用: {cache['size_mb']:.0f}MB")
+
+        if self._encode_stats.get('files'):
+            enc = self._encode_stats
+            print("\n=== 输出编码 ===")
+            print(f"档位: {self._encoder.name} ({self._encoder.format} q{self._encoder.quality}) | "
+                  f"文件: {enc['files']} | 总大小: {enc['bytes'] / (1024 * 1024):.1f}MB | "
+                  f"平均: {enc['bytes'] / enc['files'] / 1024:.0f}KB | 编码耗时: {enc['seconds']:.2f}s")
+            if enc['palette']:
+                print(f"PNG 无损转调色板: {enc['palette']} 个")
+            if self._size_fitter:
+                fit = self._size_fitter.stats()
+                print(f"大小上限: {fit['target_kb']:.0f}KB | 文件: {fit['files']} | 超限: {fit['over_budget']} | "
+                      f"平均质量: {fit['mean_quality']:.1f} | 平均尝试: {fit['mean_attempts']:.2f} 次"
+                      + (f" | PNG 调色板降级: {fit['palette_fallbacks']} 个" if fit['palette_fallbacks'] else ""))
+                print("尝试次数分布: " + " | ".join(f"{k} 次: {v}" for k, v in fit['attempts'].items()))
+
+        if self._mode_stats:
+            print("\n=== 合成工作模式 ===")
+            print(" | ".join(f"{key}: {count}" for key, count in sorted(self._mode_stats.items())))
+
+        if self._backend_stats:
+            backend = self._backend_stats
+            print("\n=== 合成后端 ===")
+            print(f"{'叠加' if backend['op'] == OVERLAY else '亮度增强'}: {backend['name']}"
+                  f"{' (基准测试自动选择)' if backend['auto'] else ''}")
+            if backend['timings']:
+                print("基准耗时: " + " | ".join(
+                    f"{name} {seconds * 1000:.1f}ms" for name, seconds in sorted(
+                        backend['timings'].items(), key=lambda item: item[1])
+                ))
+
     def process_batch(self, input_dir: Path, output_dir: Path, **kwargs) -> List[Path]:
+        params, final_params, archived = self._start_batch(input_dir, output_dir, kwargs)
+        plan, results, total = None, [], 0
+        task_start = time.perf_counter()
         try:
-            final_params = self._validate_params(
-                params = ProcessorParams(
-                    **{**self.default_params, **kwargs},
-                    output_dir=output_dir
-                )
+            if archived:
+                for record in self._process_archive_batch(input_dir, output_dir, final_params):
+                    total += 1
+                    if record.ok:
+                        results.append(record.output_path)
+                return results
+            plan = self._plan_batch(input_dir, output_dir, params, final_params)
+            if plan is None:
+                return []
+            total = len(plan.tasks) + self._dedup.duplicate_count
+            # 使用线程池替代进程池
+            with ThreadPoolExecutor(
+                max_workers=plan.pool_size,
+                initializer=self._init_worker
+            ) as executor:
+                # 计时开始
+                self._timings['pool_init'] = time.perf_counter() - plan.started
+                self._start_autotuner(plan)
+
+                # 任务分发与结果收集（在途单元不超过线程数的 2 倍）
+                task_start = time.perf_counter()
+                succeeded = set()
+                for record in plan.run(executor, partial(self._run_unit, params=final_params), 2 * plan.pool_size,
+                                       self._dedup_primaries(), succeeded, self._logger):
+                    if record.ok:
+                        results.append(record.output_path)
+                self._timings['task_distribute'] = plan.submit_time
+                self._timings['result_collect'] = time.perf_counter() - task_start - plan.submit_time
+                results.extend(record.output_path for record in self._finish_batch(plan, succeeded) if record.ok)
+                return results
+        finally:
+            self._summarize_batch(total, len(results), task_start)
+
+    def _start_batch(self, input_dir: Path, output_dir: Path, kwargs: dict):
+        """校验参数、选择合成后端与编码档位并重置批次统计，返回 (参数, 具体参数, 是否压缩包批处理)"""
+        try:
+            params = ProcessorParams(
+                **{**self.default_params, **kwargs},
+                output_dir=output_dir
             )
+            final_params = self._validate_params(params)
+            self._pipeline_params = params
+            composite_op = self._composite_op(final_params)
+            backend = self._composite_backend(composite_op)
+            self._encoder = resolve_profile(self._encoder_profiles, params.output_profile)
         except ValidationError as e:
             self.logger.exception(e)
             raise ValueError(f"参数校验失败: {e.errors()}")
+        self._backend_stats = {
+            'op': composite_op,
+            'name': backend.name,
+            'auto': params.composite_backend == AUTO,
+            'timings': benchmark_timings(composite_op),
+        }
         """添加批处理各阶段日志"""
         self._logger.info(f"开始批处理任务 | 输入目录: {input_dir} | 输出目录: {output_dir}")
-        output_dir.mkdir(parents=True, exist_ok=True)
+        self._logger.info(f"合成后端: {backend.name}{'（自动选择）' if self._backend_stats['auto'] else ''}")
+        self._logger.info(f"输出编码: {self._encoder.name} ({self._encoder.format} q{self._encoder.quality})")
+        archived = is_archive_input(input_dir) or archive_kind(output_dir) is not None
+        if not archived:
+            output_dir.mkdir(parents=True, exist_ok=True)
+        allow_large_images(params.max_image_mp * 1_000_000)
+        # 子目录在写出输出文件时才创建
+        self._output_dirs = OutputDirCache()
+        self._output_dirs.add(output_dir)
+        self._arena_usage = ArenaUsage()
+        self._mode_stats.clear()
+        self._plan_stats.clear()
+        self._base_cache.max_bytes = params.base_cache_mb * 1024 * 1024
+        self._base_cache.reset_stats()
+        self._encode_stats = {'files': 0, 'bytes': 0, 'seconds': 0.0, 'palette': 0}
+        self._size_fitter = TargetSizeEncoder(params.target_size_kb * 1024) if params.target_size_kb > 0 else None
+        if self._size_fitter and not self._encoder.extension:
+            self._logger.warning(
+                f"PNG 输出没有质量参数：大小上限 {params.target_size_kb}KB 只能依次尝试调色板量化与最高压缩级别，"
+                f"仍超限的文件照常写出并计为超限（需严格限制大小时请使用 webp/avif 档位）"
+            )
+        self._dedup = DedupResult(unique=[])
+        self._dedup_stats = {}
+        self._archive_stats = {}
+        return params, final_params, archived
+
+    def _start_incremental(self, input_dir: Path, output_dir: Path, kwargs: dict) -> Tuple[ProcessorParams, T]:
+        """常驻增量处理（监视模式）：批次初始化只做一次，之后零散到达的文件逐个经 _process_wrapper 处理"""
+        params, final_params, archived = self._start_batch(input_dir, output_dir, kwargs)
+        if archived:
+            raise ValueError("监视模式不支持压缩包输入/输出")
+        self._concurrency_gate = ConcurrencyGate(os.cpu_count() or 4)
+        self._memory_budget = split_memory_budget(params.memory_budget_mb * 1024 * 1024 or default_memory_budget())
+        self._intra_parallelism = 1
+        return params, final_params
+
+    def _plan_batch(self, input_dir: Path, output_dir: Path, params: ProcessorParams,
+                    final_params: T, tasks: List[BatchTask] = None) -> Optional[_BatchPlan]:
+        """扫描生成任务（或使用给定的一块任务）、预扫描调度并划分处理单元（无可处理文件时返回 None）"""
+        # 生成任务阶段日志
+        task_start = time.perf_counter()
+        if tasks is None:
+            tasks = list(self._generate_tasks(input_dir, output_dir))
+        if not tasks:
+            self._logger.warning("未发现可处理文件")
+            return None
+        gen_time = time.perf_counter() - task_start
+        self._logger.info(
+            f"扫描到 {len(tasks)} 个待处理文件 | "
+            f"耗时: {gen_time:.2f}s | "
+            f"跳过文件: {self._scan_skipped} 个"
+        )
+        # 线程池配置日志
+        cpu_count = os.cpu_count() or 4
+        max_workers = pool_size = min(cpu_count, len(tasks))
+        tuning_key = None
+        if params.adaptive_workers and len(tasks) > 1:
+            # 线程池预留到 2 倍核数，实际活跃数由闸门按吞吐量调节
+            pool_size = min(cpu_count * 2, len(tasks))
+            tuning_key = self._tuning_store.key(
+                self.watermark_type or type(self).__name__, input_dir, params.enhancement, self._backend_stats['name']
+            )
+            remembered = self._tuning_store.get(tuning_key)
+            if remembered:
+                # 记录值只作为起点：调节上限仍是线程池大小，本次可继续向上探索
+                max_workers = min(remembered, pool_size)
+        self._concurrency_gate = ConcurrencyGate(max_workers)
 
+        # 文件头预扫描 + 最大任务优先调度
+        prescan_start = time.perf_counter()
+        prescan_tasks(tasks, params.output_height)
+        self._schedule_stats = schedule_lpt(tasks, max_workers)
+        self._schedule_stats['workers'] = max_workers
+        max_output_pixels = max(
+            int(t.width * params.output_height / t.height) * params.output_height if t.height else 0
+            for t in tasks
+        )
+        self._intra_parallelism = choose_intra_parallelism(len(tasks), max_output_pixels)
+        self._schedule_stats['intra_parallelism'] = self._intra_parallelism
+        for task in tasks:
+            task.mem_bytes = estimate_working_set(
+                task, params.output_height, params.enhancement, params.stream_threshold_mp * 1_000_000
+            )
+        units = self._plan_units(tasks, params, final_params, pool_size)
+        budget_bytes = params.memory_budget_mb * 1024 * 1024 or default_memory_budget()
+        self._memory_budget = split_memory_budget(budget_bytes)
+        self._timings['prescan'] = time.perf_counter() - prescan_start
+        self._logger.info(
+            f"预扫描完成 | 耗时: {self._timings['prescan']:.2f}s | "
+            f"预测完工时间: {self._schedule_stats['makespan_scan_order']:.1f} → "
+            f"{self._schedule_stats['makespan_lpt']:.1f} MP"
+        )
+        self._logger.info(
+            f"初始化线程池 | 最大工作线程: {pool_size} | "
+            f"总任务数: {len(tasks)} | "
+            f"预计并发度: {max_workers}"
+        )
+        return _BatchPlan(tasks, units, pool_size, tuning_key, task_start)
+
+    def _start_autotuner(self, plan: _BatchPlan):
+        if plan.tuning_key:
+            self._autotuner = AdaptiveConcurrencyController(
+                self._concurrency_gate, 1, plan.pool_size, logger=self._logger
+            )
+            self._autotuner.start()
+
+    def _run_unit(self, unit, params: T) -> List[FileResult]:
+        """处理单个调度单元（单文件或批量合成组），返回各文件的结果记录"""
+        with track_usage(self._arena_usage), self._batch_work():
+            if isinstance(unit, TaskGroup):
+                return self._process_group_wrapper(unit, params)
+            return [self._process_wrapper(unit, params)]
+
+    def _finish_batch(self, plan: _BatchPlan, succeeded: set) -> List[FileResult]:
+        """生成重复输入的输出、汇总内存/缓存/并发统计并保存调优结果，返回重复输入的结果记录"""
+        duplicates = self._materialize_duplicates(succeeded)
+        self._memory_stats = self._memory_budget.stats()
+        self._arena_stats = self._arena_usage.snapshot()
+        self._base_cache_stats = self._base_cache.stats() if self._base_cache.enabled else {}
+        self._stop_autotuner(plan)
+        return duplicates
+
+    def _stop_autotuner(self, plan: _BatchPlan):
+        if self._autotuner:
+            self._autotuner.stop()
+            self._autotune_stats = self._autotuner.stats()
+            if self._autotuner.best_throughput > 0:
+                self._tuning_store.put(
+                    plan.tuning_key, self._autotuner.best_workers, self._autotuner.best_throughput
+                )
+            self._autotuner = None
+
+    def _summarize_batch(self, total: int, succeeded: int, task_start: float):
+        # 添加任务总结日志（重复输入按各自的输出计入）
+        success_rate = succeeded / total if total else 0
+        self._logger.info(
+            f"任务完成总结 | 成功率: {success_rate:.1%} | "
+            f"成功: {succeeded} | 失败: {total - succeeded}"
+        )
+        self._timings['total'] = time.perf_counter() - task_start
+        self._print_stats()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """异步接口使用的常驻线程池（首次使用时创建，线程数为核数的 2 倍，实际并发由调用方限制）"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=(os.cpu_count() or 4) * 2, thread_name_prefix=f"{type(self).__name__}-async",
+                    initializer=self._init_worker
+                )
+            return self._executor
+
+    def shutdown_executor(self, wait: bool = True):
+        """关闭异步接口的常驻线程池（之后再次使用会重新创建）"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def process_single_async(self, input_path: Path, output_path: Path, params: dict = None) -> bool:
+        """
+        异步处理单个文件（在处理器的常驻线程池中运行），返回是否成功
+
+        params 覆盖该类型的默认参数；等待中被取消时尚未开始的任务不再执行，已开始的文件在后台处理完
+        """
+        _, final_params = self._single_params(params)
+        output_path = Path(output_path)
+        loop = asyncio.get_running_loop()
+
+        def run() -> bool:
+            return self.process_single(Path(input_path), output_path, final_params) is not False
+
+        return await loop.run_in_executor(self.executor, run)
+
+    async def process_batch_async(self, input_dir: Path, output_dir: Path, max_concurrency: int = None,
+                                  **kwargs) -> AsyncIterator[FileResult]:
+        """
+        异步批处理：按完成顺序逐个产出每个文件的结果记录（成功与失败都产出）
+
+        扫描、预扫描与各处理单元都在处理器的常驻线程池中运行，事件循环不被阻塞；
+        同时在途的处理单元不超过 max_concurrency（默认同 process_batch 的线程数）。
+        迭代被取消或提前结束（建议配合 contextlib.aclosing）时，尚未开始的单元不再执行，
+        已开始的文件在后台处理完但不再产出。压缩包输入/输出整体在线程池中处理完后再逐个产出
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        params, final_params, archived = await loop.run_in_executor(
+            executor, self._start_batch, input_dir, output_dir, kwargs
+        )
+        plan, counts, succeeded, records = None, Counter(), set(), None
+        # 处理单元的提交与等待在单独的线程中进行，事件循环只等待下一条结果
+        driver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="BatchDriver")
+        step = None
+        task_start = time.perf_counter()
         try:
-            # 生成任务阶段日志
+            if archived:
+                for record in await loop.run_in_executor(
+                        executor, lambda: list(self._process_archive_batch(input_dir, output_dir, final_params))):
+                    counts[record.ok] += 1
+                    yield record
+                return
+            plan = await loop.run_in_executor(executor, self._plan_batch, input_dir, output_dir, params, final_params)
+            if plan is None:
+                return
+            primaries = self._dedup_primaries()
+            limit = max(1, max_concurrency or plan.pool_size)
+            self._timings['pool_init'] = time.perf_counter() - plan.started
+            self._start_autotuner(plan)
             task_start = time.perf_counter()
-            tasks = list(self._generate_tasks(input_dir, output_dir))
-            if not tasks:
+            records = plan.run(executor, partial(self._run_unit, params=final_params), limit, primaries, succeeded,
+                               self._logger)
+            while True:
+                step = driver.submit(next, records, None)
+                record = await asyncio.wrap_future(step)
+                if record is None:
+                    break
+                counts[record.ok] += 1
+                yield record
+            for record in await loop.run_in_executor(executor, self._finish_batch, plan, succeeded):
+                counts[record.ok] += 1
+                yield record
+        finally:
+            if records is not None:
+                # 生成器可能仍在驱动线程中等待结果：等这一步返回后再关闭（取消尚未开始的单元）
+                step.add_done_callback(lambda _: records.close())
+            driver.shutdown(wait=False)
+            if plan:
+                self._stop_autotuner(plan)
+            self._summarize_batch(sum(counts.values()), counts[True], task_start)
+
+    def process_iter(self, input_dir: Path, output_dir: Path, chunk_size: int = 4096,
+                     **kwargs) -> Iterator[FileResult]:
+        """
+        批处理生成器：按完成顺序逐个产出每个文件的结果记录（状态、输入输出、各阶段耗时、写出字节数、错误）
+
+        不保留结果列表；任务按 chunk_size 分块预扫描调度，在途处理单元不超过线程数的 2 倍，
+        内存占用与文件总数无关（开启去重或 webp/avif 改名时扫描阶段仍需完整任务列表）。
+        提前结束迭代时尚未开始的单元不再执行
+        """
+        params, final_params, archived = self._start_batch(input_dir, output_dir, kwargs)
+        first, counts, succeeded, executor = None, Counter(), set(), None
+        task_start = time.perf_counter()
+        try:
+            if archived:
+                for record in self._process_archive_batch(input_dir, output_dir, final_params):
+                    counts[record.ok] += 1
+                    yield record
+                return
+            primaries = None
+            for chunk in _chunks(self._generate_tasks(input_dir, output_dir), chunk_size):
+                plan = self._plan_batch(input_dir, output_dir, params, final_params, chunk)
+                if first is None:
+                    # 去重在首次取任务时已对完整列表完成；线程池、并发闸门、内存预算与自适应并发按首块计划建立，
+                    # 之后各块共用，统计覆盖整个批次
+                    first, primaries = plan, self._dedup_primaries()
+                    gate, budget, schedule = self._concurrency_gate, self._memory_budget, self._schedule_stats
+                    prescan = self._timings['prescan']
+                    executor = ThreadPoolExecutor(max_workers=plan.pool_size, initializer=self._init_worker)
+                    self._timings['pool_init'] = time.perf_counter() - plan.started
+                    self._start_autotuner(plan)
+                else:
+                    self._concurrency_gate, self._memory_budget = gate, budget
+                    prescan += self._timings['prescan']
+                    self._timings['prescan'] = prescan
+                    _merge_schedule_stats(schedule, self._schedule_stats)
+                    self._schedule_stats = schedule
+                for record in plan.run(executor, partial(self._run_unit, params=final_params), 2 * first.pool_size,
+                                       primaries, succeeded, self._logger):
+                    counts[record.ok] += 1
+                    yield record
+            if first is None:
                 self._logger.warning("未发现可处理文件")
-                return []
-            gen_time = time.perf_counter() - task_start
+                return
+            for record in self._finish_batch(first, succeeded):
+                counts[record.ok] += 1
+                yield record
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if first:
+                self._stop_autotuner(first)
+            self._summarize_batch(sum(counts.values()), counts[True], task_start)
+
+    def _dedup_primaries(self) -> set:
+        """有重复输入的首个任务的输出路径（生成重复输出只需知道这些任务是否成功）"""
+        return {primary.output_path for primary, _ in self._dedup.duplicates}
+
+    def _generate_tasks(self, input_dir: Path, output_dir: Path) -> Iterable[BatchTask]:
+        """并发递归生成文件处理任务（输出目录延迟到写入时创建）"""
+        scanner = ParallelDirScanner(self._SUPPORTED_EXT, logger=self._logger)
+        self._scan_skipped = 0
+        # webp/avif 档位改写输出扩展名，需完整任务列表处理撞名
+        if not self._pipeline_params.dedup_inputs and not self._encoder.extension:
+            yield from scanner.scan(input_dir, output_dir)
+            self._scan_skipped = scanner.skipped
+            return
+        # 按路径排序：并发扫描的完成顺序不固定，排序后去重选出的首个任务与撞名改写结果在多次运行间一致
+        tasks = sorted(scanner.scan(input_dir, output_dir), key=lambda task: task.input_path)
+        self._scan_skipped = scanner.skipped
+        for task, output_path in zip(tasks, self._encoder.output_paths([task.output_path for task in tasks])):
+            task.output_path = output_path
+        if not self._pipeline_params.dedup_inputs:
+            yield from tasks
+            return
+        # 去重：先按大小分组，再比较部分/完整内容哈希
+        dedup_start = time.perf_counter()
+        self._dedup = dedupe_tasks(tasks)
+        if self._dedup.duplicates:
+            self._dedup_stats = {
+                'duplicates': self._dedup.duplicate_count,
+                'saved_mb': self._dedup.saved_bytes / (1024 * 1024),
+                'partial_hashed': self._dedup.partial_hashed,
+                'full_hashed': self._dedup.full_hashed,
+                'elapsed': time.perf_counter() - dedup_start,
+                'links': 0,
+                'copies': 0,
+            }
             self._logger.info(
-                f"扫描到 {len(tasks)} 个待处理文件 | "
-                f"耗时: {gen_time:.2f}s | "
-                f"跳过文件: {self._scan_skipped} 个"
+                f"输入去重 | 重复文件: {self._dedup.duplicate_count} 个 | "
+                f"涉及内容: {len(self._dedup.duplicates)} 份 | 耗时: {self._dedup_stats['elapsed']:.2f}s"
             )
-            # 线程池配置日志
-            max_workers = min(os.cpu_count() or 4, len(tasks))
-            self._logger.info(
-                f"初始化线程池 | 最大工作线程: {max_workers} | "
-                f"总任务数: {len(tasks)} | "
-                f"预计并发度: {min(max_workers, len(tasks))}"
+        yield from self._dedup.unique
+
+    def _materialize_duplicates(self, succeeded: set) -> List[FileResult]:
+        """为重复输入生成输出：链接/复制其首个任务的输出（首个任务失败时不生成，记为失败）"""
+        produced = []
+        for primary, copies in self._dedup.duplicates:
+            for task in copies:
+                if primary.output_path not in succeeded:
+                    produced.append(FileResult(FAILED, task.input_path, task.output_path,
+                                               error=f"内容相同的输入处理失败: {primary.input_path}"))
+                    continue
+                start_time = time.perf_counter()
+                try:
+                    self._output_dirs.ensure(task.output_path.parent)
+                    linked = link_or_copy(primary.output_path, task.output_path)
+                    self._dedup_stats['links' if linked else 'copies'] += 1
+                    produced.append(FileResult(DUPLICATE, task.input_path, task.output_path,
+                                               {'total': time.perf_counter() - start_time},
+                                               0 if linked else os.path.getsize(task.output_path)))
+                except OSError as e:
+                    self._logger.error(f"重复输入输出失败 | 文件: {task.input_path} | 详情: {e}")
+                    produced.append(FileResult(FAILED, task.input_path, task.output_path, error=_describe(e)))
+        return produced
+
+    def _process_archive_batch(self, input_path: Path, output_path: Path, params: T) -> Iterator[FileResult]:
+        """
+        压缩包批处理：输入成员读入内存后交给线程池处理，结果按输入顺序写入输出（目录或压缩包）并逐个产出记录
+
+        在途成员数有上限，内存占用与压缩包大小无关；成员不落临时文件，因此不做去重与底图缓存。
+        成员与目录批处理一样经并发闸门与内存预算（按文件头估算工作集）后才解码处理。
+        记录中的路径为 压缩包（或目录）路径/成员名
+        """
+        workers = os.cpu_count() or 4
+        window = workers * 2
+        self._timings.clear()
+        self._schedule_stats, self._memory_stats, self._autotune_stats = {}, {}, {}
+        self._concurrency_gate = ConcurrencyGate(workers)
+        self._memory_budget = split_memory_budget(
+            self._pipeline_params.memory_budget_mb * 1024 * 1024 or default_memory_budget()
+        )
+        namer = OutputNamer(self._encoder.extension)
+        pending = deque()
+        with open_source(input_path, self._SUPPORTED_EXT, self._logger) as source, open_sink(output_path) as sink:
+            stats = self._archive_stats = {
+                'source': type(source).__name__, 'sink': type(sink).__name__, 'members': 0, 'skipped': 0,
+                'read_mb': 0.0, 'written_mb': 0.0, 'window': window,
+            }
+            self._logger.info(f"压缩包批处理 | 输入: {stats['source']} | 输出: {stats['sink']} | 在途上限: {window}")
+
+            def drain(limit: int) -> Iterator[FileResult]:
+                # 按输入顺序取结果写出，保持输出成员顺序稳定
+                while len(pending) > limit:
+                    output_name, future = pending.popleft()
+                    record, data = future.result()
+                    if data is not None:
+                        start_time = time.perf_counter()
+                        sink.write(output_name, data)
+                        record.timings['write'] = time.perf_counter() - start_time
+                    yield record
+
+            with ThreadPoolExecutor(max_workers=workers, initializer=self._init_worker) as executor:
+                try:
+                    for member in source:
+                        output_name = namer(member.name)
+                        record = FileResult(OK, input_path / member.name, output_path / output_name)
+                        pending.append((output_name, executor.submit(
+                            self._process_member, member, output_name, params, record
+                        )))
+                        stats['members'] += 1
+                        yield from drain(window)
+                    yield from drain(0)
+                finally:
+                    for _, future in pending:
+                        future.cancel()
+            stats.update({
+                'skipped': source.skipped,
+                'read_mb': source.bytes_read / (1024 * 1024),
+                'written_mb': sink.bytes_written / (1024 * 1024),
+            })
+            self._memory_stats = self._memory_budget.stats()
+
+    def _process_member(self, member, output_name: str, params: T,
+                        record: FileResult) -> Tuple[FileResult, Optional[bytes]]:
+        """处理单个压缩包成员，返回 (记录, 输出字节)（失败时字节为 None）"""
+        thread_name = threading.current_thread().name
+        self._trace.record = record
+        start_time = time.perf_counter()
+        try:
+            self._logger.info(f"开始处理成员 | 线程: {thread_name} | 输入: {member.name} | 输出: {output_name}")
+            start_time = time.perf_counter()
+            # Image.open 只读文件头，按尺寸估算工作集后再在预算内解码
+            image = Image.open(io.BytesIO(member.data))
+            pipeline = self._pipeline_params
+            task = BatchTask(Path(member.name), Path(output_name), size=len(member.data), width=image.width,
+                             height=image.height, mode=image.mode, format=image.format)
+            mem_bytes = estimate_working_set(task, self._output_target(params)[0], pipeline.enhancement,
+                                             pipeline.stream_threshold_mp * 1_000_000)
+            with self._concurrency_gate.slot(), self._memory_budget.reserve(mem_bytes), self._batch_work():
+                start_time = time.perf_counter()
+                data = self._process_buffer(
+                    image, Path(output_name), params, pipeline, self._composite_backend(self._composite_op(params)),
+                    self._encoder, self._size_fitter, self._encode_stats
+                )
+            cost = time.perf_counter() - start_time
+            self._count_task('process_member', cost)
+            self._logger.info(f"处理成功 | 线程: {thread_name} | 耗时: {cost:.2f}s | 输出成员: {output_name}")
+            record.bytes_written = len(data)
+            return record, data
+        except Exception as e:
+            self._logger.error(
+                f"处理失败 | 线程: {thread_name} | 成员: {member.name} | "
+                f"错误类型: {type(e).__name__} | 详情: {str(e)}",
+                exc_info=True
             )
-            # 使用线程池替代进程池
-            with ThreadPoolExecutor(
-                max_workers=min(os.cpu_count() or 4, len(tasks)),
-                initializer=self._init_worker
-            ) as executor:
-                # 计时开始
-                self._timings['pool_init'] = time.perf_counter() - task_start
+            record.status, record.error = FAILED, _describe(e)
+            return record, None
+        finally:
+            self._trace.record = None
+            record.timings['total'] = time.perf_counter() - start_time
 
-                # 任务分发
-                task_start = time.perf_counter()
-                futures = {
-                    executor.submit(self._process_wrapper, task, final_params): task
-                    for task in tasks
-                }
-                self._timings['task_distribute'] = time.perf_counter() - task_start
+    def _process_image(self, base_image: Image.Image, output_path: Path, params: T, pipeline: ProcessorParams,
+                       backend, encoder: EncoderProfile, size_fitter=None, fp=None, encode_stats: dict = None) -> None:
+        """
+        处理单个已打开的图像并写出（给定 fp 时写入该文件对象，否则写到 output_path）
 
-                # 结果收集
-                collect_start = time.perf_counter()
-                results = []
-                for future in futures:
-                    try:
-                        success, output_path = future.result()
-                        if success:
-                            results.append(output_path)
-                    except Exception as e:
-                        self._logger.error(f"任务失败: {e}", exc_info=True)
-                self._timings['result_collect'] = time.perf_counter() - collect_start
+        流式阈值、像素上限、合成后端、编码档位、大小上限与编码统计都由调用方传入，不读批次状态
+        """
+        self._check_pixels(base_image, pipeline)
+        if self._should_stream(base_image, pipeline):
+            output_height, quality = self._output_target(params)
+            watermarked = self._render_streaming(base_image, output_path, output_height, quality, params, backend)
+        else:
+            watermarked = self._render(base_image, output_path, params, backend=backend)
+        self._save_output(watermarked, output_path, encoder, size_fitter, fp=fp, encode_stats=encode_stats)
 
-                return results
+    def _process_buffer(self, base_image: Image.Image, output_path: Path, params: T, pipeline: ProcessorParams,
+                        backend, encoder: EncoderProfile, size_fitter=None, encode_stats: dict = None) -> bytes:
+        """内存中处理单个已打开的图像，按 output_path 的扩展名编码为字节"""
+        buffer = io.BytesIO()
+        self._process_image(base_image, output_path, params, pipeline, backend, encoder, size_fitter, buffer,
+                            encode_stats)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _check_pixels(image: Image.Image, pipeline: ProcessorParams):
+        """按本次参数的像素上限检查（Pillow 的全局上限只放宽不收紧，单次调用的上限需单独检查）"""
+        max_pixels = pipeline.max_image_mp * 1_000_000
+        if image.width * image.height > max_pixels:
+            raise ValueError(f"图像像素数 {image.width}x{image.height} 超过上限 {pipeline.max_image_mp}MP")
+
+    def _single_params(self, overrides: dict = None) -> Tuple[ProcessorParams, T]:
+        """单张调用的参数：overrides 覆盖该类型的默认参数（同 process_batch 的关键字参数）"""
+        try:
+            params = ProcessorParams(**{**self.default_params, **(overrides or {})}, output_dir=Path("output"))
+        except ValidationError as e:
+            raise ValueError(f"参数校验失败: {e.errors()}")
+        return params, self._validate_params(params)
+
+    @property
+    def image_param_names(self) -> Tuple[str, ...]:
+        """单张图像的处理参数名（类型配置 params 下的透明度、输出高度、质量等），不含处理器级调优项"""
+        return tuple(key for key in self.default_params if key not in self._TUNING_KEYS)
+
+    def _memory_call(self, overrides: dict = None):
+        """
+        内存接口单次调用的参数、合成后端与编码档位（每次调用单独解析，不读写批次状态）
+
+        解压炸弹上限是进程级设置，只按类型配置的 max_image_mp 放宽；单次调用的 max_image_mp 只能在此之内收紧
+        """
+        params, final_params = self._single_params(overrides)
+        configured = self.default_params.get('max_image_mp', ProcessorParams.model_fields['max_image_mp'].default)
+        if params.max_image_mp > configured:
+            params = params.model_copy(update={'max_image_mp': configured})
+        backend = self._composite_backend(self._composite_op(final_params), params.composite_backend)
+        encoder = resolve_profile(self._encoder_profiles, params.output_profile)
+        allow_large_images(configured * 1_000_000)
+        return params, final_params, backend, encoder
+
+    def _memory_fitter(self, params: ProcessorParams):
+        """内存接口的大小上限编码器：同一上限跨调用复用，大小模型持续学习"""
+        if params.target_size_kb <= 0:
+            return None
+        with self._memory_lock:
+            if params.target_size_kb not in self._memory_fitters:
+                self._memory_fitters[params.target_size_kb] = TargetSizeEncoder(params.target_size_kb * 1024)
+            return self._memory_fitters[params.target_size_kb]
+
+    def process_bytes(self, data: bytes, params: dict = None, output_format: str = None) -> bytes:
+        """
+        内存中处理单张图像：data 为编码后的图像字节，返回加水印后的编码字节，不读写文件
+
+        params 覆盖该类型的默认参数；output_format 为 jpeg/png/webp/avif，
+        默认按编码档位（webp/avif 档位）或输入格式（PNG 输入输出 PNG，其余输出 JPEG）
+        """
+        params, final_params, backend, encoder = self._memory_call(params)
+        base_image = Image.open(io.BytesIO(data))
+        if output_format is None:
+            output_format = encoder.format if encoder.extension else PNG if base_image.format == "PNG" else JPEG
+        output_path = Path(f"memory{format_extension(output_format)}")
+        self._logger.info(f"内存处理 | 输入: {base_image.format} {base_image.width}x{base_image.height} | "
+                          f"输出格式: {output_format}")
+        return self._process_buffer(base_image, output_path, final_params, params, backend, encoder,
+                                    self._memory_fitter(params))
+
+    def process_array(self, array: np.ndarray, params: dict = None) -> np.ndarray:
+        """
+        内存中处理 uint8 像素数组：HxW（L）、HxWx2（LA）、HxWx3（RGB）或 HxWx4（RGBA），返回合成结果的像素数组
+
+        输入按 Pillow 的数组接口包装（L/RGBA 连续数组共享内存，不复制），不经过编码；
+        输出通道数随合成工作模式（带 alpha 的输入保留 alpha）
+        """
+        if array.dtype != np.uint8 or array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (2, 3, 4)):
+            raise ValueError(f"不支持的数组: dtype={array.dtype} shape={array.shape}（需为 uint8 的 HxW 或 HxWxC，C 为 2~4）")
+        params, final_params, backend, _ = self._memory_call(params)
+        base_image = Image.fromarray(np.ascontiguousarray(array))
+        self._check_pixels(base_image, params)
+        if self._should_stream(base_image, params):
+            output_height, quality = self._output_target(final_params)
+            watermarked = self._render_streaming(base_image, _ARRAY_OUTPUT, output_height, quality, final_params,
+                                                 backend)
+        else:
+            watermarked = self._render(base_image, _ARRAY_OUTPUT, final_params, backend=backend)
+        return np.asarray(watermarked)
+
+    def benchmark_memory_api(self, input_dir: Path, limit: int = 8, repeats: int = 3) -> dict:
+        """
+        取输入目录中前 limit 个文件，比较单张处理的三种方式的平均耗时：
+        临时文件（写入 → process_single → 读回）、process_bytes、process_array（数组已解码，不含编解码）
+        """
+        scanner = ParallelDirScanner(self._SUPPORTED_EXT, logger=self._logger)
+        samples = [task.input_path.read_bytes() for task, _ in zip(scanner.scan(input_dir, input_dir), range(limit))]
+        if not samples:
+            return {}
+        params, final_params = self._single_params()
+        arrays = []
+        for data in samples:
+            image = Image.open(io.BytesIO(data))
+            if image.mode not in ("L", "LA", "RGB", "RGBA"):
+                image = image.convert("RGBA" if has_transparency(image) else "RGB")
+            arrays.append(np.asarray(image))
+        # 底图缓存会让临时文件方式重复运行时跳过缩放降质，测量期间关闭
+        cache_bytes, self._base_cache.max_bytes = self._base_cache.max_bytes, 0
+        level = self._logger.level
+        self._logger.setLevel(logging.WARNING)
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                def via_tempfile(data):
+                    fmt = PNG if data[:8] == b"\x89PNG\r\n\x1a\n" else JPEG
+                    input_path = Path(tmp) / f"input{format_extension(fmt)}"
+                    output_path = Path(tmp) / f"output{format_extension(fmt)}"
+                    input_path.write_bytes(data)
+                    self.process_single(input_path, output_path, final_params)
+                    return output_path.read_bytes()
+
+                methods = {
+                    'tempfile': lambda i: via_tempfile(samples[i]),
+                    'process_bytes': lambda i: self.process_bytes(samples[i]),
+                    'process_array': lambda i: self.process_array(arrays[i]),
+                }
+                report = {}
+                for name, method in methods.items():
+                    method(0)  # 预热（水印预处理缓存、合成后端基准）
+                    start = time.perf_counter()
+                    for _ in range(repeats):
+                        for i in range(len(samples)):
+                            method(i)
+                    report[name] = (time.perf_counter() - start) / (repeats * len(samples))
         finally:
-            # 添加任务总结日志
-            success_rate = len(results) / len(tasks) if tasks else 0
-            self._logger.info(
-                f"任务完成总结 | 成功率: {success_rate:.1%} | "
-                f"成功: {len(results)} | 失败: {len(tasks) - len(results)}"
-            )
-            self._timings['total'] = time.perf_counter() - task_start
-            self._print_stats()
-
-    def _generate_tasks(self, input_dir: Path, output_dir: Path) -> Iterable[Tuple[Path, Path]]:
-        """递归生成文件处理任务"""
-        self._scan_skipped=0
-        for entry in os.scandir(input_dir):
-            src_path = Path(entry.path)
-
-            if entry.is_file():
-                # 处理单个文件
-                if src_path.suffix.lower() in self._SUPPORTED_EXT:
-                    dest_path = output_dir / src_path.name
-                    self._logger.debug(f"✅ 添加任务: {src_path} → {dest_path}")
-                    yield (src_path, dest_path)
+            self._base_cache.max_bytes = cache_bytes
+            self._logger.setLevel(level)
+        print(f"\n=== 单张处理接口基准（{len(samples)} 个样本 x {repeats} 轮） ===")
+        baseline = report['tempfile']
+        for name, seconds in report.items():
+            print(f"{name:<14} {seconds * 1000:8.1f}ms/张 | 相对临时文件: {baseline / seconds:.2f}x")
+        return report
+
+    def _plan_units(self, tasks: List[BatchTask], params: ProcessorParams,
+                    final_params: T, workers: int) -> List:
+        """把输出尺寸相同的任务合并为批量合成组（任务充足且处理器支持时）"""
+        self._schedule_stats['groups'] = self._schedule_stats['grouped_files'] = 0
+        group_size = min(self._GROUP_MAX, len(tasks) // (2 * workers))
+        if group_size < 2 or self._intra_parallelism > 1 or not self._supports_group_composite(final_params):
+            return tasks
+        threshold = params.stream_threshold_mp * 1_000_000
+        by_size, units = defaultdict(list), []
+        for task in tasks:
+            if task.height and not should_stream(task.width, task.height, threshold):
+                by_size[(int(task.width * params.output_height / task.height), params.output_height)].append(task)
+            else:
+                units.append(task)
+        for members in by_size.values():
+            for i in range(0, len(members), group_size):
+                chunk = members[i:i + group_size]
+                if len(chunk) > 1:
+                    units.append(TaskGroup(chunk))
+                    self._schedule_stats['groups'] += 1
+                    self._schedule_stats['grouped_files'] += len(chunk)
                 else:
-                    self._scan_skipped += 1
-                    self._logger.debug(f"⏩ 跳过非支持文件: {src_path}")
+                    units.extend(chunk)
+        # 合并后仍保持最大任务优先
+        units.sort(key=lambda unit: unit.cost, reverse=True)
+        return units
 
-            elif entry.is_dir():
-                # 处理子目录（递归）
-                sub_output = output_dir / entry.name
-                sub_output.mkdir(parents=True, exist_ok=True)
-                self._logger.debug(f"📂 进入子目录: {src_path} → {sub_output}")
-                yield from self._generate_tasks(src_path, sub_output)
+    def _supports_group_composite(self, params: T) -> bool:
+        """是否支持同尺寸图像批量合成（子类按参数决定）"""
+        return False
 
-            else:
-                # 处理非常规文件（如符号链接）
-                self._scan_skipped += 1
-                self._logger.warning(f"🚫 跳过非常规文件: {src_path}")
+    def _process_group(self, tasks: List[BatchTask], params: T) -> List[bool]:
+        """批量处理同尺寸任务，返回逐个任务的成功标记（需子类实现）"""
+        raise NotImplementedError
+
+    def _process_group_wrapper(self, group: TaskGroup, kwargs: T) -> List[FileResult]:
+        """批量合成任务的日志与统计"""
+        thread_name = threading.current_thread().name
+        start_time = time.perf_counter()
+        try:
+            self._logger.info(
+                f"开始批量合成 | 线程: {thread_name} | 文件数: {len(group.tasks)} | "
+                f"首个输入: {group.tasks[0].input_path}"
+            )
+            with self._concurrency_gate.slot(), self._memory_budget.reserve(group.mem_bytes):
+                start_time = time.perf_counter()
+                flags = self._process_group(group.tasks, kwargs)
+            cost = time.perf_counter() - start_time
+            self._count_task('process_group', cost)
+            self._logger.info(
+                f"批量合成完成 | 线程: {thread_name} | 耗时: {cost:.2f}s | 成功: {sum(flags)}/{len(flags)}"
+            )
+            share = {'total': cost / len(group.tasks)}
+            return [
+                FileResult(OK, task.input_path, task.output_path, dict(share), os.path.getsize(task.output_path))
+                if flag else FileResult(FAILED, task.input_path, task.output_path, dict(share), error="批量合成中处理失败")
+                for flag, task in zip(flags, group.tasks)
+            ]
+        except Exception as e:
+            self._logger.error(
+                f"批量合成失败 | 线程: {thread_name} | 错误类型: {type(e).__name__} | 详情: {str(e)}",
+                exc_info=True
+            )
+            share = {'total': (time.perf_counter() - start_time) / len(group.tasks)}
+            return [FileResult(FAILED, task.input_path, task.output_path, dict(share), error=_describe(e))
+                    for task in group.tasks]
+        finally:
+            if self._autotuner:
+                for _ in group.tasks:
+                    self._autotuner.task_done()
 
     @staticmethod
     def _init_worker():
@@ -245,27 +1134,33 @@ class BaseWatermarkProcessor(Generic[T]):
         logger = logging.getLogger()
         logger.info(f"工作线程启动 | TID: {thread_id} | 准备就绪")
 
-    def _process_wrapper(self, task: Tuple[Path, Path], kwargs: ProcessorParams) -> Tuple[bool, Path]:
+    def _process_wrapper(self, task: BatchTask, kwargs: ProcessorParams) -> FileResult:
         """添加详细任务日志"""
-        input_path, output_path = task
+        input_path, output_path = task.input_path, task.output_path
         thread_name = threading.current_thread().name
+        record = self._trace.record = FileResult(OK, input_path, output_path)
+        self._trace.task = task
+        start_time = time.perf_counter()
         try:
             # 任务开始日志
             self._logger.info(
                 f"开始处理文件 | 线程: {thread_name} | "
                 f"输入: {input_path} | 输出: {output_path}"
             )
-            start_time = time.perf_counter()
-            self.process_single(input_path, output_path, kwargs)
+            with self._concurrency_gate.slot(), self._memory_budget.reserve(task.mem_bytes):
+                start_time = time.perf_counter()
+                if self.process_single(input_path, output_path, kwargs) is False:
+                    # 子类已记录异常日志，错误信息由 _note_failure 写入记录
+                    record.status = FAILED
+                    return record
             cost = time.perf_counter() - start_time
-            self._task_stats['process_single']['count'] += 1
-            self._task_stats['process_single']['total'] += cost
+            self._count_task('process_single', cost)
             # 成功日志
             self._logger.info(
                 f"处理成功 | 线程: {thread_name} | "
                 f"耗时: {cost:.2f}s | 输出文件: {output_path}"
             )
-            return (True, output_path)
+            return record
         except Exception as e:
             # 失败日志（包含异常类型）
             error_type = type(e).__name__
@@ -274,7 +1169,13 @@ class BaseWatermarkProcessor(Generic[T]):
                 f"文件: {input_path} | 错误类型: {error_type} | 详情: {str(e)}",
                 exc_info=True
             )
-            return (False, output_path)
+            record.status, record.error = FAILED, _describe(e)
+            return record
+        finally:
+            self._trace.record = self._trace.task = None
+            record.timings['total'] = time.perf_counter() - start_time
+            if self._autotuner:
+                self._autotuner.task_done()
 
     def process_single(
         self,
@@ -286,6 +1187,294 @@ class BaseWatermarkProcessor(Generic[T]):
         self._validate_params(params)
         raise NotImplementedError
 
+    def _should_stream(self, image: Image.Image, pipeline: ProcessorParams = None) -> bool:
+        """是否走条带流式处理（pipeline 为空时取批次参数）"""
+        threshold = (pipeline or self._pipeline_params).stream_threshold_mp * 1_000_000
+        return threshold > 0 and image.width * image.height > threshold
+
+    def _degrade(self, image: Image.Image, quality: int) -> Image.Image:
+        """按质量参数重编码降质（RGB 走 JPEG；其余模式原先走无损 PNG 往返，像素不变，直接返回）"""
+        if image.mode != "RGB":
+            return image
+        return Image.open(io.BytesIO(self._degrade_bytes(image, quality)))
+
+    def _degrade_bytes(self, image: Image.Image, quality: int) -> bytes:
+        """RGB 降质编码结果（解码即为降质后的图像）"""
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+
+    def _plan_stages(self, image: Image.Image, output_path: Path, output_height: int, quality: int,
+                     op: str) -> StagePlan:
+        """按文件头规划缩放/降质/模式转换阶段，记录决策"""
+        plan = plan_stages(image, output_height, quality, self._working_mode(image, output_path, op))
+        for stage in ('resize', 'degrade', 'convert'):
+            self._count_batch(self._plan_stats, (stage, getattr(plan, stage)))
+        self._logger.info(f"阶段计划 | 文件: {getattr(image, 'filename', '')} | {plan.describe()}")
+        return plan
+
+    def _prepare_base(self, base_image: Image.Image, output_height: int, quality: int,
+                      plan: StagePlan = None, source_path: Path = None, task: BatchTask = None) -> Image.Image:
+        """
+        缩放到输出高度并降质（按阶段计划跳过空操作）
+
+        给定源文件路径且启用底图缓存时，命中则直接解码缓存，未命中则把降质编码结果写入缓存；
+        缩放与降质都被跳过时底图即源图，无需缓存
+        """
+        cache_key = None
+        if source_path is not None and self._base_cache.enabled and (plan is None or plan.resize or plan.degrade):
+            cache_key = self._base_cache.key(self._source_digest(source_path, task), output_height, quality)
+            cached = self._base_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if plan is None or plan.resize:
+            scale = output_height / base_image.height
+            width = int(base_image.width * scale)
+            base_image = base_image.resize((width, output_height))
+        if (plan.degrade if plan else base_image.mode == "RGB"):
+            data = self._degrade_bytes(base_image, quality)
+            base_image = Image.open(io.BytesIO(data))
+        elif cache_key:
+            # 降质被跳过（无损），缓存以快速 PNG 保存缩放结果
+            buffer = io.BytesIO()
+            base_image.save(buffer, format="PNG", compress_level=1)
+            data = buffer.getvalue()
+        if cache_key:
+            self._base_cache.put(cache_key, data)
+        return base_image
+
+    def _source_digest(self, source_path: Path, task: BatchTask = None) -> str:
+        """源文件内容哈希：属于当前任务时与去重共用（每个任务只读一遍全文）"""
+        task = task or getattr(self._trace, 'task', None)
+        if task is not None and task.input_path == source_path:
+            return task_digest(task)
+        return content_hash(source_path)
+
+    def _working_mode(self, image: Image.Image, output_path: Path, op: str) -> str:
+        """按源图模式、输出格式与水印颜色选择合成工作模式"""
+        if self._gray_watermark is None:
+            self._gray_watermark = is_gray_watermark(self._watermark_data)
+        return working_mode(image, op, not is_jpeg_output(output_path), self._gray_watermark)
+
+    def _to_working_mode(self, image: Image.Image, output_path: Path, op: str) -> Image.Image:
+        """转换到工作模式，后续合成与保存不再做整帧模式转换"""
+        mode = self._working_mode(image, output_path, op)
+        self._count_batch(self._mode_stats, f"{image.mode}→{mode}")
+        return to_mode(image, mode)
+
+    def _output_target(self, params: T) -> Tuple[int, int]:
+        """输出高度与降质质量"""
+        return params.output_height, params.quality
+
+    def _render(self, base_image: Image.Image, output_path: Path, params: T,
+                source_path: Path = None, backend=None) -> Image.Image:
+        """缩放降质、转换工作模式后合成水印（不保存；source_path 给定时使用底图缓存，backend 为空时取批次的合成后端）"""
+        output_height, quality = self._output_target(params)
+        op = self._composite_op(params)
+        with self._stage('prepare'):
+            plan = self._plan_stages(base_image, output_path, output_height, quality, op)
+            base_image = self._prepare_base(base_image, output_height, quality, plan, source_path)
+            base_image = self._to_working_mode(base_image, output_path, op)
+        with self._stage('composite'):
+            return self._composite(base_image, params, backend)
+
+    @contextmanager
+    def _stage(self, name: str):
+        """累计当前线程正在处理的文件的阶段耗时（不在逐文件跟踪中时不计时）"""
+        record = getattr(self._trace, 'record', None)
+        if record is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.timings[name] = record.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def _count(self, stats, key, amount=1):
+        """累加共享统计计数（加锁：字典上的 += 在多线程下会丢失更新）"""
+        with self._stats_lock:
+            stats[key] += amount
+
+    @contextmanager
+    def _batch_work(self):
+        """标记当前线程正在处理批次文件：批次统计计数与文件内并行度只在此范围内生效，内存接口调用不读写"""
+        previous = getattr(self._trace, 'batch', False)
+        self._trace.batch = True
+        try:
+            yield
+        finally:
+            self._trace.batch = previous
+
+    def _in_batch(self) -> bool:
+        return getattr(self._trace, 'batch', False)
+
+    def _count_batch(self, stats, key):
+        """批次统计计数（不在批次文件处理中时不计入，例如内存接口调用）"""
+        if self._in_batch():
+            self._count(stats, key)
+
+    def _count_task(self, name: str, cost: float):
+        with self._stats_lock:
+            self._task_stats[name]['count'] += 1
+            self._task_stats[name]['total'] += cost
+
+    def _note_failure(self, error: Exception):
+        """子类 process_single 捕获异常后调用，把错误写入当前文件的结果记录"""
+        record = getattr(self._trace, 'record', None)
+        if record is not None:
+            record.error = _describe(error)
+
+    def _save_output(self, watermarked: Image.Image, output_path: Path, encoder=None, size_fitter=None,
+                     fp=None, encode_stats: dict = None) -> None:
+        """
+        按编码档位写出（JPEG/WebP/AVIF 使用档位参数，PNG 使用档位的 png_* 参数；设置大小上限时搜索质量，
+        PNG 逐级尝试调色板量化，仍超限时照常写出并记录警告）
+
+        给定 fp 时写入该文件对象，output_path 只用于按扩展名决定输出格式；
+        encode_stats 为累计编码统计的字典（内存接口不传，不计入批次统计）
+        """
+        if encoder is None:
+            # 批处理：编码档位、大小上限与编码统计取批次设置；显式给定档位时其余也以调用方为准（可为空）
+            encoder, size_fitter, encode_stats = self._encoder, self._size_fitter, self._encode_stats
+        fmt = output_format(output_path)
+        target = output_path if fp is None else fp
+        offset = 0 if fp is None else fp.tell()
+        start = time.perf_counter()
+        if fp is None:
+            self._output_dirs.ensure(output_path.parent)
+        with self._stage('encode'):
+            if size_fitter and fmt:
+                written = watermarked
+                size_fitter.save(watermarked, target, encoder, fmt)
+            elif fmt:
+                written = encoder.encode(watermarked, target, fmt)
+            else:
+                written = watermarked
+                watermarked.save(target, quality=100)
+        record = getattr(self._trace, 'record', None)
+        if encode_stats or record is not None or size_fitter:
+            size = os.path.getsize(output_path) if fp is None else fp.tell() - offset
+            if record is not None:
+                record.bytes_written += size
+            if size_fitter and fmt and size > size_fitter.target_bytes:
+                self._logger.warning(
+                    f"输出超出大小上限 | 文件: {output_path} | 大小: {size / 1024:.0f}KB | "
+                    f"上限: {size_fitter.target_bytes / 1024:.0f}KB"
+                )
+        if encode_stats:
+            with self._stats_lock:
+                if written.mode == "P" and watermarked.mode != "P":
+                    encode_stats['palette'] += 1
+                encode_stats['files'] += 1
+                encode_stats['seconds'] += time.perf_counter() - start
+                encode_stats['bytes'] += size
+
+    def benchmark_encoders(self, input_dir: Path, limit: int = 8, repeats: int = 2) -> dict:
+        """取输入目录中前 limit 个文件，按默认参数缩放降质后测量各编码档位的耗时与输出大小"""
+        params = self._pipeline_params
+        scanner = ParallelDirScanner(self._SUPPORTED_EXT, logger=self._logger)
+        samples = []
+        for task in scanner.scan(input_dir, input_dir):
+            if len(samples) >= limit:
+                break
+            samples.append(self._prepare_base(self.load_image(task.input_path), params.output_height, params.quality))
+        report = benchmark_profiles(samples, self._encoder_profiles, repeats)
+        print(f"\n=== 编码档位基准（{len(samples)} 个样本，{params.output_height}px） ===")
+        print(format_benchmark(report))
+        assets = [sample for sample in samples if sample.mode not in ("RGB", "L")]
+        if assets:
+            png_report = benchmark_profiles(assets, {**PNG_CANDIDATES, **self._encoder_profiles}, repeats, PNG)
+            print(f"\n=== PNG 输出基准（{len(assets)} 个非 RGB 样本） ===")
+            print(format_benchmark(png_report))
+            report = {**report, **{f"{name} (png)": row for name, row in png_report.items()}}
+        return report
+
+    def _process_streaming(self, base_image: Image.Image, output_path: Path,
+                           output_height: int, quality: int, params: T) -> None:
+        """超大图条带流式处理：缩放与降质按水平条带进行，峰值内存与宽度而非面积相关"""
+        self._save_output(self._render_streaming(base_image, output_path, output_height, quality, params), output_path)
+
+    def _render_streaming(self, base_image: Image.Image, output_path: Path,
+                          output_height: int, quality: int, params: T, backend=None) -> Image.Image:
+        """条带流式缩放降质并合成（不保存；backend 为空时取批次的合成后端）"""
+        size = (int(base_image.width * output_height / base_image.height), output_height)
+        self._logger.info(
+            f"条带流式处理 | 原图: {base_image.width}x{base_image.height} | 输出: {size[0]}x{size[1]}"
+        )
+        mode = self._working_mode(base_image, output_path, self._composite_op(params))
+        self._count_batch(self._mode_stats, f"{base_image.mode}→{mode}")
+        with base_image:
+            draft_for_output(base_image, size)
+            bands = []
+            with self._stage('prepare'):
+                for y0, y1 in iter_bands(output_height):
+                    # RGB 条带要重编码降质：JPEG 解码的色度上采样会用到相邻行，带上下文行降质后再裁掉，
+                    # 条带接缝处与整帧降质逐像素一致
+                    top, bottom = with_context(y0, y1, output_height) if base_image.mode == "RGB" else (y0, y1)
+                    band = resize_band(base_image, size, top, bottom)
+                    if band.mode not in ("RGB", "RGBA", "L", "LA"):
+                        # 调色板各条带独立，需展开后才能拼接
+                        band = band.convert("RGBA")
+                    band = self._degrade(band, quality)
+                    if (top, bottom) != (y0, y1):
+                        band = band.crop((0, y0 - top, band.width, y1 - top))
+                    bands.append(to_mode(band, mode))
+        with self._stage('composite'):
+            return self._composite_bands(bands, params, backend)
+
+    def _row_crops(self, image: Image.Image) -> List[Tuple[int, Image.Image]]:
+        """按文件内并行度切分行区间，返回 (起始行, 条带图像) 列表（并行度属于批次，内存接口调用不切分）"""
+        parallelism = self._intra_parallelism if self._in_batch() else 1
+        if parallelism <= 1 or image.width * image.height < INTRA_MIN_PIXELS:
+            return [(0, image)]
+        image.load()  # 先在当前线程完成解码，避免多线程并发触发 load
+        return [(y0, image.crop((0, y0, image.width, y1))) for y0, y1 in split_rows(image.height, parallelism)]
+
+    def _composite_rows(self, image: Image.Image, npy_data, composite, crops=None) -> Image.Image:
+        """各条带与对应行的水印在共享线程池中并行合成后拼接"""
+        crops = crops or self._row_crops(image)
+        if len(crops) == 1:
+            return composite(image, npy_data)
+        parts = band_map(
+            lambda item: composite(item[1], npy_data[item[0]:item[0] + item[1].height]),
+            crops, parallel=True
+        )
+        result = Image.new(parts[0].mode, image.size)
+        if result.mode == "P":
+            result.putpalette(parts[0].getpalette())
+        for (y0, _), part in zip(crops, parts):
+            result.paste(part, (0, y0))
+        return result
+
+    def _composite(self, base_image: Image.Image, params: T, backend=None) -> Image.Image:
+        """将水印合成到已降质、已转工作模式的整幅底图上（backend 为空时取批次的合成后端；需子类实现）"""
+        raise NotImplementedError
+
+    def _composite_op(self, params: T) -> str:
+        """本批次使用的合成运算（overlay / enhance）"""
+        return OVERLAY
+
+    def _composite_backend(self, op: str, name: str = None):
+        """按名称（为空时取批次参数）解析合成后端；auto 时首次调用会运行一次本机基准测试，未知名称抛出 ValueError"""
+        name = name or self._pipeline_params.composite_backend
+        return get_backend(fastest_backend(op) if name == AUTO else name)
+
+    def _prepared_watermark(self, op: str, npy_data, size: Tuple[int, int], opacity: float = 1.0,
+                            mode: str = 'RGBA'):
+        """取预处理好的水印；整幅水印及其行切片按 (行偏移, 形状, 尺寸, 透明度, 模式) 缓存"""
+        mode = mode if op == OVERLAY and mode in GRAY_MODES else 'RGBA'
+        full = getattr(self, '_watermark_data', None)
+        if full is None or (npy_data is not full and npy_data.base is not full):
+            return prepare_watermark(op, npy_data, size, opacity, mode)
+        offset = npy_data.__array_interface__['data'][0] - full.__array_interface__['data'][0]
+        key = (op, offset, npy_data.shape, size, opacity, mode)
+        return self._watermark_cache.get(key, lambda: prepare_watermark(op, npy_data, size, opacity, mode))
+
+    def _composite_bands(self, bands: List[Image.Image], params: T, backend=None) -> Image.Image:
+        """将水印合成到按行切分的降质条带上并拼接（需子类实现）"""
+        raise NotImplementedError
+
     def _validate_params(self, params: T):
         """返回具体参数类型（子类实现）"""
         raise NotImplementedError
@@ -303,4 +1492,6 @@ class BaseWatermarkProcessor(Generic[T]):
         return self._config
 
     def _parse_config(self, config):
-        return {item: data['default'] for item, data in config['params'].items()}
\ No newline at end of file
+        defaults = {item: data['default'] for item, data in config['params'].items()}
+        defaults.update({key: config[key] for key in self._TUNING_KEYS if key in config})
+        return defaults
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+多输出扇出批处理
+
+同一批输入需要多种输出（不同输出高度、不同水印类型）时，每个输入只解码一次：
+每个目标高度只由源图缩放一次（与逐类型批处理的像素结果一致），
+相同 (高度, 质量) 的降质结果、相同工作模式的底图在各变体间共享。
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from .base_processor import BaseWatermarkProcessor, ProcessorParams
+from ..pipeline.encoders import EncoderProfile, resolve_profile
+from ..pipeline.governor import default_memory_budget, estimate_working_set, split_memory_budget
+from ..pipeline.modes import to_mode
+from ..pipeline.planner import plan_stages
+from ..pipeline.prescan import prescan_tasks, schedule_lpt
+from ..pipeline.scanner import BatchTask, ParallelDirScanner
+from ..pipeline.sizefit import TargetSizeEncoder
+from ..pipeline.streaming import allow_large_images
+
+
+@dataclass
+class FanOutVariant:
+    """扇出变体：水印类型、参数（覆盖该类型的默认参数）与输出目录"""
+    wm_type: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    output_dir: Path = Path("output")
+
+
+@dataclass
+class _ResolvedVariant:
+    processor: BaseWatermarkProcessor
+    params: ProcessorParams
+    final_params: Any
+    op: str
+    output_dir: Path
+    backend: Any
+    encoder: EncoderProfile
+    size_fitter: Optional[TargetSizeEncoder] = None
+
+    @property
+    def target(self) -> Tuple[int, int]:
+        """输出高度与降质质量（取自处理器钩子：雾化水印由类型配置决定，不随参数变化）"""
+        return self.processor._output_target(self.final_params)
+
+    @property
+    def height(self) -> int:
+        return self.target[0]
+
+
+def resize_targets(source: Image.Image, heights: Sequence[int]) -> Dict[int, Image.Image]:
+    """
+    每个目标高度由源图缩放一次（相同高度的变体共享）
+
+    不做链式缩放：由上一级缩放结果继续缩小的像素与直接缩放不同，扇出输出须与批处理一致。
+    宽度计算与 _prepare_base 相同；已是目标高度时直接使用源图
+    """
+    resized = {}
+    for height in set(heights):
+        if height == source.height:
+            resized[height] = source
+            continue
+        width = int(source.width * (height / source.height))
+        resized[height] = source.resize((width, height))
+    return resized
+
+
+class FanOutBatch:
+    """多变体扇出批处理：每个输入解码一次，按变体输出到各自目录"""
+
+    def __init__(self, processors: Dict[str, BaseWatermarkProcessor]):
+        self._processors = processors
+        first = next(iter(processors.values()))
+        self._logger = first.logger
+        self._stats = {}
+
+    def _resolve(self, variants: Sequence[FanOutVariant]) -> List[_ResolvedVariant]:
+        resolved = []
+        for variant in variants:
+            processor = self._processors[variant.wm_type]
+            params = ProcessorParams(
+                **{**processor.default_params, **variant.params}, output_dir=Path(variant.output_dir)
+            )
+            final_params = processor._validate_params(params)
+            op = processor._composite_op(final_params)
+            # 同类型的多个变体共用一个处理器：流式阈值、合成后端、编码档位均按变体传入，不改处理器的批次状态
+            resolved.append(_ResolvedVariant(
+                processor, params, final_params, op, Path(variant.output_dir),
+                processor._composite_backend(op, params.composite_backend),
+                resolve_profile(processor._encoder_profiles, params.output_profile),
+                TargetSizeEncoder(params.target_size_kb * 1024) if params.target_size_kb > 0 else None
+            ))
+        return resolved
+
+    def run(self, input_dir: Path, variants: Sequence[FanOutVariant]) -> List[List[Path]]:
+        """处理输入目录，返回各变体成功输出的路径列表（与 variants 顺序一致）"""
+        if not variants:
+            raise ValueError("扇出变体列表为空")
+        try:
+            resolved = self._resolve(variants)
+        except Exception as e:
+            self._logger.exception(e)
+            raise ValueError(f"参数校验失败: {e}")
+        input_dir = Path(input_dir)
+        start = time.perf_counter()
+        self._logger.info(
+            f"开始扇出批处理 | 输入目录: {input_dir} | 变体: " +
+            " | ".join(f"{v.processor.watermark_type} {v.height}px → {v.output_dir}" for v in resolved)
+        )
+        allow_large_images(max(v.params.max_image_mp for v in resolved) * 1_000_000)
+        # 子目录由各处理器在写出输出时创建
+        for variant in resolved:
+            variant.output_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+
+        scanner = ParallelDirScanner(BaseWatermarkProcessor._SUPPORTED_EXT, logger=self._logger)
+        # 扫描只用于列出输入，输出路径按各变体目录另行拼接
+        tasks = list(scanner.scan(input_dir, input_dir))
+        outputs = [[] for _ in resolved]
+        if not tasks:
+            self._logger.warning("未发现可处理文件")
+            return outputs
+        workers = min(os.cpu_count() or 4, len(tasks))
+        prescan_tasks(tasks, max(v.height for v in resolved))
+        schedule_lpt(tasks, workers)
+        for task in tasks:
+            task.mem_bytes = self._estimate_memory(task, resolved)
+        budget = resolved[0].params.memory_budget_mb * 1024 * 1024 or default_memory_budget()
+        self._memory_budget = split_memory_budget(budget)
+
+        # 各变体的输出路径：镜像输入目录结构，扩展名随编码档位
+        relative = [task.input_path.relative_to(input_dir) for task in tasks]
+        variant_paths = [v.encoder.output_paths([v.output_dir / path for path in relative]) for v in resolved]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._process_task, task, [paths[i] for paths in variant_paths], resolved)
+                for i, task in enumerate(tasks)
+            ]
+            for task, future in zip(tasks, futures):
+                try:
+                    for index, output_path in future.result():
+                        outputs[index].append(output_path)
+                except Exception as e:
+                    self._logger.error(f"扇出任务失败: {task.input_path} | {e}", exc_info=True)
+
+        self._stats['files'] = len(tasks)
+        self._stats['elapsed'] = time.perf_counter() - start
+        succeeded = sum(len(paths) for paths in outputs)
+        total = len(tasks) * len(resolved)
+        self._logger.info(
+            f"扇出完成总结 | 成功率: {succeeded / total:.1%} | 成功: {succeeded} | 失败: {total - succeeded}"
+        )
+        self._print_stats(resolved, outputs)
+        return outputs
+
+    @staticmethod
+    def _estimate_memory(task: BatchTask, resolved: List[_ResolvedVariant]) -> int:
+        """源图解码一份 + 各输出高度的中间结果"""
+        largest = max(
+            estimate_working_set(task, v.height, v.params.enhancement, v.params.stream_threshold_mp * 1_000_000)
+            for v in resolved
+        )
+        heights = {v.height for v in resolved}
+        extra = sum(int(task.width * h / task.height) * h * 4 for h in heights) if task.height else 0
+        return largest + extra
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _process_task(self, task: BatchTask, output_paths: List[Path],
+                      resolved: List[_ResolvedVariant]) -> List[Tuple[int, Path]]:
+        self._logger.info(f"开始扇出处理 | 输入: {task.input_path} | 变体数: {len(resolved)}")
+        with self._memory_budget.reserve(task.mem_bytes):
+            source = resolved[0].processor.load_image(task.input_path)
+            if any(v.processor._should_stream(source, v.params) for v in resolved):
+                source.close()
+                return self._process_separately(task, resolved, output_paths)
+            with source:
+                source.load()
+                self._count('decodes')
+                return self._process_shared(source, task, resolved, output_paths)
+
+    def _process_separately(self, task: BatchTask, resolved: List[_ResolvedVariant],
+                            output_paths: List[Path]) -> List[Tuple[int, Path]]:
+        """超大图各变体分别走条带流式处理（条带不跨变体共享）"""
+        self._count('streamed')
+        done = []
+        for index, (variant, output_path) in enumerate(zip(resolved, output_paths)):
+            self._count('decodes')
+            try:
+                variant.processor._process_image(
+                    variant.processor.load_image(task.input_path), output_path, variant.final_params,
+                    variant.params, variant.backend, variant.encoder, variant.size_fitter
+                )
+                done.append((index, output_path))
+            except Exception as e:
+                self._logger.error(
+                    f"扇出变体失败 | 文件: {task.input_path} | 输出: {output_path} | "
+                    f"错误类型: {type(e).__name__} | 详情: {e}", exc_info=True
+                )
+        return done
+
+    def _process_shared(self, source: Image.Image, task: BatchTask, resolved: List[_ResolvedVariant],
+                        output_paths: List[Path]) -> List[Tuple[int, Path]]:
+        plans = [plan_stages(source, *v.target, v.processor._working_mode(source, path, v.op))
+                 for v, path in zip(resolved, output_paths)]
+        resized = resize_targets(source, [v.height for v, plan in zip(resolved, plans) if plan.resize])
+        self._count('resizes', sum(1 for image in resized.values() if image is not source))
+        self._count('resizes_unshared', sum(1 for plan in plans if plan.resize))
+
+        # 降质结果按 (高度, 质量) 共享，工作模式底图按 (高度, 质量, 模式) 共享
+        degraded, working, bases = {}, {}, []
+        for variant, output_path, plan in zip(resolved, output_paths, plans):
+            height, quality = variant.target
+            if variant.target not in degraded:
+                base = resized[height] if plan.resize else source
+                if plan.degrade:
+                    base = variant.processor._degrade(base, quality)
+                    base.load()
+                    self._count('degrades')
+                degraded[variant.target] = base
+            self._count('degrades_unshared', int(plan.degrade))
+            key = (height, quality, variant.processor._working_mode(source, output_path, variant.op))
+            if key not in working:
+                working[key] = to_mode(degraded[variant.target], key[2])
+            bases.append(working[key])
+        # 合成可能原地修改底图：同一对象仍有后续变体使用时先复制，最后一次使用直接交给合成
+        uses = Counter(id(base) for base in bases)
+
+        done = []
+        for index, (variant, output_path, base) in enumerate(zip(resolved, output_paths, bases)):
+            uses[id(base)] -= 1
+            try:
+                if uses[id(base)]:
+                    base = base.copy()
+                watermarked = variant.processor._composite(base, variant.final_params, variant.backend)
+                variant.processor._save_output(watermarked, output_path, variant.encoder, variant.size_fitter)
+                done.append((index, output_path))
+            except Exception as e:
+                self._logger.error(
+                    f"扇出变体失败 | 文件: {task.input_path} | 输出: {output_path} | "
+                    f"错误类型: {type(e).__name__} | 详情: {e}", exc_info=True
+                )
+        self._logger.info(f"扇出处理成功 | 输入: {task.input_path} | 输出: {len(done)}/{len(resolved)}")
+        return done
+
+    def _print_stats(self, resolved: List[_ResolvedVariant], outputs: List[List[Path]]):
+        stats = self._stats
+        files = stats['files']
+        print("\n======== 扇出批处理报告 ========")
+        print(f"[总耗时] {stats['elapsed']:.2f}s | 输入: {files} 个 | 变体: {len(resolved)} 个")
+        print(f"解码: {stats['decodes']} 次 (逐变体批处理需 {files * len(resolved)} 次)"
+              f"{' | 条带流式: ' + str(stats['streamed']) + ' 个' if stats['streamed'] else ''}")
+        print(f"缩放: {stats['resizes']} 次 (不共享需 {stats['resizes_unshared']} 次) | "
+              f"降质: {stats['degrades']} 次 (不共享需 {stats['degrades_unshared']} 次)")
+        for variant, paths in zip(resolved, outputs):
+            fit = variant.size_fitter.stats() if variant.size_fitter else None
+            height, quality = variant.target
+            print(f"  {variant.processor.watermark_type} {height}px "
+                  f"q{quality} → {variant.output_dir}: 成功 {len(paths)}/{files}"
+                  + (f" | 大小上限 {fit['target_kb']:.0f}KB 平均尝试 {fit['mean_attempts']:.2f} 次" if fit else ""))
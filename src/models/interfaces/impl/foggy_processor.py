@@ -1,4 +1,3 @@
-import io
 import os
 from pathlib import Path
 from typing import Dict
@@ -6,6 +5,7 @@ from typing import Dict
 from PIL import Image
 import numpy as np
 from ..base_processor import BaseWatermarkProcessor, ProcessorParams
+from ...pipeline.backends import OVERLAY
 from ..interfaces import IWatermarkConfig
 
 # 参数对象定义
@@ -27,6 +27,8 @@ class FoggyParams:
 class FoggyWatermarkProcessor(BaseWatermarkProcessor):
     """常规水印处理器"""
 
+    watermark_type = 'foggy'
+
     def __init__(self, config: IWatermarkConfig, npy_path: str):
         super().__init__(config)
         filepath = self.get_resource_path(npy_path)
@@ -51,49 +53,49 @@ class FoggyWatermarkProcessor(BaseWatermarkProcessor):
         try:
             # 加载并预处理图片
             base_image = self.load_image(input_path)
-            scale = self.config['output_height'] / base_image.height
-            width = int(base_image.width * scale)
-            base_image = base_image.resize((width, self.config['output_height']))
-            if base_image.mode == "RGB":
-                buffer = io.BytesIO()
-                base_image.save(buffer, format="JPEG", quality=self.config['quality'])
-                buffer.seek(0)
-                base_image = Image.open(buffer)
-            else:
-                # PNG 压缩（无损但有压缩级别）
-                buffer = io.BytesIO()
-                base_image.save(buffer, format="PNG", compress_level=int((100 - self.config['quality']) / 10))  # 最高压缩级别
-                buffer.seek(0)
-                base_image = Image.open(buffer)
-            # # 加载水印数据
-            # npy_path = f"{self._watermark_data}.npy"
-            # npy_data = load_npy(npy_path) * (opacity/100.0)
-            npy_data = self._watermark_data
-            np.resize(npy_data, (self.config['output_height'], self.config['output_height']))
-            # 应用水印
-            watermarked = self.overlay_and_crop(base_image, npy_data)
+            if self._should_stream(base_image):
+                self._process_streaming(base_image, output_path, *self._output_target(params), params)
+                return True
+            watermarked = self._render(base_image, output_path, params, input_path)
 
-            if os.path.splitext(output_path)[1] in [".jpeg", ".jpg"]:
-                watermarked = watermarked.convert("RGB")
             # 保存结果
-            watermarked.save(output_path, quality=100)
+            self._save_output(watermarked, output_path)
             return True
         except Exception as e:
             self.logger.exception(f"处理失败: {input_path} - {str(e)}")
+            self._note_failure(e)
             return False
 
-    def overlay_and_crop(self, base_image, npy_data):
-        """叠加水印并裁剪"""
-        # print(f"npy_data.shape = {npy_data.shape}")
-        watermark_image = Image.fromarray(npy_data)
-        # 获取图片和水印的尺寸
-        base_width, base_height = base_image.size
-        watermark_width, watermark_height = watermark_image.size
+    def _output_target(self, params: FoggyParams):
+        # 雾化水印的输出尺寸与降质质量取自类型配置
+        return self.config['output_height'], self.config['quality']
+
+    def _composite(self, base_image: Image.Image, params: FoggyParams, backend=None) -> Image.Image:
+        return self.overlay_and_crop(base_image, self._watermark_data, backend)
 
-        # 裁剪水印超出图片的部分
-        if watermark_width > base_width or watermark_height > base_height:
-            watermark_image = watermark_image.crop((0, 0, base_width, base_height))
+    def _composite_bands(self, bands, params: FoggyParams, backend=None):
+        """逐条带叠加水印并拼接"""
+        width, height = bands[0].width, sum(band.height for band in bands)
+        result, y = None, 0
+        for band in bands:
+            npy_band = self._watermark_data[y:y + band.height]
+            merged = self.overlay_and_crop(band, npy_band, backend)
+            if result is None:
+                result = Image.new(merged.mode, (width, height))
+            result.paste(merged, (0, y))
+            y += band.height
+        return result
 
-        # 将水印覆盖到图片的左上角
-        base_image.paste(watermark_image, (0, 0), watermark_image)  # 使用alpha通道（如果存在）
-        return base_image
\ No newline at end of file
+    def overlay_and_crop(self, base_image, npy_data, backend=None):
+        """叠加水印并裁剪（大图按行切分并行处理；backend 为空时取批次的合成后端）"""
+        backend = backend or self._composite_backend(OVERLAY)
+        return self._composite_rows(
+            base_image, npy_data, lambda band, npy_band: self._overlay_frame(band, npy_band, backend)
+        )
+
+    def _overlay_frame(self, base_image, npy_data, backend=None):
+        """叠加水印并裁剪"""
+        if npy_data.shape[0] == 0:
+            return base_image
+        watermark = self._prepared_watermark(OVERLAY, npy_data, base_image.size, mode=base_image.mode)
+        return (backend or self._composite_backend(OVERLAY)).overlay(base_image, watermark)
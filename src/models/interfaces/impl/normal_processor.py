@@ -1,4 +1,3 @@
-import io
 import os
 from pathlib import Path
 from typing import Dict
@@ -6,6 +5,11 @@ from typing import Dict
 from PIL import Image
 import numpy as np
 from ..base_processor import BaseWatermarkProcessor, ProcessorParams
+from ...pipeline.arena import thread_arena
+from ...pipeline.backends import ENHANCE, OVERLAY
+from ...pipeline.kernels import enhance_composite, target_luminance
+from ...pipeline.modes import to_mode
+from ...pipeline.parallel import band_map
 from ..interfaces import IWatermarkConfig
 
 # 参数对象定义
@@ -27,6 +31,8 @@ class NormalParams:
 class NormalWatermarkProcessor(BaseWatermarkProcessor[NormalParams]):
     """常规水印处理器"""
 
+    watermark_type = 'normal'
+
     def __init__(self, config: IWatermarkConfig, npy_path: str):
         super().__init__(config)
         filepath = self.get_resource_path(npy_path)
@@ -58,40 +64,84 @@ class NormalWatermarkProcessor(BaseWatermarkProcessor[NormalParams]):
         try:
             # 加载并预处理图片
             base_image = self.load_image(input_path)
-            scale = params.output_height / base_image.height
-            width = int(base_image.width * scale)
-            base_image = base_image.resize((width, params.output_height))
-            if base_image.mode == "RGB":
-                buffer = io.BytesIO()
-                base_image.save(buffer, format="JPEG", quality=params.quality)
-                buffer.seek(0)
-                base_image = Image.open(buffer)
-            else:
-                # PNG 压缩（无损但有压缩级别）
-                buffer = io.BytesIO()
-                base_image.save(buffer, format="PNG", compress_level=int((100 - params.quality) / 10))  # 最高压缩级别
-                buffer.seek(0)
-                base_image = Image.open(buffer)
-            # # 加载水印数据
-            # npy_path = f"{self._watermark_data}.npy"
-            # npy_data = load_npy(npy_path) * (opacity/100.0)
-            npy_data = self._watermark_data
-            np.resize(npy_data, (params.output_height, params.output_height))
-            if params.enhancement:
-                watermarked = self.enhance_watermark_brightness(base_image, npy_data, final_opacity=params.opacity)
-            else:
-                # 应用水印
-                watermarked = self.overlay_and_crop(base_image, npy_data, final_opacity=float(params.opacity / 100.0))
+            if self._should_stream(base_image):
+                self._process_streaming(base_image, output_path, params.output_height, params.quality, params)
+                return True
+            watermarked = self._render(base_image, output_path, params, input_path)
 
-            if os.path.splitext(output_path)[1] in [".jpeg", ".jpg"]:
-                watermarked = watermarked.convert("RGB")
             # 保存结果
-            watermarked.save(output_path, quality=100)
+            self._save_output(watermarked, output_path)
             return True
         except Exception as e:
             self.logger.exception(f"处理失败: {input_path} - {str(e)}")
+            self._note_failure(e)
             return False
 
+    def _composite(self, base_image: Image.Image, params: NormalParams, backend=None) -> Image.Image:
+        if params.enhancement:
+            return self.enhance_watermark_brightness(base_image, self._watermark_data, final_opacity=params.opacity,
+                                                     backend=backend)
+        # 应用水印
+        return self.overlay_and_crop(base_image, self._watermark_data, final_opacity=float(params.opacity / 100.0),
+                                     backend=backend)
+
+    def _composite_op(self, params: NormalParams) -> str:
+        return ENHANCE if params.enhancement else OVERLAY
+
+    def _supports_group_composite(self, params: NormalParams) -> bool:
+        # 仅 NumPy 浮点增强可堆叠向量化
+        return params.enhancement and self._composite_backend(ENHANCE).name == 'numpy-float'
+
+    def _process_group(self, tasks, params: NormalParams):
+        """同尺寸、同工作模式任务批量处理：逐个解码降质后一次向量化合成，再逐个保存"""
+        flags = [False] * len(tasks)
+        by_size = {}
+        for i, task in enumerate(tasks):
+            try:
+                base_image = self.load_image(task.input_path)
+                plan = self._plan_stages(base_image, task.output_path, params.output_height, params.quality, ENHANCE)
+                base_image = self._prepare_base(
+                    base_image, params.output_height, params.quality, plan, task.input_path, task
+                )
+                base_image = self._to_working_mode(base_image, task.output_path, ENHANCE)
+                by_size.setdefault((base_image.size, base_image.mode), []).append((i, base_image))
+            except Exception as e:
+                self.logger.exception(f"处理失败: {task.input_path} - {str(e)}")
+        for members in by_size.values():
+            merged = self.enhance_watermark_brightness_batch(
+                [base_image for _, base_image in members], final_opacity=params.opacity
+            )
+            for (i, _), watermarked in zip(members, merged):
+                try:
+                    self._save_output(watermarked, tasks[i].output_path)
+                    flags[i] = True
+                except Exception as e:
+                    self.logger.exception(f"保存失败: {tasks[i].output_path} - {str(e)}")
+        return flags
+
+    def _composite_bands(self, bands, params: NormalParams, backend=None):
+        """逐条带合成；增强模式先汇总全图最大亮度，保证与整图处理结果一致"""
+        target_lum = None
+        if params.enhancement:
+            max_bg_lum = max(self.max_background_luminance(band, backend) for band in bands)
+            target_lum = min(max_bg_lum * 1.2, 1.0)
+        width, height = bands[0].width, sum(band.height for band in bands)
+        result, y = None, 0
+        for band in bands:
+            npy_band = self._watermark_data[y:y + band.height]
+            if params.enhancement:
+                merged = self.enhance_watermark_brightness(
+                    band, npy_band, final_opacity=params.opacity, target_lum=target_lum, backend=backend
+                )
+            else:
+                merged = self.overlay_and_crop(band, npy_band, final_opacity=float(params.opacity / 100.0),
+                                               backend=backend)
+            if result is None:
+                result = Image.new(merged.mode, (width, height))
+            result.paste(merged, (0, y))
+            y += band.height
+        return result
+
     # def _validate_params(self, params: T):
     #     # 运行时校验协议实现
     #     if not isinstance(params, ProcessParams):  # 依赖 @runtime_checkable
@@ -102,106 +152,75 @@ class NormalWatermarkProcessor(BaseWatermarkProcessor[NormalParams]):
     #             missing.append('blend_mode')
     #         raise TypeError(f"参数缺少必要属性: {missing}")
 
-    def overlay_and_crop(self, base_image, npy_data, final_opacity=0.75):
-        """叠加水印并裁剪"""
-        # print(f"npy_data.shape = {npy_data.shape}")
-        watermark_image = Image.fromarray(npy_data)
-        # 获取图片和水印的尺寸
-        base_width, base_height = base_image.size
-        watermark_width, watermark_height = watermark_image.size
-
-        # 裁剪水印超出图片的部分
-        if watermark_width > base_width or watermark_height > base_height:
-            watermark_image = watermark_image.crop((0, 0, base_width, base_height))
-        # 设置水印透明度
-        # 假设 watermark 是一个 PIL 图像对象
-        watermark_image = watermark_image.convert("RGBA")  # 确保图像是 RGBA 模式（带有 alpha 通道）
-        # 分离图像的通道
-        r, g, b, a = watermark_image.split()
-
-        # 仅对 alpha 通道进行调整
-        # aaa = np.asarray(a).astype(np.uint8)
-        # a = Image.fromarray(np.trunc(np.where(aaa <= 1, 1, 255*final_opacity)).astype(np.uint8))
-        a = a.point(lambda p: int(p * final_opacity))  # 将 alpha 通道的透明度设置为 final_opacity%
-
-        # 重新合并通道
-        watermark_image = Image.merge("RGBA", (r, g, b, a))
-
-        # 将水印覆盖到图片的左上角
-        base_image.paste(watermark_image, (0, 0), watermark_image)  # 使用alpha通道（如果存在）
-        return base_image
-
-    def enhance_watermark_brightness(self, base_image, npy_data, boost_ratio=1.2, final_opacity=0.5):
+    def overlay_and_crop(self, base_image, npy_data, final_opacity=0.75, backend=None):
+        """叠加水印并裁剪（大图按行切分并行处理；backend 为空时取批次的合成后端）"""
+        backend = backend or self._composite_backend(OVERLAY)
+        return self._composite_rows(
+            base_image, npy_data, lambda band, npy_band: self._overlay_frame(band, npy_band, final_opacity, backend)
+        )
+
+    def _overlay_frame(self, base_image, npy_data, final_opacity, backend=None):
+        """叠加水印并裁剪（alpha 按透明度缩放后的水印按尺寸缓存）"""
+        if npy_data.shape[0] == 0:
+            return base_image
+        watermark = self._prepared_watermark(OVERLAY, npy_data, base_image.size, final_opacity, base_image.mode)
+        return (backend or self._composite_backend(OVERLAY)).overlay(base_image, watermark)
+
+    def max_background_luminance(self, base_image, backend=None):
+        """背景最大亮度（伽马校正后的相对亮度）"""
+        return (backend or self._composite_backend(ENHANCE)).max_luminance(base_image)
+
+    def enhance_watermark_brightness(self, base_image, npy_data, boost_ratio=1.2, final_opacity=0.5, target_lum=None,
+                                     backend=None):
+        """基于背景最大亮度增强水印亮度（大图按行切分并行，目标亮度按全图计算；backend 为空时取批次的合成后端）"""
+        backend = backend or self._composite_backend(ENHANCE)
+        crops = self._row_crops(base_image)
+        if target_lum is None and len(crops) > 1:
+            max_bg_lum = max(band_map(backend.max_luminance, [band for _, band in crops], parallel=True))
+            target_lum = min(max_bg_lum * boost_ratio, 1.0)
+        return self._composite_rows(
+            base_image, npy_data,
+            lambda band, npy_band: self._enhance_frame(band, npy_band, boost_ratio, final_opacity, target_lum, backend),
+            crops
+        )
+
+    def _enhance_frame(self, base_image, npy_data, boost_ratio=1.2, final_opacity=0.5, target_lum=None,
+                       backend=None):
         """
         基于背景最大亮度增强水印亮度
 
         参数：
-        base_image: 背景图（PIL.Image, RGB/RGBA）
+        base_image: 背景图（PIL.Image，工作模式 RGB/RGBA/L/LA）
         watermark_image: 水印图（PIL.Image, RGBA）
         boost_ratio: 亮度提升系数（默认比背景最亮处亮20%）
+        target_lum: 目标亮度（条带处理时由调用方按全图计算后传入）
+        backend: 合成后端（为空时取批次的合成后端）
 
         返回：
-        合成后的PIL.Image (RGBA)
+        合成后的PIL.Image（与背景图模式相同，其他模式返回 RGBA）
         """
-        watermark_image = Image.fromarray(npy_data)
-        base_width, base_height = base_image.size
-        watermark_width, watermark_height = watermark_image.size
-
-        if watermark_width > base_width or watermark_height > base_height:
-            watermark_image = watermark_image.crop((0, 0, base_width, base_height))
-
-        # 统一转换为RGBA格式
-        base = base_image.convert("RGBA")
-        watermark = watermark_image.convert("RGBA")
-
-        # 获取numpy数组并归一化
-        base_arr = np.array(base).astype(np.float32) / 255.0
-        wm_arr = np.array(watermark).astype(np.float32) / 255.0
-
-        # 分离通道
-        base_rgb = base_arr[..., :3]
-        wm_rgb = wm_arr[..., :3]
-        wm_alpha = wm_arr[..., 3]
-
-        # 计算背景最大亮度（伽马校正后）
-        def gamma_correct(rgb):
-            return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
-
-        base_lum = 0.2126 * gamma_correct(base_rgb[..., 0]) + \
-                   0.7152 * gamma_correct(base_rgb[..., 1]) + \
-                   0.0722 * gamma_correct(base_rgb[..., 2])
-        max_bg_lum = np.max(base_lum)  # 获取背景最亮区域亮度
-
-        # 计算需要达到的目标亮度
-        target_lum = min(max_bg_lum * boost_ratio, 1.0)  # 限制不超过最大亮度
-
-        # 计算水印当前亮度
-        wm_current_lum = 0.2126 * gamma_correct(wm_rgb[..., 0]) + \
-                         0.7152 * gamma_correct(wm_rgb[..., 1]) + \
-                         0.0722 * gamma_correct(wm_rgb[..., 2])
-
-        # 亮度缩放因子（仅增强不足的区域）
-        scale = np.where(
-            wm_current_lum < target_lum,
-            (target_lum + 0.05) / (wm_current_lum + 0.05),
-            1.0  # 已经足够亮的区域不调整
-        )
-        scale = np.clip(scale, 1.0, 5.0)  # 限制最大缩放倍率
-
-        # 保持色相调整亮度
-        adjusted_rgb = np.zeros_like(wm_rgb)
-        for c in range(3):
-            adjusted_rgb[..., c] = np.clip(wm_rgb[..., c] * scale, 0, 1)
+        if npy_data.shape[0] == 0:
+            return base_image.convert("RGBA")
+        watermark = self._prepared_watermark(ENHANCE, npy_data, base_image.size)
+        return (backend or self._composite_backend(ENHANCE)).enhance(base_image, watermark, boost_ratio, target_lum)
 
-        # 合成图像（考虑透明度）
-        composite_rgb = adjusted_rgb * wm_alpha[..., np.newaxis] + \
-                        base_rgb * (1 - wm_alpha[..., np.newaxis])
-        composite_a = np.maximum(base_arr[..., 3], wm_alpha)
-
-        # 重组RGBA并输出
-        result = np.concatenate([
-            composite_rgb,
-            composite_a[..., np.newaxis]
-        ], axis=-1)
+    def enhance_watermark_brightness_batch(self, base_images, boost_ratio=1.2, final_opacity=0.5):
+        """
+        同尺寸、同模式图像批量增强合成：堆叠为 (N, H, W, C) 后一次向量化计算
 
-        return Image.fromarray((result * 255).astype(np.uint8))
\ No newline at end of file
+        各图的目标亮度仍按自身背景最大亮度分别计算，结果与逐张处理一致
+        """
+        arena = thread_arena()
+        width, height = base_images[0].size
+        mode = base_images[0].mode
+        kernel_mode = 'RGB' if mode in ('L', 'RGB') else 'RGBA'
+        watermark = self._prepared_watermark(ENHANCE, self._watermark_data, (width, height))
+        base_arr = arena.get('batch_base', (len(base_images), height, width, len(kernel_mode)))
+        for i, img in enumerate(base_images):
+            np.copyto(base_arr[i], np.asarray(img if img.mode == kernel_mode else img.convert(kernel_mode)),
+                      casting='unsafe')
+        np.divide(base_arr, np.float32(255.0), out=base_arr)
+        merged = enhance_composite(
+            base_arr, watermark.unit, target_luminance(base_arr[..., :3], boost_ratio, arena), watermark.lum, arena
+        )
+        return [to_mode(Image.fromarray(arr), mode) for arr in merged]
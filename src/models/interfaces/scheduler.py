@@ -0,0 +1,349 @@
+"""
+多任务调度：多个批处理任务共享一个工作线程池
+
+每个任务使用独立的处理器实例（批次统计、扫描计数、去重结果、编码档位、缓冲区命中等状态互不干扰），
+提交后由少量规划线程按优先级（同优先级按提交顺序）扫描/预扫描/划分处理单元，
+一个大目录的扫描不会挡住后面的加急任务；处理单元由共享工作线程按以下规则取用：
+  1. 优先级高的任务先执行（加急任务优先，低优先级任务在其全部发出后才继续）；
+  2. 同优先级的任务按已获得的服务量（已发出单元的预测成本之和）轮流取用，新加入的任务从当前最小服务量起算，
+     不会因为到得晚而独占线程池；
+  3. 任务内部仍保持最大任务优先的单元顺序。
+在途像素内存预算由全部任务共享。任务状态可随时查询（界面、命令行与 HTTP 服务共用）。
+"""
+import itertools
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+from .base_processor import BaseWatermarkProcessor, _BatchPlan
+from ..pipeline.archive import archive_kind, is_archive_input
+from ..pipeline.arena import set_resident_limit
+from ..pipeline.governor import default_memory_budget, split_memory_budget
+from ..pipeline.results import FAILED as FILE_FAILED, FileResult
+
+QUEUED, PLANNING, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'planning', 'running', 'done', 'failed', 'cancelled'
+# 全部单元已完成、正在生成重复输入的输出与统计报告（此时不能再取消）
+FINISHING = 'finishing'
+_FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class JobStatus:
+    """任务状态快照"""
+    id: int
+    name: str
+    wm_type: str
+    priority: int
+    state: str
+    input_dir: str
+    output_dir: str
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    running: int = 0
+    bytes_written: int = 0
+    queued_seconds: float = 0.0
+    elapsed: float = 0.0
+    eta: Optional[float] = None
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        return (self.succeeded + self.failed) / self.total if self.total else 0.0
+
+    def to_dict(self) -> dict:
+        return {**self.__dict__, 'progress': round(self.progress, 4)}
+
+
+@dataclass
+class _Job:
+    id: int
+    name: str
+    wm_type: str
+    priority: int
+    input_dir: Path
+    output_dir: Path
+    kwargs: dict
+    submitted: float
+    state: str = QUEUED
+    processor: Optional[BaseWatermarkProcessor] = None
+    final_params: object = None
+    plan: Optional[_BatchPlan] = None
+    units: Deque = field(default_factory=deque)
+    # 已发出单元的预测成本之和（同优先级按此轮流）
+    served: float = 0.0
+    started: float = 0.0
+    finished: float = 0.0
+    running: int = 0
+    total: int = 0
+    counts: Counter = field(default_factory=Counter)
+    stage_seconds: Counter = field(default_factory=Counter)
+    bytes_written: int = 0
+    outputs: List[Path] = field(default_factory=list)
+    primaries: set = field(default_factory=set)
+    succeeded_primaries: set = field(default_factory=set)
+    error: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class JobScheduler:
+    """多任务调度器：优先级 + 同优先级公平轮转，共享工作线程池"""
+
+    def __init__(self, create_processor: Callable[[str], BaseWatermarkProcessor], workers: int = None,
+                 memory_budget_mb: int = 0, planners: int = 2):
+        self._create_processor = create_processor
+        self.workers = workers or os.cpu_count() or 4
+        budget_bytes = memory_budget_mb * 1024 * 1024 or default_memory_budget()
+        self._memory_budget = split_memory_budget(budget_bytes)
+        # 线程临时缓冲区的常驻上限同样按调度器的预算（规划任务时处理器会按自身参数改写，规划后恢复）
+        self._arena_limit = budget_bytes - self._memory_budget.budget
+        self._jobs: Dict[int, _Job] = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._closed = False
+        # 规划（扫描、预扫描、去重）在独立的规划线程中进行，不占用处理线程；规划线程数有上限，避免同时扫描过多目录
+        self._planning: List[_Job] = []
+        self._threads = [threading.Thread(target=self._plan_loop, name=f"job-planner-{i}", daemon=True)
+                         for i in range(max(1, planners))]
+        self._threads += [threading.Thread(target=self._work_loop, name=f"job-worker-{i}", daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------------------------- 提交与查询 ----------------------------
+    def submit(self, wm_type: str, input_dir: Path, output_dir: Path, priority: int = 0, name: str = None,
+               **kwargs) -> int:
+        """提交批处理任务，返回任务编号；priority 越大越先执行，kwargs 同 process_batch 的处理参数"""
+        input_dir, output_dir = Path(input_dir), Path(output_dir)
+        if is_archive_input(input_dir) or archive_kind(output_dir) is not None:
+            raise ValueError("调度任务暂不支持压缩包输入/输出，请直接使用 process_batch")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            job = _Job(next(self._ids), name or input_dir.name, wm_type, priority, input_dir, output_dir,
+                       kwargs, time.perf_counter())
+            self._jobs[job.id] = job
+            self._planning.append(job)
+            self._cond.notify_all()
+        return job.id
+
+    def status(self, job_id: int) -> JobStatus:
+        """任务状态快照（任务不存在时抛出 KeyError）"""
+        with self._cond:
+            return self._status(self._jobs[job_id])
+
+    def jobs(self) -> List[JobStatus]:
+        """全部任务的状态（按提交顺序）"""
+        with self._cond:
+            return [self._status(job) for job in self._jobs.values()]
+
+    def set_priority(self, job_id: int, priority: int):
+        """调整优先级（对尚未规划的任务和尚未发出的单元生效）"""
+        with self._cond:
+            self._jobs[job_id].priority = priority
+            self._cond.notify_all()
+
+    def cancel(self, job_id: int) -> bool:
+        """取消任务：未发出的单元不再执行，处理中的文件完成后结束；任务已结束时返回 False"""
+        with self._cond:
+            job = self._jobs[job_id]
+            if job.state in _FINAL_STATES or job.state == FINISHING:
+                return False
+            job.error = "已取消"
+            job.units.clear()
+            # 规划中的任务在规划完成后结束，有处理中单元的任务由最后完成的工作线程结束
+            if job.state == QUEUED or (job.state == RUNNING and not job.running):
+                job.state = CANCELLED
+                self._close_job(job)
+            return True
+
+    def wait(self, job_id: int, timeout: float = None) -> List[Path]:
+        """等待任务结束，返回成功输出的路径列表（超时抛出 TimeoutError）"""
+        job = self._jobs[job_id]
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"任务 {job_id} 未在 {timeout}s 内完成")
+        return list(job.outputs)
+
+    def shutdown(self, wait: bool = True):
+        """
+        停止接受新任务；wait 为 True 时等待已提交的任务全部完成，否则取消未完成的任务。
+        任务全部结束后规划线程与工作线程退出，返回前等待它们结束
+        """
+        with self._cond:
+            self._closed = True
+            jobs = list(self._jobs.values())
+            self._cond.notify_all()
+        if not wait:
+            for job in jobs:
+                self.cancel(job.id)
+        for job in jobs:
+            job.done.wait()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _status(self, job: _Job) -> JobStatus:
+        now = time.perf_counter()
+        finished = job.counts[True] + job.counts[False]
+        elapsed = ((job.finished or now) - job.started) if job.started else 0.0
+        eta = None
+        if job.state == RUNNING and finished:
+            eta = elapsed / finished * (job.total - finished)
+        return JobStatus(
+            job.id, job.name, job.wm_type, job.priority, job.state, str(job.input_dir), str(job.output_dir),
+            job.total, job.counts[True], job.counts[False], job.running, job.bytes_written,
+            (job.started or job.finished or now) - job.submitted, elapsed, eta, dict(job.stage_seconds), job.error
+        )
+
+    # ---------------------------- 规划 ----------------------------
+    def _plan_loop(self):
+        while True:
+            with self._cond:
+                while not self._planning:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                # 优先级高的任务先规划，同优先级按提交顺序
+                job = min(self._planning, key=lambda job: (-job.priority, job.id))
+                self._planning.remove(job)
+                if job.state == CANCELLED:
+                    continue
+                job.state = PLANNING
+            self._plan(job)
+
+    def _plan(self, job: _Job):
+        try:
+            processor = self._create_processor(job.wm_type)
+            params, final_params, _ = processor._start_batch(job.input_dir, job.output_dir, job.kwargs)
+            plan = processor._plan_batch(job.input_dir, job.output_dir, params, final_params)
+            if plan is not None:
+                # 在途内存预算由全部任务共享
+                processor._memory_budget = self._memory_budget
+            set_resident_limit(self._arena_limit)
+        except Exception as e:
+            with self._cond:
+                job.state, job.error = FAILED, f"{type(e).__name__}: {e}"
+                self._close_job(job)
+            return
+        with self._cond:
+            job.processor, job.final_params, job.plan = processor, final_params, plan
+            job.started = time.perf_counter()
+            if job.error:  # 规划期间被取消
+                job.state = CANCELLED
+                self._close_job(job)
+                return
+            if plan is None:
+                job.state = DONE
+                self._close_job(job)
+                return
+            job.total = len(plan.tasks) + processor._dedup.duplicate_count
+            job.primaries = processor._dedup_primaries()
+            job.units.extend(plan.units)
+            # 新任务从同优先级活跃任务的最小服务量起算
+            peers = [other.served for other in self._jobs.values()
+                     if other is not job and other.state == RUNNING and other.priority == job.priority]
+            job.served = min(peers, default=0.0)
+            job.state = RUNNING
+            processor.logger.info(
+                f"调度任务开始 | 编号: {job.id} | 名称: {job.name} | 优先级: {job.priority} | "
+                f"文件: {job.total} 个 | 处理单元: {len(job.units)} 个"
+            )
+            self._cond.notify_all()
+
+    # ---------------------------- 执行 ----------------------------
+    def _next_unit(self):
+        """选择下一个单元：最高优先级中服务量最小的任务（调用方持有锁）"""
+        runnable = [job for job in self._jobs.values() if job.state == RUNNING and job.units]
+        if not runnable:
+            return None, None
+        job = min(runnable, key=lambda job: (-job.priority, job.served, job.id))
+        unit = job.units.popleft()
+        # 预测成本为 0（读取文件头失败）的单元按 1 计，保证轮转推进
+        job.served += max(unit.cost, 1.0)
+        job.running += 1
+        return job, unit
+
+    def _idle(self) -> bool:
+        """调度器已关闭且没有未结束的任务（调用方持有锁）"""
+        return self._closed and all(job.state in _FINAL_STATES for job in self._jobs.values())
+
+    def _work_loop(self):
+        while True:
+            with self._cond:
+                job, unit = self._next_unit()
+                while job is None:
+                    if self._idle():
+                        return
+                    self._cond.wait()
+                    job, unit = self._next_unit()
+            try:
+                records = job.processor._run_unit(unit, job.final_params)
+            except Exception as e:
+                job.processor.logger.error(f"调度单元失败 | 任务: {job.id} | {type(e).__name__}: {e}", exc_info=True)
+                tasks = getattr(unit, 'tasks', [unit])
+                records = [FileResult(FILE_FAILED, task.input_path, task.output_path, error=f"{type(e).__name__}: {e}")
+                           for task in tasks]
+            with self._cond:
+                job.running -= 1
+                for record in records:
+                    self._record(job, record)
+                # 完成最后一个单元的线程在锁内标记收尾，之后的取消不再结束该任务，收尾只执行一次
+                finished = not job.units and not job.running and job.state == RUNNING
+                if finished:
+                    job.state = FINISHING
+            if finished:
+                self._finish(job)
+
+    def _record(self, job: _Job, record: FileResult):
+        """累计任务自己的统计（调用方持有锁）"""
+        job.counts[record.ok] += 1
+        job.bytes_written += record.bytes_written
+        job.stage_seconds.update(record.timings)
+        if record.ok:
+            job.outputs.append(record.output_path)
+            if record.output_path in job.primaries:
+                job.succeeded_primaries.add(record.output_path)
+
+    def _finish(self, job: _Job):
+        """生成重复输入的输出并输出该任务的统计报告"""
+        processor = job.processor
+        if not job.error:
+            try:
+                duplicates = processor._finish_batch(job.plan, job.succeeded_primaries)
+            except Exception as e:
+                processor.logger.error(f"调度任务收尾失败 | 任务: {job.id} | {type(e).__name__}: {e}", exc_info=True)
+                duplicates = []
+            with self._cond:
+                for record in duplicates:
+                    self._record(job, record)
+        with self._cond:
+            job.finished = time.perf_counter()
+            job.state = CANCELLED if job.error else DONE
+            status = self._status(job)
+            self._close_job(job)
+        processor.logger.info(
+            f"调度任务结束 | 编号: {job.id} | 状态: {status.state} | 成功: {status.succeeded} | "
+            f"失败: {status.failed} | 排队: {status.queued_seconds:.2f}s | 耗时: {status.elapsed:.2f}s"
+        )
+        processor._summarize_batch(status.total, status.succeeded, job.started)
+
+    def _close_job(self, job: _Job):
+        """结束任务（调用方持有锁）：唤醒等待方"""
+        job.finished = job.finished or time.perf_counter()
+        job.units.clear()
+        job.done.set()
+        self._cond.notify_all()
+
+    def print_jobs(self):
+        """打印全部任务的状态表"""
+        print("\n======== 调度任务状态 ========")
+        for status in self.jobs():
+            eta = f" | 预计剩余: {status.eta:.0f}s" if status.eta is not None else ""
+            print(f"#{status.id} {status.name} [{status.wm_type}] 优先级 {status.priority} | {status.state} | "
+                  f"进度: {status.succeeded + status.failed}/{status.total} ({status.progress:.0%}) | "
+                  f"失败: {status.failed} | 耗时: {status.elapsed:.1f}s{eta}")
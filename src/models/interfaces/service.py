@@ -0,0 +1,402 @@
+"""
+本地 HTTP 水印服务
+
+常驻进程内为每种水印类型保留一个已加载的处理器（水印数据、预处理水印缓存、合成后端基准结果均跨请求复用），
+请求体为编码后的图像字节（或查询参数 path 指定的本地文件），返回加水印后的编码字节，不读写临时文件。
+
+    POST /watermark/<类型>?opacity=60&format=webp   请求体为图像字节
+    POST /watermark/<类型>?path=/照片/a.jpg          读取本地文件（需配置 path_root）
+    GET  /metrics                                     实时吞吐量/延迟统计（JSON）
+    GET  /health                                      存活检查与可用类型
+    POST /jobs                                        提交调度任务（JSON：type、input、output、priority、name、params）
+    GET  /jobs、/jobs/<编号>                          调度任务状态；DELETE /jobs/<编号> 取消任务
+
+其余查询参数只接受该类型的图像参数（透明度、输出高度、质量等，同类型配置的 params），覆盖其默认值；
+像素上限、内存预算、底图缓存、编码档位、大小上限等处理器级设置只取服务自身的配置，请求中出现时返回 400
+（调度任务 JSON 中的 params 同此规则）。调度任务的输入/输出目录须在 path_root 内。连接保持（HTTP/1.1 keep-alive），
+同时处理的请求数受 max_concurrency 限制，超过的请求排队等待，等待超过 queue_timeout 返回 503。
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from .base_processor import BaseWatermarkProcessor
+from .scheduler import JobScheduler
+
+# 查询参数中不属于处理参数的键
+_RESERVED = ('format', 'path', 'output_dir')
+# 吞吐量与延迟分位数的统计窗口（秒）
+_WINDOW = 60.0
+_CONTENT_TYPES = {
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+}
+
+
+def _content_type(data: bytes) -> str:
+    """按文件头判断输出的 MIME 类型"""
+    for magic, content_type in _CONTENT_TYPES.items():
+        if data.startswith(magic):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis'):
+        return 'image/avif'
+    return 'application/octet-stream'
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ServiceMetrics:
+    """服务运行统计（线程安全）：累计计数 + 最近窗口内的吞吐量与延迟分位数"""
+
+    def __init__(self, window: float = _WINDOW, history: int = 4096):
+        self._window = window
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        # 最近完成的请求：(完成时间, 总延迟, 排队等待)
+        self._recent = deque(maxlen=history)
+        self._status = Counter()
+        self._types = Counter()
+        self.in_flight = 0
+        self.queued = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def enter_queue(self):
+        with self._lock:
+            self.queued += 1
+
+    def start(self):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def reject(self):
+        with self._lock:
+            self.queued -= 1
+            self._status[HTTPStatus.SERVICE_UNAVAILABLE] += 1
+
+    def finish(self, wm_type: str, status: int, latency: float, wait: float, bytes_in: int, bytes_out: int):
+        with self._lock:
+            self.in_flight -= 1
+            self._status[status] += 1
+            self._types[wm_type] += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            if status == HTTPStatus.OK:
+                self._recent.append((time.monotonic(), latency, wait))
+
+    def record_status(self, status: int):
+        """未进入处理的请求（参数/路径错误等）"""
+        with self._lock:
+            self._status[status] += 1
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            recent = [(latency, wait) for end, latency, wait in self._recent if end >= now - self._window]
+            status, types = dict(self._status), dict(self._types)
+            in_flight, queued, bytes_in, bytes_out = self.in_flight, self.queued, self.bytes_in, self.bytes_out
+        uptime = now - self._started
+        latencies = sorted(latency for latency, _ in recent)
+        return {
+            'uptime_s': round(uptime, 1),
+            'requests': sum(status.values()),
+            'status': {str(code): count for code, count in sorted(status.items())},
+            'types': types,
+            'in_flight': in_flight,
+            'queued': queued,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'window_s': self._window,
+            'throughput_rps': round(len(recent) / min(self._window, max(uptime, 1e-3)), 3),
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 0.50) * 1000, 1),
+                'p90': round(_percentile(latencies, 0.90) * 1000, 1),
+                'p99': round(_percentile(latencies, 0.99) * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                'mean_queue_wait': round(sum(wait for _, wait in recent) / len(recent) * 1000, 1) if recent else 0.0,
+            },
+        }
+
+
+class _ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class WatermarkService:
+    """本地 HTTP 水印服务：处理器常驻复用，请求级并发限制"""
+
+    def __init__(self, processors: Dict[str, BaseWatermarkProcessor], max_concurrency: int = None,
+                 queue_timeout: float = 30.0, max_body_mb: int = 200, path_root: Path = None,
+                 idle_timeout: float = 30.0, scheduler: JobScheduler = None):
+        if not processors:
+            raise ValueError("水印服务至少需要一种水印类型")
+        self._processors = processors
+        self._logger = next(iter(processors.values())).logger
+        self.max_concurrency = max_concurrency or os.cpu_count() or 4
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._queue_timeout = queue_timeout
+        self._max_body = max_body_mb * 1024 * 1024
+        self._path_root = Path(path_root).resolve() if path_root else None
+        self._idle_timeout = idle_timeout
+        self._scheduler = scheduler
+        self.metrics = ServiceMetrics()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def warm_up(self):
+        """每种类型按默认输出高度处理一张合成图，预先完成水印预处理与合成后端基准"""
+        for wm_type, processor in self._processors.items():
+            start = time.perf_counter()
+            height = processor._single_params()[0].output_height
+            processor.process_array(np.full((height, height * 4 // 3, 3), 128, np.uint8))
+            self._logger.info(f"服务预热完成 | 类型: {wm_type} | 耗时: {time.perf_counter() - start:.2f}s")
+
+    def _processor(self, wm_type: str) -> BaseWatermarkProcessor:
+        processor = self._processors.get(wm_type)
+        if processor is None:
+            raise _ServiceError(HTTPStatus.NOT_FOUND, f"未知的水印类型: {wm_type}（可用: {', '.join(self._processors)}）")
+        return processor
+
+    @staticmethod
+    def _request_params(processor: BaseWatermarkProcessor, params: dict) -> dict:
+        """请求中的处理参数：只接受图像参数，处理器级设置不允许由客户端修改"""
+        rejected = sorted(set(params) - set(processor.image_param_names))
+        if rejected:
+            raise _ServiceError(
+                HTTPStatus.BAD_REQUEST,
+                f"不接受的参数: {', '.join(rejected)}（可用: {', '.join(processor.image_param_names)}）"
+            )
+        return params
+
+    def process(self, wm_type: str, data: bytes, query: Dict[str, str]) -> bytes:
+        """按类型与查询参数处理图像字节（在并发限制内执行）"""
+        processor = self._processor(wm_type)
+        params = self._request_params(
+            processor, {key: value for key, value in query.items() if key not in _RESERVED}
+        )
+        try:
+            return processor.process_bytes(data, params, query.get('format'))
+        except (ValueError, OSError, Image.DecompressionBombError) as e:
+            raise _ServiceError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+
+    def _local_path(self, raw: str) -> Path:
+        if self._path_root is None:
+            raise _ServiceError(HTTPStatus.FORBIDDEN, "服务未配置 path_root，不接受本地路径")
+        path = Path(raw).resolve()
+        if not path.is_relative_to(self._path_root):
+            raise _ServiceError(HTTPStatus.FORBIDDEN, f"路径不在允许的目录内: {raw}")
+        return path
+
+    def _read_path(self, raw: str) -> bytes:
+        path = self._local_path(raw)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            raise _ServiceError(HTTPStatus.NOT_FOUND, f"文件不存在: {raw}")
+        except OSError as e:
+            raise _ServiceError(HTTPStatus.BAD_REQUEST, f"读取失败: {raw} | {e}")
+
+    def handle_watermark(self, wm_type: str, body: bytes, query: Dict[str, str]) -> bytes:
+        """排队获取处理名额后处理；超时返回 503"""
+        received = time.perf_counter()
+        try:
+            self._processor(wm_type)
+            data = self._read_path(query['path']) if 'path' in query else body
+            if not data:
+                raise _ServiceError(HTTPStatus.BAD_REQUEST, "请求体为空（需为图像字节，或以 path 指定本地文件）")
+        except _ServiceError as e:
+            self.metrics.record_status(e.status)
+            raise
+        self.metrics.enter_queue()
+        if not self._slots.acquire(timeout=self._queue_timeout):
+            self.metrics.reject()
+            raise _ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, f"服务繁忙，排队超过 {self._queue_timeout:.0f}s")
+        wait = time.perf_counter() - received
+        self.metrics.start()
+        status, output = HTTPStatus.INTERNAL_SERVER_ERROR, b''
+        try:
+            output = self.process(wm_type, data, query)
+            status = HTTPStatus.OK
+            return output
+        except _ServiceError as e:
+            status = e.status
+            raise
+        finally:
+            self._slots.release()
+            self.metrics.finish(wm_type, status, time.perf_counter() - received, wait, len(data), len(output))
+
+    def _job_scheduler(self) -> JobScheduler:
+        if self._scheduler is None:
+            raise _ServiceError(HTTPStatus.NOT_FOUND, "服务未启用任务调度")
+        return self._scheduler
+
+    def submit_job(self, body: bytes) -> dict:
+        """提交调度任务：请求体为 JSON，返回任务状态"""
+        scheduler = self._job_scheduler()
+        try:
+            request = json.loads(body or b'{}')
+            wm_type, input_dir, output_dir = request['type'], request['input'], request['output']
+        except (ValueError, KeyError, TypeError) as e:
+            raise _ServiceError(HTTPStatus.BAD_REQUEST, f"任务请求需为含 type、input、output 的 JSON: {e}")
+        processor = self._processor(wm_type)
+        try:
+            params = self._request_params(processor, dict(request.get('params') or {}))
+            job_id = scheduler.submit(
+                wm_type, self._local_path(input_dir), self._local_path(output_dir), int(request.get('priority', 0)),
+                request.get('name'), **params
+            )
+        except (ValueError, TypeError) as e:
+            raise _ServiceError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        return scheduler.status(job_id).to_dict()
+
+    def job_status(self, job_id: str = None):
+        """任务状态：给定编号返回单个任务，否则返回全部任务"""
+        scheduler = self._job_scheduler()
+        if job_id is None:
+            return {'jobs': [status.to_dict() for status in scheduler.jobs()]}
+        try:
+            return scheduler.status(int(job_id)).to_dict()
+        except (ValueError, KeyError):
+            raise _ServiceError(HTTPStatus.NOT_FOUND, f"任务不存在: {job_id}")
+
+    def cancel_job(self, job_id: str) -> dict:
+        scheduler = self._job_scheduler()
+        try:
+            cancelled = scheduler.cancel(int(job_id))
+        except (ValueError, KeyError):
+            raise _ServiceError(HTTPStatus.NOT_FOUND, f"任务不存在: {job_id}")
+        return {**scheduler.status(int(job_id)).to_dict(), 'cancelled': cancelled}
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 空闲连接的保持时长
+            timeout = service._idle_timeout
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self._send(status, body, "application/json; charset=utf-8", headers)
+
+            def _send_error(self, error: _ServiceError):
+                headers = {"Retry-After": "1"} if error.status == HTTPStatus.SERVICE_UNAVAILABLE else None
+                self._send_json(error.status, {'error': str(error)}, headers)
+
+            def _send_result(self, handler, *args):
+                try:
+                    self._send_json(HTTPStatus.OK, handler(*args))
+                except _ServiceError as e:
+                    self._send_error(e)
+
+            def do_GET(self):
+                route = urlsplit(self.path).path.rstrip('/')
+                parts = route.strip('/').split('/')
+                if route == '/metrics':
+                    self._send_json(HTTPStatus.OK, service.metrics.snapshot())
+                elif route == '/health':
+                    self._send_json(HTTPStatus.OK, {'status': 'ok', 'types': list(service._processors)})
+                elif parts[0] == 'jobs' and len(parts) <= 2:
+                    self._send_result(service.job_status, *parts[1:])
+                else:
+                    self._send_json(HTTPStatus.NOT_FOUND, {'error': f"未知路径: {route}"})
+
+            def do_DELETE(self):
+                parts = urlsplit(self.path).path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'jobs':
+                    self._send_result(service.cancel_job, parts[1])
+                else:
+                    self._send_json(HTTPStatus.NOT_FOUND, {'error': f"未知路径: {self.path}"})
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip('/').split('/')
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > service._max_body:
+                    # 不读取超限的请求体，直接关闭连接
+                    self.close_connection = True
+                    service.metrics.record_status(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                    self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                    {'error': f"请求体超过上限 {service._max_body // (1024 * 1024)}MB"})
+                    return
+                body = self.rfile.read(length) if length else b''
+                if parts == ['jobs']:
+                    self._send_result(service.submit_job, body)
+                    return
+                if len(parts) != 2 or parts[0] != 'watermark':
+                    service.metrics.record_status(HTTPStatus.NOT_FOUND)
+                    self._send_json(HTTPStatus.NOT_FOUND, {'error': f"未知路径: {url.path}"})
+                    return
+                try:
+                    output = service.handle_watermark(parts[1], body, dict(parse_qsl(url.query)))
+                except _ServiceError as e:
+                    self._send_error(e)
+                    return
+                except Exception as e:
+                    service._logger.error(f"服务请求失败 | {self.path} | {type(e).__name__}: {e}", exc_info=True)
+                    self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(e).__name__}: {e}"})
+                    return
+                self._send(HTTPStatus.OK, output, _content_type(output))
+
+            def log_message(self, format, *args):
+                # 访问日志不逐条输出，统计见 /metrics
+                pass
+
+        return Handler
+
+    def start(self, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+        """绑定端口并在后台线程中开始服务，返回服务器对象（server_address 为实际地址）"""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="watermark-service", daemon=True).start()
+        self._logger.info(
+            f"水印服务已启动 | 地址: http://{host}:{self._server.server_address[1]} | "
+            f"类型: {', '.join(self._processors)} | 并发上限: {self.max_concurrency}"
+        )
+        return self._server
+
+    def serve_forever(self, host: str = "127.0.0.1", port: int = 8765):
+        """前台运行直到 Ctrl+C"""
+        self.start(host, port)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._logger.info(f"水印服务已停止 | 统计: {json.dumps(self.metrics.snapshot(), ensure_ascii=False)}")
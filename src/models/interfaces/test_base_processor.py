@@ -0,0 +1,93 @@
+# test_base_processor.py
+import asyncio
+import contextlib
+import os
+import shutil
+
+import pytest
+
+from src.models.conftest import write_image
+from src.models.pipeline.results import DUPLICATE, FAILED, OK
+
+
+def test_failed_input_leaves_no_output_directory(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    write_image(input_dir / "good" / "a.jpg")
+    (input_dir / "broken").mkdir()
+    (input_dir / "broken" / "b.jpg").write_bytes(b"\xff\xd8\xff\xe0 truncated")
+
+    records = {record.input_path.name: record for record in processor.process_iter(input_dir, output_dir)}
+
+    assert records['a.jpg'].status == OK and (output_dir / "good" / "a.jpg").exists()
+    assert records['b.jpg'].status == FAILED
+    assert not (output_dir / "broken").exists()
+
+
+def test_dedup_primary_is_first_input_by_path(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    source = write_image(tmp_path / "source.jpg")
+    for name in ("c/z.jpg", "a/y.jpg", "b/x.jpg"):
+        (input_dir / name).parent.mkdir(parents=True)
+        shutil.copy(source, input_dir / name)
+
+    for _ in range(2):
+        records = {record.input_path.relative_to(input_dir).as_posix(): record.status
+                   for record in processor.process_iter(input_dir, output_dir)}
+        assert records == {'a/y.jpg': OK, 'b/x.jpg': DUPLICATE, 'c/z.jpg': DUPLICATE}
+
+
+def test_chunked_iter_reports_whole_batch(tmp_path, make_processor):
+    input_dir = tmp_path / "in"
+    for i in range(5):
+        write_image(input_dir / f"{i}.jpg", size=(200 + 40 * i, 120), seed=i)
+
+    batch = make_processor('normal')
+    batch.process_batch(input_dir, tmp_path / "batch")
+    chunked = make_processor('normal')
+    records = list(chunked.process_iter(input_dir, tmp_path / "iter", chunk_size=2))
+
+    assert len(records) == 5 and all(record.ok for record in records)
+    assert chunked._schedule_stats['total_cost'] == pytest.approx(batch._schedule_stats['total_cost'])
+    assert chunked._schedule_stats['workers'] == min(os.cpu_count() or 4, 2)
+
+
+def test_batch_apis_share_unit_loop(tmp_path, make_processor, monkeypatch):
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        write_image(input_dir / name, seed=ord(name[0]))
+    run_unit = processor._run_unit
+
+    def flaky(unit, params):
+        if getattr(unit, 'input_path', None) and unit.input_path.name == 'b.jpg':
+            raise RuntimeError("boom")
+        return run_unit(unit, params)
+
+    monkeypatch.setattr(processor, '_run_unit', flaky)
+
+    async def collect():
+        return [record async for record in processor.process_batch_async(input_dir, tmp_path / "async")]
+
+    expected = {'a.jpg': OK, 'b.jpg': FAILED, 'c.jpg': OK}
+    for records in (asyncio.run(collect()), list(processor.process_iter(input_dir, tmp_path / "iter"))):
+        assert {record.input_path.name: record.status for record in records} == expected
+    outputs = processor.process_batch(input_dir, tmp_path / "batch")
+    assert sorted(path.name for path in outputs) == ['a.jpg', 'c.jpg']
+
+
+def test_async_batch_closed_early(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    for i in range(6):
+        write_image(input_dir / f"{i}.jpg", seed=i)
+
+    async def first():
+        async with contextlib.aclosing(processor.process_batch_async(input_dir, tmp_path / "out",
+                                                                     max_concurrency=1)) as records:
+            async for record in records:
+                return record
+
+    assert asyncio.run(first()).ok
+    assert len(list(processor.process_iter(input_dir, tmp_path / "again"))) == 6
@@ -0,0 +1,53 @@
+# test_fanout.py
+import numpy as np
+from PIL import Image
+
+from src.models.conftest import write_image
+from src.models.interfaces.fanout import FanOutBatch, FanOutVariant
+
+
+def _pixels(path):
+    with Image.open(path) as image:
+        return image.size, np.asarray(image)
+
+
+def test_fanout_matches_per_type_batches(tmp_path, make_processor):
+    # 雾化水印的输出高度取自类型配置（与参数默认值不同），扇出必须与批处理一致
+    processors = {'normal': make_processor('normal'), 'foggy': make_processor('foggy', output_height=120)}
+    input_dir = tmp_path / "in"
+    write_image(input_dir / "a.jpg", size=(300, 200))
+    write_image(input_dir / "sub" / "b.png", size=(200, 260), mode="RGBA", seed=1)
+    variants = [
+        FanOutVariant('normal', {'enhancement': True}, tmp_path / "fan" / "normal-large"),
+        FanOutVariant('normal', {'output_height': 100, 'enhancement': False}, tmp_path / "fan" / "normal-small"),
+        FanOutVariant('foggy', {}, tmp_path / "fan" / "foggy"),
+    ]
+
+    outputs = FanOutBatch(processors).run(input_dir, variants)
+
+    assert [len(paths) for paths in outputs] == [2, 2, 2]
+    for variant in variants:
+        expected_dir = tmp_path / "batch" / variant.output_dir.name
+        processors[variant.wm_type].process_batch(input_dir, expected_dir, **variant.params)
+        for name in ("a.jpg", "sub/b.png"):
+            assert _pixels(variant.output_dir / name)[0] == _pixels(expected_dir / name)[0]
+            assert np.array_equal(_pixels(variant.output_dir / name)[1], _pixels(expected_dir / name)[1])
+    assert _pixels(tmp_path / "fan" / "foggy" / "a.jpg")[0][1] == 120
+
+
+def test_fanout_variant_target_size(tmp_path, make_processor):
+    processors = {'normal': make_processor('normal')}
+    input_dir = tmp_path / "in"
+    for i in range(3):
+        write_image(input_dir / f"{i}.jpg", size=(400, 300), seed=i)
+    variants = [
+        FanOutVariant('normal', {'target_size_kb': 8}, tmp_path / "small"),
+        FanOutVariant('normal', {}, tmp_path / "plain"),
+    ]
+
+    outputs = FanOutBatch(processors).run(input_dir, variants)
+
+    assert [len(paths) for paths in outputs] == [3, 3]
+    for path in outputs[0]:
+        assert path.stat().st_size <= 8 * 1024
+    assert any(path.stat().st_size > 8 * 1024 for path in outputs[1])
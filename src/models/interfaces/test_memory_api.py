@@ -0,0 +1,82 @@
+# test_memory_api.py
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.models.conftest import write_image
+
+
+def _single(processor, input_path, output_path, overrides=None):
+    _, final_params = processor._single_params(overrides)
+    assert processor.process_single(input_path, output_path, final_params)
+    return output_path.read_bytes()
+
+
+@pytest.mark.parametrize("wm_type", ["normal", "foggy"])
+@pytest.mark.parametrize("name", ["a.jpg", "b.png"])
+def test_process_bytes_equals_process_single(tmp_path, make_processor, wm_type, name):
+    processor = make_processor(wm_type)
+    source = write_image(tmp_path / name, size=(300, 200), mode="RGBA" if name.endswith(".png") else "RGB")
+
+    expected = _single(make_processor(wm_type), source, tmp_path / "out" / name)
+
+    assert processor.process_bytes(source.read_bytes()) == expected
+
+
+def test_memory_calls_ignore_batch_state(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    source = write_image(input_dir / "a.jpg", size=(300, 200))
+    # 批次设置与内存调用不同：大小上限、条带流式阈值、合成后端、编码档位
+    processor.process_batch(input_dir, tmp_path / "batch", target_size_kb=2, stream_threshold_mp=0,
+                            composite_backend='numpy-float', output_profile='webp', enhancement=True)
+
+    expected = _single(make_processor('normal'), source, tmp_path / "out" / "a.jpg")
+
+    assert processor.process_bytes(source.read_bytes()) == expected
+
+
+def test_process_array_matches_process_single(tmp_path, make_processor):
+    processor = make_processor('normal')
+    source = write_image(tmp_path / "a.png", size=(300, 200), mode="RGBA")
+    with Image.open(io.BytesIO(_single(processor, source, tmp_path / "out" / "a.png"))) as expected:
+        with Image.open(source) as image:
+            result = processor.process_array(np.asarray(image))
+        assert np.array_equal(result, np.asarray(expected))
+
+
+def test_memory_call_rejects_bad_backend_and_oversized_input(tmp_path, make_processor):
+    processor = make_processor('normal')
+    data = write_image(tmp_path / "a.jpg").read_bytes()
+    with pytest.raises(ValueError, match="未知的合成后端"):
+        processor.process_bytes(data, {'composite_backend': 'bogus'})
+    with pytest.raises(ValueError, match="超过上限"):
+        processor.process_bytes(data, {'max_image_mp': 0})
+    with pytest.raises(ValueError, match="超过上限"):
+        processor.process_array(np.zeros((10, 10, 3), dtype=np.uint8), {'max_image_mp': 0})
+
+
+def test_memory_calls_leave_batch_counters_and_parallelism_alone(tmp_path, make_processor, monkeypatch):
+    from src.models.interfaces import base_processor
+
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    source = write_image(input_dir / "a.jpg", size=(300, 200))
+    monkeypatch.setattr(base_processor, 'choose_intra_parallelism', lambda *args, **kwargs: 4)
+    monkeypatch.setattr(base_processor, 'INTRA_MIN_PIXELS', 0)
+    processor.process_batch(input_dir, tmp_path / "batch")
+    plan_stats, mode_stats = dict(processor._plan_stats), dict(processor._mode_stats)
+    assert processor._intra_parallelism == 4 and plan_stats and mode_stats
+    crops = []
+    row_crops = processor._row_crops
+    monkeypatch.setattr(processor, '_row_crops', lambda image: crops.append(row_crops(image)) or crops[-1])
+
+    processor.process_bytes(source.read_bytes())
+    processor.process_array(np.zeros((200, 300, 3), dtype=np.uint8))
+    # 条带流式路径
+    processor.process_array(np.zeros((1100, 1000, 3), dtype=np.uint8), {'stream_threshold_mp': 1})
+
+    assert processor._plan_stats == plan_stats and processor._mode_stats == mode_stats
+    assert crops and all(len(parts) == 1 for parts in crops)
@@ -0,0 +1,111 @@
+# test_pixel_identity.py
+"""批处理的各执行方式（条带流式、文件内条带并行、批量合成组）与逐张处理的输出逐像素一致"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.models.conftest import write_image
+from src.models.interfaces import base_processor
+from src.models.pipeline import streaming
+
+
+def _pixels(source):
+    with Image.open(source) as image:
+        return image.mode, image.size, np.asarray(image)
+
+
+def _assert_same(output, expected: bytes):
+    mode, size, pixels = _pixels(output)
+    expected_mode, expected_size, expected_pixels = _pixels(io.BytesIO(expected))
+    assert (mode, size) == (expected_mode, expected_size)
+    assert np.array_equal(pixels, expected_pixels), output
+
+
+def _band_rows(monkeypatch, rows):
+    """设置流式条带行数，返回实际切出的条带数记录"""
+    counts = []
+
+    def iter_bands(height):
+        bands = list(streaming.iter_bands(height, band_rows=rows))
+        counts.append(len(bands))
+        return bands
+
+    monkeypatch.setattr(base_processor, 'iter_bands', iter_bands)
+    return counts
+
+
+@pytest.mark.parametrize("wm_type", ["normal", "foggy"])
+@pytest.mark.parametrize("backend", ["pillow-native", "numpy-float"])
+def test_streamed_bands_match_single_band(tmp_path, make_processor, monkeypatch, wm_type, backend):
+    # JPEG 源流式处理时按 DCT 缩小解码（与整帧解码不同），比较多条带与单条带的结果：接缝处不得有差异
+    processor = make_processor(wm_type)
+    source = write_image(tmp_path / "in" / "a.jpg", size=(1300, 900))
+    overrides = {'composite_backend': backend, 'output_height': 320, 'stream_threshold_mp': 1}
+    _band_rows(monkeypatch, 1024)
+    expected = processor.process_bytes(source.read_bytes(), overrides)
+    streamed = _band_rows(monkeypatch, 64)
+
+    outputs = processor.process_batch(tmp_path / "in", tmp_path / "out", **overrides)
+
+    assert len(streamed) == 1 and streamed[0] > 1
+    _assert_same(outputs[0], expected)
+
+
+@pytest.mark.parametrize("wm_type", ["normal", "foggy"])
+def test_streamed_png_matches_whole_image(tmp_path, make_processor, monkeypatch, wm_type):
+    processor = make_processor(wm_type)
+    source = write_image(tmp_path / "in" / "b.png", size=(1000, 1100), mode="RGBA", seed=1)
+    overrides = {'composite_backend': 'numpy-float', 'output_height': 320}
+    expected = processor.process_bytes(source.read_bytes(), overrides)
+    streamed = _band_rows(monkeypatch, 64)
+
+    outputs = processor.process_batch(tmp_path / "in", tmp_path / "out", stream_threshold_mp=1, **overrides)
+
+    assert len(streamed) == 1 and streamed[0] > 1
+    _assert_same(outputs[0], expected)
+
+
+@pytest.mark.parametrize("wm_type", ["normal", "foggy"])
+@pytest.mark.parametrize("backend", ["pillow-native", "numpy-float"])
+@pytest.mark.parametrize("enhancement", [False, True])
+def test_row_band_parallel_matches_serial(tmp_path, make_processor, monkeypatch, wm_type, backend, enhancement):
+    processor = make_processor(wm_type)
+    sources = [write_image(tmp_path / "in" / "a.jpg", size=(500, 400)),
+               write_image(tmp_path / "in" / "b.png", size=(420, 460), mode="RGBA", seed=1)]
+    overrides = {'composite_backend': backend, 'output_height': 320}
+    if wm_type == 'normal':
+        overrides['enhancement'] = enhancement
+    expected = [processor.process_bytes(source.read_bytes(), overrides) for source in sources]
+    # 测试图像远小于文件内并行的像素门槛，强制按 4 路行条带并行合成
+    monkeypatch.setattr(base_processor, 'choose_intra_parallelism', lambda *args, **kwargs: 4)
+    monkeypatch.setattr(base_processor, 'INTRA_MIN_PIXELS', 0)
+    crops = []
+    row_crops = processor._row_crops
+    monkeypatch.setattr(processor, '_row_crops', lambda image: crops.append(row_crops(image)) or crops[-1])
+
+    outputs = processor.process_batch(tmp_path / "in", tmp_path / "out", **overrides)
+
+    assert processor._schedule_stats['intra_parallelism'] == 4
+    assert len(crops) == 2 and all(len(parts) > 1 for parts in crops)
+    for output, data in zip(sorted(outputs), expected):
+        _assert_same(output, data)
+
+
+def test_grouped_composite_matches_serial(tmp_path, make_processor, monkeypatch):
+    processor = make_processor('normal')
+    sources = [write_image(tmp_path / "in" / f"{i}.jpg", size=(300, 200), seed=i) for i in range(5)]
+    sources += [write_image(tmp_path / "in" / f"{i}.png", size=(300, 200), mode="RGBA", seed=i) for i in range(5, 8)]
+    sources.append(write_image(tmp_path / "in" / "odd.jpg", size=(260, 200), seed=9))
+    overrides = {'composite_backend': 'numpy-float', 'enhancement': True}
+    expected = {source.name: processor.process_bytes(source.read_bytes(), overrides) for source in sources}
+    # 单线程时任务数足够分组：每组 min(8, 9 // 2) = 4 个同尺寸文件
+    monkeypatch.setattr(base_processor.os, 'cpu_count', lambda: 1)
+
+    outputs = processor.process_batch(tmp_path / "in", tmp_path / "out", adaptive_workers=False, **overrides)
+
+    assert processor._schedule_stats['groups'] >= 2
+    assert len(outputs) == len(sources)
+    for output in outputs:
+        _assert_same(output, expected[output.name])
@@ -0,0 +1,124 @@
+# test_scheduler.py
+import shutil
+import threading
+from collections import Counter
+
+import pytest
+
+from src.models.conftest import write_image
+from src.models.interfaces.scheduler import CANCELLED, DONE, JobScheduler
+
+
+@pytest.fixture
+def gated(make_processor):
+    """第一次创建处理器时阻塞，直到测试放行（让规划线程停在第一个任务上）"""
+    entered, release = threading.Event(), threading.Event()
+    calls = []
+
+    def create(wm_type):
+        calls.append(wm_type)
+        if len(calls) == 1:
+            entered.set()
+            assert release.wait(30)
+        return make_processor(wm_type)
+
+    yield create, entered, release
+    release.set()
+
+
+def _inputs(root, count, seed=0):
+    for i in range(count):
+        write_image(root / f"{i}.jpg", seed=seed + i)
+    return root
+
+
+def test_jobs_are_planned_and_run_by_priority(tmp_path, gated):
+    create, entered, release = gated
+    scheduler = JobScheduler(create, workers=1, planners=1)
+    # numpy 后端使用线程缓冲区，用于检查各任务的缓冲区统计
+    options = {'composite_backend': 'numpy-float'}
+    first = scheduler.submit('normal', _inputs(tmp_path / "first", 2), tmp_path / "out" / "first", **options)
+    assert entered.wait(30)
+    low = scheduler.submit('normal', _inputs(tmp_path / "low", 3), tmp_path / "out" / "low", **options)
+    high = scheduler.submit('normal', _inputs(tmp_path / "high", 3, seed=10), tmp_path / "out" / "high",
+                            priority=5, **options)
+    release.set()
+    scheduler.shutdown()
+
+    jobs = scheduler._jobs
+    assert [scheduler.status(job).state for job in (first, low, high)] == [DONE] * 3
+    assert jobs[high].started < jobs[low].started
+    assert jobs[high].finished < jobs[low].finished
+    assert len(scheduler.wait(high)) == 3 and len(scheduler.wait(low)) == 3
+    # 每个任务只统计自己的缓冲区命中
+    for job in (first, low, high):
+        arena = jobs[job].processor._arena_stats
+        assert arena['hits'] + arena['misses'] > 0
+
+
+def test_planning_is_not_blocked_by_a_slow_job(tmp_path, gated):
+    create, entered, release = gated
+    scheduler = JobScheduler(create, workers=2, planners=2)
+    slow = scheduler.submit('normal', _inputs(tmp_path / "slow", 1), tmp_path / "out" / "slow")
+    assert entered.wait(30)
+    fast = scheduler.submit('normal', _inputs(tmp_path / "fast", 2), tmp_path / "out" / "fast")
+
+    assert len(scheduler.wait(fast, timeout=30)) == 2
+    assert scheduler.status(slow).state == 'planning'
+    release.set()
+    assert len(scheduler.wait(slow, timeout=30)) == 1
+
+
+def test_cancel_queued_job(tmp_path, gated):
+    create, entered, release = gated
+    scheduler = JobScheduler(create, workers=1, planners=1)
+    first = scheduler.submit('normal', _inputs(tmp_path / "first", 1), tmp_path / "out" / "first")
+    assert entered.wait(30)
+    queued = scheduler.submit('normal', _inputs(tmp_path / "queued", 2), tmp_path / "out" / "queued")
+
+    assert scheduler.cancel(queued)
+    release.set()
+    scheduler.shutdown()
+
+    assert scheduler.status(queued).state == CANCELLED and scheduler.wait(queued) == []
+    assert not (tmp_path / "out" / "queued").exists()
+    assert scheduler.status(first).state == DONE
+    assert not scheduler.cancel(first)
+
+
+def test_shutdown_stops_scheduler_threads(tmp_path, make_processor):
+    scheduler = JobScheduler(make_processor, workers=2, planners=2)
+    job = scheduler.submit('normal', _inputs(tmp_path / "in", 2), tmp_path / "out")
+    scheduler.shutdown()
+
+    assert scheduler.status(job).state == DONE
+    assert not any(thread.is_alive() for thread in scheduler._threads)
+
+
+def test_cancel_after_last_unit_does_not_close_job_twice(tmp_path, make_processor, monkeypatch):
+    scheduler = JobScheduler(make_processor, workers=1, planners=1)
+    finish, closed, cancelled = scheduler._finish, Counter(), []
+    close_job = scheduler._close_job
+
+    def cancel_then_finish(job):
+        # 最后一个单元完成、收尾开始之前取消
+        cancelled.append(scheduler.cancel(job.id))
+        finish(job)
+
+    def count_close(job):
+        closed[job.id] += 1
+        close_job(job)
+
+    monkeypatch.setattr(scheduler, '_finish', cancel_then_finish)
+    monkeypatch.setattr(scheduler, '_close_job', count_close)
+    source = write_image(tmp_path / "source.jpg")
+    (tmp_path / "in").mkdir()
+    for name in ("a.jpg", "b.jpg"):
+        shutil.copy(source, tmp_path / "in" / name)
+    job = scheduler.submit('normal', tmp_path / "in", tmp_path / "out")
+    scheduler.shutdown()
+
+    assert cancelled == [False] and closed[job] == 1
+    assert scheduler.status(job).state == DONE
+    # 收尾照常生成重复输入的输出
+    assert sorted(path.name for path in scheduler.wait(job)) == ['a.jpg', 'b.jpg']
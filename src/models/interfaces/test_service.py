@@ -0,0 +1,106 @@
+# test_service.py
+import io
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.models.conftest import write_image
+from src.models.interfaces.service import WatermarkService
+
+
+@pytest.fixture
+def serve(make_processor):
+    services = []
+
+    def start(**kwargs):
+        service = WatermarkService({'normal': make_processor('normal')}, **kwargs)
+        server = service.start(port=0)
+        services.append(service)
+        return service, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for service in services:
+        service.stop()
+
+
+def _post(url, body=b''):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body, method="POST"), timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_queue_timeout_returns_503(serve, tmp_path):
+    service, base = serve(max_concurrency=1, queue_timeout=0.05)
+    data = write_image(tmp_path / "a.jpg").read_bytes()
+    assert service._slots.acquire(timeout=1)
+    try:
+        status, headers, body = _post(f"{base}/watermark/normal", data)
+    finally:
+        service._slots.release()
+
+    assert status == 503 and headers['Retry-After'] == "1"
+    assert "服务繁忙" in json.loads(body)['error']
+    assert _post(f"{base}/watermark/normal", data)[0] == 200
+    metrics = service.metrics.snapshot()
+    assert metrics['status'] == {'200': 1, '503': 1} and metrics['queued'] == 0 and metrics['in_flight'] == 0
+
+
+def test_local_paths_are_confined_to_path_root(serve, tmp_path):
+    root = tmp_path / "root"
+    inside = write_image(root / "a.jpg")
+    outside = write_image(tmp_path / "b.jpg")
+    service, base = serve(path_root=root)
+    _, closed = serve()
+
+    status, _, body = _post(f"{base}/watermark/normal?path={inside}")
+    assert status == 200 and body == service._processors['normal'].process_bytes(inside.read_bytes())
+    assert _post(f"{base}/watermark/normal?path={outside}")[0] == 403
+    assert _post(f"{base}/watermark/normal?path={root}/../b.jpg")[0] == 403
+    assert _post(f"{base}/watermark/normal?path={root}/missing.jpg")[0] == 404
+    assert _post(f"{closed}/watermark/normal?path={inside}")[0] == 403
+
+
+def test_concurrent_requests_do_not_touch_batch_stats(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    write_image(input_dir / "a.jpg")
+    processor.process_batch(input_dir, tmp_path / "out")
+    batch_stats = dict(processor._encode_stats)
+    data = [write_image(tmp_path / f"{i}.jpg", seed=i).read_bytes() for i in range(4)]
+    expected = [processor.process_bytes(item) for item in data]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(processor.process_bytes, data * 8))
+
+    assert results == expected * 8
+    assert processor._encode_stats == batch_stats
+
+
+def test_processor_settings_are_not_accepted_from_requests(serve, tmp_path):
+    service, base = serve()
+    data = write_image(tmp_path / "a.jpg").read_bytes()
+    limit = Image.MAX_IMAGE_PIXELS
+
+    for key in ('max_image_mp=100000', 'memory_budget_mb=1', 'base_cache_mb=100', 'output_profile=webp',
+                'target_size_kb=1'):
+        status, _, body = _post(f"{base}/watermark/normal?{key}", data)
+        assert status == 400 and "不接受的参数" in json.loads(body)['error']
+    assert Image.MAX_IMAGE_PIXELS == limit
+
+    status, _, body = _post(f"{base}/watermark/normal?opacity=30&output_height=100", data)
+    assert status == 200 and Image.open(io.BytesIO(body)).height == 100
+
+
+def test_memory_call_cannot_raise_pixel_cap(make_processor):
+    processor = make_processor('normal', max_image_mp=1)
+    limit = Image.MAX_IMAGE_PIXELS
+    with pytest.raises(ValueError, match="超过上限"):
+        processor.process_array(np.zeros((1100, 1000, 3), dtype=np.uint8), {'max_image_mp': 100000})
+    assert Image.MAX_IMAGE_PIXELS == limit
@@ -0,0 +1,29 @@
+# test_watch.py
+import pytest
+
+from src.models.conftest import write_image
+from src.models.interfaces.watch import WatchFolder
+
+
+def test_output_inside_input_is_rejected(tmp_path, make_processor):
+    processor = make_processor('normal')
+    with pytest.raises(ValueError, match="输入目录内"):
+        WatchFolder(processor, tmp_path / "in", tmp_path / "in" / "out")
+    with pytest.raises(ValueError, match="输入目录内"):
+        WatchFolder(processor, tmp_path / "in", tmp_path / "in")
+
+
+def test_watch_processes_new_files_and_stop_releases_pool(tmp_path, make_processor):
+    processor = make_processor('normal')
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    write_image(input_dir / "sub" / "a.jpg")
+    watch = WatchFolder(processor, input_dir, output_dir, interval=3600, settle_seconds=0, process_existing=True)
+    watch.start()
+    try:
+        assert watch.poll_once() == 1
+    finally:
+        stats = watch.stop()
+
+    assert stats['ok'] == 1 and stats['failed'] == 0 and stats['in_flight'] == 0
+    assert (output_dir / "sub" / "a.jpg").exists()
+    assert processor._executor is None
@@ -0,0 +1,187 @@
+"""
+监视模式：输入目录有新增/修改且写入完成的文件时自动处理
+
+处理器常驻（水印数据、预处理水印、合成后端、编码档位只初始化一次），轮询线程只负责发现文件，
+写入完成的文件提交到处理器的常驻线程池，不阻塞下一次轮询。每个文件统计“投放 → 输出”延迟：
+投放时间取首次发现时间（误差不超过一个轮询间隔），分为等待写入完成与处理两段。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .base_processor import BaseWatermarkProcessor
+from ..pipeline.governor import estimate_working_set
+from ..pipeline.prescan import read_header
+from ..pipeline.results import FileResult
+from ..pipeline.scanner import BatchTask
+from ..pipeline.watcher import ReadyFile, StatSnapshotPoller
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class WatchFolder:
+    """监视输入目录，增量处理新增/修改的文件（输出镜像输入目录结构）"""
+
+    def __init__(self, processor: BaseWatermarkProcessor, input_dir: Path, output_dir: Path,
+                 interval: float = 1.0, settle_seconds: float = 2.0, process_existing: bool = False,
+                 on_result: Callable[[FileResult, float], None] = None, **kwargs):
+        self._processor = processor
+        self._logger = processor.logger
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        if self.output_dir.resolve().is_relative_to(self.input_dir.resolve()):
+            # 输出写入监视目录会被当作新文件再次处理，循环加水印
+            raise ValueError(f"输出目录不能位于监视的输入目录内: {self.output_dir}")
+        self._interval = interval
+        self._process_existing = process_existing
+        self._on_result = on_result
+        self._kwargs = kwargs
+        self._poller = StatSnapshotPoller(self.input_dir, processor._SUPPORTED_EXT, settle_seconds, self._logger)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 处理中的文件：输入路径 → future
+        self._in_flight: Dict[Path, Future] = {}
+        # 最近完成的文件：(投放→输出延迟, 等待写入完成, 处理耗时)
+        self._latencies = deque(maxlen=4096)
+        self._counts = {'ok': 0, 'failed': 0, 'deferred': 0}
+        self._started = 0.0
+
+    def start(self):
+        """初始化处理器并建立初始快照，之后在后台线程中轮询"""
+        if self._thread:
+            raise RuntimeError("监视已在运行")
+        self.input_dir.mkdir(parents=True, exist_ok=True)
+        self._params, self._final_params = self._processor._start_incremental(
+            self.input_dir, self.output_dir, self._kwargs
+        )
+        self._poller.baseline(self._process_existing)
+        self._started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.input_dir.name}", daemon=True)
+        self._thread.start()
+        self._logger.info(
+            f"开始监视 | 输入目录: {self.input_dir} | 输出目录: {self.output_dir} | 已有文件: {self._poller.files} 个"
+            f"{'（全部处理）' if self._process_existing else '（跳过）'} | 轮询间隔: {self._interval}s"
+        )
+
+    def stop(self, wait: bool = True) -> dict:
+        """停止轮询并关闭处理器的常驻线程池；wait 为 True 时等待处理中的文件完成，否则取消未开始的文件。返回统计"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if wait:
+            with self._lock:
+                futures = list(self._in_flight.values())
+            for future in futures:
+                future.exception()
+        self._processor.shutdown_executor(wait=wait)
+        stats = self.stats()
+        self._logger.info(f"停止监视 | 输入目录: {self.input_dir} | 成功: {stats['ok']} | 失败: {stats['failed']}")
+        self._print_stats(stats)
+        return stats
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                self._logger.error(f"监视轮询失败 | {type(e).__name__}: {e}", exc_info=True)
+
+    def poll_once(self) -> int:
+        """轮询一次并提交写入完成的文件，返回提交数"""
+        submitted = 0
+        for ready in self._poller.poll():
+            with self._lock:
+                busy = ready.path in self._in_flight
+                if busy:
+                    self._counts['deferred'] += 1
+            if busy:
+                # 上一版本仍在处理：撤销交付，等其完成后下次轮询再处理
+                self._poller.forget(ready.path)
+                continue
+            self._submit(ready)
+            submitted += 1
+        return submitted
+
+    def _task(self, ready: ReadyFile) -> BatchTask:
+        output_path = self.output_dir / ready.path.relative_to(self.input_dir)
+        output_path = self._processor._encoder.output_paths([output_path])[0]
+        return BatchTask(ready.path, output_path, size=ready.size, mtime=ready.mtime)
+
+    def _process(self, task: BatchTask) -> FileResult:
+        read_header(task)
+        task.mem_bytes = estimate_working_set(
+            task, self._params.output_height, self._params.enhancement, self._params.stream_threshold_mp * 1_000_000
+        )
+        return self._processor._run_unit(task, self._final_params)[0]
+
+    def _submit(self, ready: ReadyFile):
+        future = self._processor.executor.submit(self._process, self._task(ready))
+        with self._lock:
+            self._in_flight[ready.path] = future
+        future.add_done_callback(lambda done: self._finished(ready, done))
+
+    def _finished(self, ready: ReadyFile, future: Future):
+        with self._lock:
+            self._in_flight.pop(ready.path, None)
+        if future.cancelled():
+            # 停止监视时取消的未开始文件，不计入统计
+            return
+        try:
+            record = future.result()
+        except Exception as e:
+            self._logger.error(f"监视处理失败 | 文件: {ready.path} | {type(e).__name__}: {e}", exc_info=True)
+            with self._lock:
+                self._counts['failed'] += 1
+            return
+        latency = time.time() - ready.detected
+        settle = ready.settled - ready.detected
+        with self._lock:
+            self._counts['ok' if record.ok else 'failed'] += 1
+            if record.ok:
+                self._latencies.append((latency, settle, latency - settle))
+        self._logger.info(
+            f"监视处理{'完成' if record.ok else '失败'} | 文件: {ready.path} | 投放→输出: {latency:.2f}s "
+            f"(等待写入完成 {settle:.2f}s + 处理 {latency - settle:.2f}s)"
+        )
+        if self._on_result:
+            self._on_result(record, latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            counts = dict(self._counts)
+            in_flight = len(self._in_flight)
+        ordered = sorted(latency for latency, _, _ in latencies)
+        return {
+            **counts,
+            'in_flight': in_flight,
+            'elapsed': time.perf_counter() - self._started if self._started else 0.0,
+            'latency_p50': _percentile(ordered, 0.5),
+            'latency_p90': _percentile(ordered, 0.9),
+            'latency_max': ordered[-1] if ordered else 0.0,
+            'mean_settle': sum(settle for _, settle, _ in latencies) / len(latencies) if latencies else 0.0,
+            'mean_process': sum(cost for _, _, cost in latencies) / len(latencies) if latencies else 0.0,
+            **{f"poll_{key}": value for key, value in self._poller.stats().items()},
+        }
+
+    def _print_stats(self, stats: dict):
+        print("\n======== 监视模式报告 ========")
+        print(f"[运行时长] {stats['elapsed']:.1f}s | 成功: {stats['ok']} | 失败: {stats['failed']} | "
+              f"处理中再次修改（延后）: {stats['deferred']}")
+        print(f"投放→输出延迟: p50 {stats['latency_p50']:.2f}s | p90 {stats['latency_p90']:.2f}s | "
+              f"最大 {stats['latency_max']:.2f}s | 平均等待写入完成 {stats['mean_settle']:.2f}s | "
+              f"平均处理 {stats['mean_process']:.2f}s")
+        print(f"轮询: {stats['poll_polls']} 次 | 目录文件: {stats['poll_files']} 个 | "
+              f"平均扫描耗时: {stats['poll_mean_scan_ms']:.1f}ms | 写入中: {stats['poll_pending']} 个")
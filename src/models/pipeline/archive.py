@@ -0,0 +1,253 @@
+"""
+压缩包输入/输出
+
+zip/tar 输入按成员顺序流式读取（tar 含 gz/bz2/xz 压缩，按流模式只顺序读一遍），成员内容直接读入内存，
+不解压到磁盘；输出压缩包由单一写入方按输入顺序追加成员。目录输入/输出以同一接口表示，可任意组合。
+"""
+import io
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Iterable, Iterator, Optional
+
+from .scanner import OutputDirCache, ParallelDirScanner
+
+ZIP, TAR = 'zip', 'tar'
+# 后缀 → (类型, tar 压缩方式)
+_SUFFIXES = {
+    '.zip': (ZIP, ''),
+    '.tar': (TAR, ''),
+    '.tar.gz': (TAR, 'gz'), '.tgz': (TAR, 'gz'),
+    '.tar.bz2': (TAR, 'bz2'), '.tbz2': (TAR, 'bz2'),
+    '.tar.xz': (TAR, 'xz'), '.txz': (TAR, 'xz'),
+}
+
+
+def _suffix(path) -> Optional[str]:
+    name = Path(path).name.lower()
+    return next((suffix for suffix in sorted(_SUFFIXES, key=len, reverse=True) if name.endswith(suffix)), None)
+
+
+def archive_kind(path) -> Optional[str]:
+    """按文件名判断压缩包类型（zip/tar），非压缩包返回 None"""
+    suffix = _suffix(path)
+    return _SUFFIXES[suffix][0] if suffix else None
+
+
+def is_archive_input(path) -> bool:
+    """输入是否为已存在的压缩包文件"""
+    return archive_kind(path) is not None and Path(path).is_file()
+
+
+def safe_member_name(name: str) -> Optional[str]:
+    """规范化成员名（统一为 / 分隔的相对路径），含 .. 或为空时返回 None"""
+    parts = [part for part in PurePosixPath(name.replace('\\', '/')).parts if part not in ('/', '.')]
+    if not parts or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+@dataclass
+class Member:
+    """输入成员：相对路径（/ 分隔）与文件内容"""
+    name: str
+    data: bytes
+
+
+class _Source:
+    def __init__(self, path: Path, supported_ext: Iterable[str], logger: logging.Logger = None):
+        self.path = Path(path)
+        self._supported_ext = {ext.lower() for ext in supported_ext}
+        self._logger = logger or logging.getLogger(__name__)
+        self.skipped = 0
+        self.bytes_read = 0
+
+    def _accept(self, name: str) -> Optional[str]:
+        if os.path.splitext(name)[1].lower() not in self._supported_ext:
+            self.skipped += 1
+            return None
+        safe = safe_member_name(name)
+        if safe is None:
+            self.skipped += 1
+            self._logger.warning(f"跳过不安全的成员路径: {name}")
+        return safe
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+
+class DirectorySource(_Source):
+    """目录输入：递归扫描后按路径顺序读取"""
+
+    def __iter__(self) -> Iterator[Member]:
+        scanner = ParallelDirScanner(self._supported_ext, logger=self._logger)
+        tasks = sorted(scanner.scan(self.path, self.path), key=lambda task: task.input_path)
+        self.skipped += scanner.skipped
+        for task in tasks:
+            name = task.input_path.relative_to(self.path).as_posix()
+            try:
+                data = task.input_path.read_bytes()
+            except OSError as e:
+                self.skipped += 1
+                self._logger.error(f"读取失败: {task.input_path} | {e}")
+                continue
+            self.bytes_read += len(data)
+            yield Member(name, data)
+
+
+class ZipSource(_Source):
+    """zip 输入：按中央目录顺序逐个读取成员"""
+
+    def __init__(self, path: Path, supported_ext: Iterable[str], logger: logging.Logger = None):
+        super().__init__(path, supported_ext, logger)
+        self._zip = zipfile.ZipFile(self.path)
+
+    def __iter__(self) -> Iterator[Member]:
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            name = self._accept(info.filename)
+            if name is None:
+                continue
+            data = self._zip.read(info)
+            self.bytes_read += len(data)
+            yield Member(name, data)
+
+    def close(self):
+        self._zip.close()
+
+
+class TarSource(_Source):
+    """tar 输入：流模式顺序读取（压缩 tar 不回跳，只解压一遍）"""
+
+    def __init__(self, path: Path, supported_ext: Iterable[str], logger: logging.Logger = None):
+        super().__init__(path, supported_ext, logger)
+        self._tar = tarfile.open(self.path, mode='r|*')
+
+    def __iter__(self) -> Iterator[Member]:
+        for info in self._tar:
+            if not info.isfile():
+                continue
+            name = self._accept(info.name)
+            if name is None:
+                continue
+            data = self._tar.extractfile(info).read()
+            self.bytes_read += len(data)
+            yield Member(name, data)
+
+    def close(self):
+        self._tar.close()
+
+
+def open_source(path: Path, supported_ext: Iterable[str], logger: logging.Logger = None) -> _Source:
+    """按路径打开输入：zip/tar 压缩包或目录"""
+    kind = archive_kind(path) if Path(path).is_file() else None
+    source = {ZIP: ZipSource, TAR: TarSource}.get(kind, DirectorySource)
+    return source(path, supported_ext, logger)
+
+
+class _Sink:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.bytes_written = 0
+
+    def write(self, name: str, data: bytes):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+
+class DirectorySink(_Sink):
+    """目录输出：按成员相对路径写文件，子目录延迟创建"""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._dirs = OutputDirCache()
+        self._dirs.add(self.path)
+
+    def write(self, name: str, data: bytes):
+        output_path = self.path / name
+        self._dirs.ensure(output_path.parent)
+        output_path.write_bytes(data)
+        self.bytes_written += len(data)
+
+
+class ZipSink(_Sink):
+    """zip 输出：成员不再压缩（图像编码结果已压缩）"""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._zip = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_STORED)
+
+    def write(self, name: str, data: bytes):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        self._zip.writestr(info, data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        self._zip.close()
+
+
+class TarSink(_Sink):
+    """tar 输出：压缩方式按后缀（.tar.gz/.tgz 等）"""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        compression = _SUFFIXES[_suffix(self.path)][1]
+        self._tar = tarfile.open(self.path, mode=f"w:{compression}" if compression else "w")
+
+    def write(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        self.bytes_written += len(data)
+
+    def close(self):
+        self._tar.close()
+
+
+def open_sink(path: Path) -> _Sink:
+    """按路径打开输出：名称为压缩包后缀时写压缩包，否则写目录"""
+    sink = {ZIP: ZipSink, TAR: TarSink}.get(archive_kind(path), DirectorySink)
+    return sink(path)
+
+
+class OutputNamer:
+    """
+    输出成员名：webp/avif 档位替换扩展名
+
+    成员按输入顺序到达，无法预先排序：先到者用 a.webp，之后撞名的保留原扩展名写为 a.png.webp
+    """
+
+    def __init__(self, extension: Optional[str]):
+        self._extension = extension
+        self._used = set()
+
+    def __call__(self, name: str) -> str:
+        if self._extension:
+            renamed = os.path.splitext(name)[0] + self._extension
+            name = renamed if renamed not in self._used else name + self._extension
+        self._used.add(name)
+        return name
@@ -0,0 +1,180 @@
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+_MB = 1024 * 1024
+# 单个线程缓冲区常驻上限，超出时按最近最少使用淘汰
+DEFAULT_ARENA_BYTES = 256 * _MB
+# 全部线程缓冲区合计的常驻上限（批处理开始时按内存预算重新设定）
+DEFAULT_RESIDENT_LIMIT = 1024 * _MB
+
+
+class _ArenaStats:
+    """所有线程缓冲区的进程级汇总统计（线程缓冲区由多个批次共用，不按批次重置）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.resident = 0
+        self.limit = DEFAULT_RESIDENT_LIMIT
+        self.hits = 0
+        self.misses = 0
+        self.peak_resident = 0
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> int:
+        """记录一次分配，返回当前常驻字节数"""
+        with self._lock:
+            self.misses += 1
+            return self.resident
+
+    def retain(self, nbytes: int) -> bool:
+        """常驻总量未超上限时计入 nbytes 并返回 True，否则不计入"""
+        with self._lock:
+            if self.resident + nbytes > self.limit:
+                return False
+            self.resident += nbytes
+            self.peak_resident = max(self.peak_resident, self.resident)
+            return True
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.resident -= nbytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'resident_mb': self.resident / _MB,
+                'peak_resident_mb': self.peak_resident / _MB,
+            }
+
+
+STATS = _ArenaStats()
+
+
+class ArenaUsage:
+    """单个批次的缓冲区命中计数：由处理该批次文件的线程（含其条带线程）累加，并发批次互不混淆"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 本批次分配时观察到的进程常驻峰值
+        self.peak_resident = STATS.resident
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, resident: int):
+        with self._lock:
+            self.misses += 1
+            self.peak_resident = max(self.peak_resident, resident)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'resident_mb': STATS.resident / _MB,
+                'peak_resident_mb': self.peak_resident / _MB,
+                'limit_mb': STATS.limit / _MB,
+            }
+
+
+class ScratchArena:
+    """
+    按 (名称, 形状, dtype) 复用的临时数组；取出的缓冲区内容未初始化，调用方需整体覆盖写入
+
+    常驻量受两级上限约束：本线程不超过 max_bytes，全部线程合计不超过 STATS.limit。
+    新缓冲区放不下时先按最近最少使用淘汰本线程的旧缓冲区，仍放不下则只用这一次、不保留
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_ARENA_BYTES):
+        self._buffers = OrderedDict()
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        # 线程结束、缓冲区被回收时扣减常驻统计
+        self._finalizer = weakref.finalize(self, STATS.release, 0)
+
+    def get(self, name: str, shape, dtype=np.float32) -> np.ndarray:
+        key = (name, tuple(shape), np.dtype(dtype))
+        buf = self._buffers.get(key)
+        usage = current_usage()
+        if buf is not None:
+            self._buffers.move_to_end(key)
+            STATS.record_hit()
+            if usage is not None:
+                usage.record_hit()
+            return buf
+        buf = np.empty(shape, dtype=dtype)
+        while self._buffers and self._nbytes + buf.nbytes > self._max_bytes:
+            self._evict()
+        retained = buf.nbytes <= self._max_bytes and STATS.retain(buf.nbytes)
+        while not retained and self._buffers and buf.nbytes <= self._max_bytes:
+            # 全部线程合计已达上限：腾出本线程的旧缓冲区再试
+            self._evict()
+            retained = STATS.retain(buf.nbytes)
+        if retained:
+            self._buffers[key] = buf
+            self._nbytes += buf.nbytes
+        resident = STATS.record_miss()
+        if usage is not None:
+            usage.record_miss(resident)
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, STATS.release, self._nbytes)
+        return buf
+
+    def _evict(self):
+        _, old = self._buffers.popitem(last=False)
+        self._nbytes -= old.nbytes
+        STATS.release(old.nbytes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+
+_local = threading.local()
+
+
+def thread_arena() -> ScratchArena:
+    """当前线程的缓冲区（线程池中的每个工作线程各自一份，无需加锁）"""
+    arena = getattr(_local, 'arena', None)
+    if arena is None:
+        arena = _local.arena = ScratchArena()
+    return arena
+
+
+def current_usage() -> Optional[ArenaUsage]:
+    """当前线程正在计入的批次统计（未处于批次中时为 None）"""
+    return getattr(_local, 'usage', None)
+
+
+@contextmanager
+def track_usage(usage: Optional[ArenaUsage]):
+    """在此范围内当前线程的缓冲区命中计入 usage"""
+    previous = current_usage()
+    _local.usage = usage
+    try:
+        yield usage
+    finally:
+        _local.usage = previous
+
+
+def set_resident_limit(nbytes: int) -> None:
+    """设置全部线程缓冲区合计的常驻上限（超出部分的缓冲区用后即弃，已常驻的在下次分配时逐步淘汰）"""
+    with STATS._lock:
+        STATS.limit = max(0, int(nbytes))
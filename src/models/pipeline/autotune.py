@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def default_state_dir() -> Path:
+    """持久化状态目录（可通过 WATERMARK_STATE_DIR 环境变量覆盖）"""
+    return Path(os.environ.get("WATERMARK_STATE_DIR") or Path.home() / ".watermark")
+
+
+def volume_of(path: Path) -> str:
+    """返回路径所在卷的标识（挂载点或盘符）"""
+    path = Path(path).resolve()
+    drive = path.drive
+    if drive:
+        return drive.upper()
+    try:
+        dev = path.stat().st_dev
+        while path.parent != path and path.parent.stat().st_dev == dev:
+            path = path.parent
+    except OSError:
+        pass
+    return str(path)
+
+
+class ConcurrencyGate:
+    """可动态调整上限的信号量（线程池线程数固定，由闸门控制实际活跃数）"""
+
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self._limit = max(1, limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+
+class AdaptiveConcurrencyController:
+    """基于吞吐量与 CPU 利用率的爬山法并发调节器"""
+
+    # 吞吐量变化小于该比例视为无提升
+    _IMPROVE_EPS = 0.03
+    # CPU 利用率超过该值时不再尝试增加并发
+    _CPU_SATURATED = 0.92
+
+    def __init__(self, gate: ConcurrencyGate, min_workers: int, max_workers: int,
+                 interval: float = 1.0, logger: logging.Logger = None):
+        self._gate = gate
+        self._min = max(1, min_workers)
+        self._max = max(self._min, max_workers)
+        self._interval = interval
+        self._logger = logger or logging.getLogger(__name__)
+        self._completed = 0
+        self._count_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._direction = 1
+        self.initial = gate.limit
+        self.best_workers = gate.limit
+        self.best_throughput = 0.0
+        self.adjustments = 0
+        self.cpu_utilization = 0.0
+
+    def task_done(self):
+        with self._count_lock:
+            self._completed += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="autotune", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        cpu_count = os.cpu_count() or 1
+        last_throughput = None
+        window_start, cpu_start, done_start = time.perf_counter(), time.process_time(), 0
+        while not self._stop.wait(self._interval):
+            now, cpu_now = time.perf_counter(), time.process_time()
+            with self._count_lock:
+                done = self._completed
+            # 样本太少时延长采样窗口，避免噪声导致来回抖动
+            if done - done_start < max(2, self._gate.limit):
+                continue
+            elapsed = now - window_start
+            throughput = (done - done_start) / elapsed
+            self.cpu_utilization = (cpu_now - cpu_start) / (elapsed * cpu_count)
+            window_start, cpu_start, done_start = now, cpu_now, done
+
+            current = self._gate.limit
+            if throughput > self.best_throughput:
+                self.best_workers, self.best_throughput = current, throughput
+            if last_throughput is not None and throughput < last_throughput * (1 + self._IMPROVE_EPS):
+                # 没有明显提升：反向探索
+                self._direction = -self._direction
+            last_throughput = throughput
+            if self._direction > 0 and self.cpu_utilization >= self._CPU_SATURATED:
+                # CPU 已饱和，继续加线程只会争抢 CPU
+                continue
+
+            target = min(self._max, max(self._min, current + self._direction))
+            if target == current:
+                # 触及上下限后掉头
+                self._direction = -self._direction
+                continue
+            self._gate.set_limit(target)
+            self.adjustments += 1
+            self._logger.info(
+                f"自适应并发调整 | {current} → {target} | "
+                f"吞吐: {throughput:.2f} 文件/s | CPU利用率: {self.cpu_utilization:.0%}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            'initial': self.initial,
+            'final': self._gate.limit,
+            'best_workers': self.best_workers,
+            'best_throughput': self.best_throughput,
+            'adjustments': self.adjustments,
+            'cpu_utilization': self.cpu_utilization,
+        }
+
+
+class WorkerTuningStore:
+    """按 (水印类型, 输入卷, 核数, 影响单文件开销的参数) 记录上次最优并发数（下次作为爬山起点）"""
+
+    def __init__(self, path: Path = None):
+        self._path = Path(path) if path else default_state_dir() / "worker_tuning.json"
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(wm_type: str, input_dir: Path, enhancement: bool, backend: str) -> str:
+        # 核数不同（换机器/容器限核）或增强、合成后端不同时单文件开销不同，最优并发数不可沿用
+        return f"{wm_type}|{volume_of(input_dir)}|cpu{os.cpu_count() or 1}|enhance{int(enhancement)}|{backend}"
+
+    def _read(self) -> dict:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[int]:
+        entry = self._read().get(key)
+        return int(entry['workers']) if entry else None
+
+    def put(self, key: str, workers: int, throughput: float):
+        with self._lock:
+            data = self._read()
+            data[key] = {'workers': workers, 'throughput': round(throughput, 3), 'updated': int(time.time())}
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self._path)
+            except OSError as e:
+                logger.warning(f"并发调优记录写入失败: {e}")
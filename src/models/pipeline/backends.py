@@ -0,0 +1,374 @@
+"""
+图像合成后端注册表
+
+同一合成运算（叠加 overlay / 亮度增强 enhance）有多种实现，可按名称选择：
+pillow-native  逐像素混合交给 Pillow C 层的 paste / ImageChops
+numpy-float    NumPy float32 计算，增强模式的参考实现
+numpy-fixed    NumPy 8 位定点混合 + 查表亮度
+
+叠加模式下 pillow-native 与 numpy-fixed 与原 paste 结果逐字节一致，numpy-float 误差不超过 1；
+增强模式下两种定点实现彼此一致，与 float 参考实现相差不超过 1 个灰阶。
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageChops
+
+from .arena import ScratchArena, thread_arena
+from .kernels import brightness_scale, enhance_composite, gamma_correct, luminance, target_luminance, to_unit_float
+
+OVERLAY, ENHANCE = 'overlay', 'enhance'
+AUTO = 'auto'
+# 后端可直接处理的工作模式
+WORKING_MODES = ('RGB', 'RGBA', 'L', 'LA')
+GRAY_MODES = ('L', 'LA')
+# 基准测试样本尺寸（宽, 高），接近默认输出高度下的常见画幅
+BENCH_SIZE = (1333, 1000)
+
+
+@dataclass
+class PreparedWatermark:
+    """裁剪/预处理后的水印，可在同尺寸图像间复用"""
+    pixels: np.ndarray  # uint8 水印（叠加模式为工作模式下的像素，alpha 已按透明度缩放）
+    alpha: np.ndarray  # (H, W) uint8 alpha
+    mask: Image.Image  # alpha 的 L 图像，作为 paste 蒙版
+    image: Optional[Image.Image] = None  # 叠加模式：工作模式下的水印图像
+    unit: Optional[np.ndarray] = None  # 增强模式：0~1 float32 RGBA
+    lum: Optional[np.ndarray] = None  # 增强模式：水印亮度
+
+    @property
+    def nbytes(self) -> int:
+        # 图像对象各持有一份像素副本，一并计入
+        arrays = (self.pixels, self.pixels if self.image else None, self.alpha, self.alpha, self.unit, self.lum)
+        return sum(arr.nbytes for arr in arrays if arr is not None)
+
+
+def prepare_watermark(op: str, npy_data, size: Tuple[int, int], opacity: float = 1.0,
+                      mode: str = 'RGBA') -> PreparedWatermark:
+    """
+    按背景尺寸准备水印
+
+    叠加模式：裁剪、按透明度缩放 alpha，灰度工作模式下转为 L/LA（与 paste 自动转换一致）
+    增强模式：补齐到背景尺寸并归一化，预先计算水印亮度
+    """
+    width, height = size
+    image = Image.fromarray(npy_data[:height, :width]).convert("RGBA")
+    if op == OVERLAY:
+        if opacity != 1.0:
+            r, g, b, a = image.split()
+            a = a.point([int(p * opacity) for p in range(256)])
+            image = Image.merge("RGBA", (r, g, b, a))
+        mask = image.getchannel("A")
+        if mode in GRAY_MODES:
+            image = image.convert(mode)
+        return PreparedWatermark(np.asarray(image), np.asarray(mask), mask, image=image)
+
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    cropped = np.asarray(image)
+    pixels[:cropped.shape[0], :cropped.shape[1]] = cropped
+    unit = pixels.astype(np.float32)
+    np.divide(unit, np.float32(255.0), out=unit)
+    alpha = np.ascontiguousarray(pixels[..., 3])
+    return PreparedWatermark(pixels, alpha, Image.fromarray(alpha), unit=unit, lum=luminance(unit[..., :3]))
+
+
+class PreparedWatermarkCache:
+    """预处理水印的 LRU 缓存，按占用字节数淘汰"""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, factory: Callable[[], PreparedWatermark]) -> PreparedWatermark:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        prepared = factory()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = prepared
+                self._bytes += prepared.nbytes
+            while self._bytes > self._max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return prepared
+
+
+_LUM_LUT = None
+
+
+def _luminance_lut() -> np.ndarray:
+    """
+    各通道 8 位取值 → 加权线性亮度的查找表 (4, 256)：R/G/B 三行及灰度（三者之和）一行
+
+    表项与逐像素 float32 计算的中间结果相同，查表求和顺序也一致，因此结果逐位相同
+    """
+    global _LUM_LUT
+    if _LUM_LUT is None:
+        levels = np.arange(256, dtype=np.float32) / np.float32(255.0)
+        linear = gamma_correct(levels)
+        weighted = [linear * 0.2126, linear * 0.7152, linear * 0.0722]
+        _LUM_LUT = np.stack(weighted + [weighted[0] + weighted[1] + weighted[2]])
+    return _LUM_LUT
+
+
+def lut_luminance(pixels, arena: ScratchArena = None) -> np.ndarray:
+    """uint8 像素查表计算相对亮度；pixels 为 (..., 3) RGB 或二维灰度"""
+    arena = arena or thread_arena()
+    lut = _luminance_lut()
+    if pixels.ndim == 2:
+        return np.take(lut[3], pixels, out=arena.get('lut_lum', pixels.shape, np.float32))
+    out = arena.get('lut_lum', pixels.shape[:-1], np.float32)
+    term = arena.get('lut_term', pixels.shape[:-1], np.float32)
+    np.take(lut[0], pixels[..., 0], out=out)
+    np.take(lut[1], pixels[..., 1], out=term)
+    np.add(out, term, out=out)
+    np.take(lut[2], pixels[..., 2], out=term)
+    np.add(out, term, out=out)
+    return out
+
+
+def blend_fixed(dst, src, mask, arena: ScratchArena = None) -> None:
+    """按 mask 将 src 混合进 dst（uint8，原地），舍入方式与 Pillow paste 相同"""
+    arena = arena or thread_arena()
+    alpha = mask if dst.ndim == mask.ndim else mask[..., np.newaxis]
+    acc = arena.get('blend_acc', dst.shape, np.uint16)
+    term = arena.get('blend_term', dst.shape, np.uint16)
+    inv = arena.get('blend_inv', alpha.shape, np.uint16)
+    np.subtract(255, alpha, out=inv)
+    np.multiply(dst, inv, out=acc)
+    np.multiply(src, alpha, out=term, dtype=np.uint16)
+    np.add(acc, term, out=acc)
+    np.add(acc, 128, out=acc)
+    np.right_shift(acc, 8, out=term)
+    np.add(acc, term, out=acc)
+    np.right_shift(acc, 8, out=acc)
+    np.copyto(dst, acc, casting='unsafe')
+
+
+def _adjusted_watermark(watermark: PreparedWatermark, target_lum, arena: ScratchArena, gray: bool = False):
+    """按目标亮度提亮后的水印（uint8，四舍五入）；灰度水印只计算单通道"""
+    shape = watermark.lum.shape
+    scale = brightness_scale(watermark.lum, target_lum, arena.get('scale', shape, np.float32), arena)
+    src = watermark.unit[..., :1] if gray else watermark.unit[..., :3]
+    rgb = arena.get('wm_adjusted', src.shape, np.float32)
+    np.multiply(src, scale[..., np.newaxis], out=rgb)
+    np.clip(rgb, 0, 1, out=rgb)
+    np.multiply(rgb, 255, out=rgb)
+    np.add(rgb, 0.5, out=rgb)
+    adjusted = arena.get('wm_adjusted_u8', rgb.shape, np.uint8)
+    np.copyto(adjusted, rgb, casting='unsafe')
+    return adjusted[..., 0] if gray else adjusted
+
+
+def _split_channels(arr, mode: str):
+    """工作模式数组 → (颜色通道视图, alpha 视图或 None)"""
+    if mode == 'LA':
+        return arr[..., 0], arr[..., 1]
+    if mode == 'RGBA':
+        return arr[..., :3], arr[..., 3]
+    return arr, None
+
+
+class CompositeBackend:
+    """
+    合成后端接口：overlay 按水印 alpha 叠加，enhance 提亮水印后叠加
+
+    背景图以工作模式（RGB/RGBA/L/LA）传入，结果保持同一模式；其他模式按 RGBA 处理
+    """
+
+    name = None
+
+    def overlay(self, base_image: Image.Image, watermark: PreparedWatermark) -> Image.Image:
+        raise NotImplementedError
+
+    def enhance(self, base_image: Image.Image, watermark: PreparedWatermark,
+                boost_ratio: float = 1.2, target_lum=None) -> Image.Image:
+        raise NotImplementedError
+
+    def max_luminance(self, base_image: Image.Image) -> float:
+        """背景最大亮度（伽马校正后的相对亮度）"""
+        if base_image.mode in GRAY_MODES:
+            return float(np.max(lut_luminance(np.asarray(base_image.getchannel(0)))))
+        return float(np.max(lut_luminance(np.asarray(base_image.convert("RGB")))))
+
+    def _target(self, color, boost_ratio, target_lum):
+        if target_lum is None:
+            target_lum = min(float(np.max(lut_luminance(color))) * boost_ratio, 1.0)
+        return target_lum
+
+
+def _working_image(base_image: Image.Image) -> Image.Image:
+    return base_image if base_image.mode in WORKING_MODES else base_image.convert("RGBA")
+
+
+def _matches_watermark(base_image: Image.Image, watermark: PreparedWatermark) -> bool:
+    """叠加水印是否按背景的工作模式准备（否则交给 paste 自动转换）"""
+    return base_image.mode in WORKING_MODES and \
+        (base_image.mode in GRAY_MODES) == (watermark.image.mode in GRAY_MODES)
+
+
+class PillowNativeBackend(CompositeBackend):
+    name = 'pillow-native'
+
+    def overlay(self, base_image, watermark):
+        base_image.paste(watermark.image, (0, 0), watermark.mask)
+        return base_image
+
+    def enhance(self, base_image, watermark, boost_ratio=1.2, target_lum=None):
+        result = _working_image(base_image).copy()
+        gray = result.mode in GRAY_MODES
+        if target_lum is None:
+            color, _ = _split_channels(np.asarray(result), result.mode)
+            target_lum = self._target(color, boost_ratio, None)
+        adjusted = _adjusted_watermark(watermark, target_lum, thread_arena(), gray)
+        base_alpha = result.getchannel("A") if result.mode in ('LA', 'RGBA') else None
+        result.paste(Image.fromarray(adjusted, 'L' if gray else 'RGB'), (0, 0), watermark.mask)
+        if base_alpha is not None:
+            result.putalpha(ImageChops.lighter(base_alpha, watermark.mask))
+        return result
+
+
+class NumpyFixedBackend(CompositeBackend):
+    name = 'numpy-fixed'
+
+    def overlay(self, base_image, watermark):
+        if not _matches_watermark(base_image, watermark):
+            return _REGISTRY[PillowNativeBackend.name].overlay(base_image, watermark)
+        arr = np.array(base_image)
+        height, width = watermark.alpha.shape
+        src = watermark.pixels if arr.ndim == 2 else watermark.pixels[..., :arr.shape[-1]]
+        blend_fixed(arr[:height, :width], src, watermark.alpha)
+        return Image.fromarray(arr, base_image.mode)
+
+    def enhance(self, base_image, watermark, boost_ratio=1.2, target_lum=None):
+        arena = thread_arena()
+        base_image = _working_image(base_image)
+        result = np.array(base_image)
+        color, alpha = _split_channels(result, base_image.mode)
+        target_lum = self._target(color, boost_ratio, target_lum)
+        gray = base_image.mode in GRAY_MODES
+        blend_fixed(color, _adjusted_watermark(watermark, target_lum, arena, gray), watermark.alpha, arena)
+        if alpha is not None:
+            np.maximum(alpha, watermark.alpha, out=alpha)
+        return Image.fromarray(result, base_image.mode)
+
+
+class NumpyFloatBackend(CompositeBackend):
+    name = 'numpy-float'
+
+    def overlay(self, base_image, watermark):
+        if not _matches_watermark(base_image, watermark):
+            return _REGISTRY[PillowNativeBackend.name].overlay(base_image, watermark)
+        arena = thread_arena()
+        arr = np.array(base_image)
+        height, width = watermark.alpha.shape
+        region = arr[:height, :width]
+        src = to_unit_float(watermark.pixels if arr.ndim == 2 else watermark.pixels[..., :arr.shape[-1]],
+                            'overlay_src', arena)
+        dst = to_unit_float(region, 'overlay_dst', arena)
+        alpha = to_unit_float(watermark.alpha if arr.ndim == 2 else watermark.alpha[..., np.newaxis],
+                              'overlay_alpha', arena)
+        np.subtract(src, dst, out=src)
+        np.multiply(src, alpha, out=src)
+        np.add(dst, src, out=dst)
+        np.multiply(dst, 255, out=dst)
+        np.add(dst, 0.5, out=dst)
+        np.copyto(region, dst, casting='unsafe')
+        return Image.fromarray(arr, base_image.mode)
+
+    def enhance(self, base_image, watermark, boost_ratio=1.2, target_lum=None):
+        # 浮点内核按 RGB/RGBA 计算，灰度图计算后再转回
+        mode = _working_image(base_image).mode
+        kernel_mode = 'RGB' if mode in ('L', 'RGB') else 'RGBA'
+        arena = thread_arena()
+        if base_image.mode != kernel_mode:
+            base_image = base_image.convert(kernel_mode)
+        base_arr = to_unit_float(np.asarray(base_image), 'base_arr', arena)
+        if target_lum is None:
+            # 按背景最亮区域计算目标亮度（限制不超过最大亮度）
+            target_lum = target_luminance(base_arr[..., :3], boost_ratio, arena)
+        result = Image.fromarray(enhance_composite(base_arr, watermark.unit, target_lum, watermark.lum, arena))
+        return result if mode == kernel_mode else result.convert(mode)
+
+    def max_luminance(self, base_image):
+        arena = thread_arena()
+        base_rgb = to_unit_float(np.asarray(base_image.convert("RGB")), 'base_rgb', arena)
+        return float(np.max(luminance(base_rgb, arena.get('base_lum', base_rgb.shape[:-1]), arena)))
+
+
+_REGISTRY: Dict[str, CompositeBackend] = {}
+
+
+def register_backend(backend: CompositeBackend) -> CompositeBackend:
+    """注册合成后端（同名覆盖）"""
+    _REGISTRY[backend.name] = backend
+    return backend
+
+
+for _backend in (PillowNativeBackend(), NumpyFloatBackend(), NumpyFixedBackend()):
+    register_backend(_backend)
+
+
+def backend_names() -> Tuple[str, ...]:
+    return tuple(_REGISTRY)
+
+
+def get_backend(name: str) -> CompositeBackend:
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"未知的合成后端: {name}（可选: {AUTO}, {', '.join(_REGISTRY)}）") from None
+
+
+def benchmark_backends(op: str, size: Tuple[int, int] = BENCH_SIZE, repeats: int = 3) -> Dict[str, float]:
+    """在合成样本上测量各后端单帧耗时（秒，取多次最小值；首轮预热不计）"""
+    rng = np.random.default_rng(0)
+    width, height = size
+    base = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    npy_data = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    watermark = prepare_watermark(op, npy_data, size, opacity=0.5)
+    timings = {}
+    for name, backend in _REGISTRY.items():
+        best = float('inf')
+        for i in range(repeats + 1):
+            frame = base.copy()
+            start = time.perf_counter()
+            if op == OVERLAY:
+                backend.overlay(frame, watermark)
+            else:
+                backend.enhance(frame, watermark)
+            if i:
+                best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+_fastest: Dict[str, str] = {}
+_bench_timings: Dict[str, Dict[str, float]] = {}
+_bench_lock = threading.Lock()
+
+
+def fastest_backend(op: str) -> str:
+    """本机上指定运算最快的后端（进程内只测一次）"""
+    with _bench_lock:
+        if op not in _fastest:
+            timings = _bench_timings[op] = benchmark_backends(op)
+            _fastest[op] = min(timings, key=timings.get)
+        return _fastest[op]
+
+
+def benchmark_timings(op: str) -> Dict[str, float]:
+    """最近一次基准测试的各后端耗时（未测试时为空）"""
+    return dict(_bench_timings.get(op, {}))
@@ -0,0 +1,144 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import PIL
+from PIL import Image
+
+from .autotune import default_state_dir
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本（缩放/降质逻辑变化时递增，使旧条目失效）
+_FORMAT_VERSION = 1
+_SUFFIX = ".img"
+# 超出上限时淘汰到上限的该比例，避免每次写入都触发目录扫描
+_EVICT_TARGET = 0.9
+
+
+# 计算内容哈希时每次读取的字节数
+_CHUNK_BYTES = 1024 * 1024
+
+
+def content_hash(path) -> str:
+    """文件内容哈希（分块读取；hashlib.file_digest 需要 Python 3.11）"""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BaseImageCache:
+    """
+    降质后底图的磁盘 LRU 缓存
+
+    键为 (源文件内容哈希, 输出高度, 质量)，值为降质时编码出的字节（JPEG/PNG），
+    命中时解码即得与重新缩放降质完全相同的像素。最近使用时间记录在文件 mtime 上，
+    总大小超过上限时按 mtime 淘汰；写入先写临时文件再原子替换，可多进程共用目录。
+    """
+
+    def __init__(self, root: Path = None, max_bytes: int = 0):
+        self.root = Path(root) if root else default_state_dir() / "base_cache"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # 首次写入时扫描目录得到
+        self.reset_stats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.stores = self.evictions = 0
+
+    def key(self, digest: str, output_height: int, quality: int) -> str:
+        """digest 为源文件内容哈希（content_hash）"""
+        text = f"{digest}|{output_height}|{quality}|{PIL.__version__}|{_FORMAT_VERSION}"
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # 刷新最近使用时间
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return Image.open(io.BytesIO(data))
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"底图缓存写入失败: {e}")
+            return
+        with self._lock:
+            self.stores += 1
+            if self._total is None:
+                self._total = self._scan()[1]
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self):
+        """按最近使用时间淘汰（调用方持有锁）"""
+        entries, total = self._scan()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * _EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._total = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'size_mb': (self._total or 0) / (1024 * 1024),
+            }
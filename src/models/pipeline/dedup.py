@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+from .base_cache import content_hash
+from .scanner import BatchTask
+
+# 部分哈希读取的首尾字节数
+PARTIAL_BYTES = 64 * 1024
+
+
+def partial_hash(path, size: int) -> str:
+    """文件首尾各 PARTIAL_BYTES 字节的哈希（小文件即全文哈希）"""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_BYTES))
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(-PARTIAL_BYTES, os.SEEK_END)
+        digest.update(f.read(PARTIAL_BYTES))
+    return digest.hexdigest()
+
+
+def task_digest(task: BatchTask) -> str:
+    """任务输入的全文内容哈希（只计算一次，记在任务上供底图缓存复用）"""
+    if task.digest is None:
+        task.digest = content_hash(task.input_path)
+    return task.digest
+
+
+def _partial_digest(task: BatchTask) -> str:
+    # 小文件的首尾部分即全文，部分哈希与全文哈希相同，直接记为全文哈希
+    if task.size <= 2 * PARTIAL_BYTES:
+        return task_digest(task)
+    return partial_hash(task.input_path, task.size)
+
+
+def _output_kind(task: BatchTask) -> str:
+    """输出编码类型（内容相同但输出格式不同的文件不能互相复用）"""
+    ext = task.output_path.suffix.lower()
+    return ".jpg" if ext in (".jpg", ".jpeg") else ext
+
+
+@dataclass
+class DedupResult:
+    """去重结果：unique 为需要实际处理的任务，duplicates 为 (首个任务, 内容相同的其余任务)"""
+    unique: List[BatchTask]
+    duplicates: List[Tuple[BatchTask, List[BatchTask]]] = field(default_factory=list)
+    partial_hashed: int = 0
+    full_hashed: int = 0
+
+    @property
+    def duplicate_count(self) -> int:
+        return sum(len(copies) for _, copies in self.duplicates)
+
+    @property
+    def saved_bytes(self) -> int:
+        return sum(task.size for _, copies in self.duplicates for task in copies)
+
+
+def _refine(groups: List[List[BatchTask]], digest: Callable[[BatchTask], str],
+            executor: ThreadPoolExecutor) -> List[List[BatchTask]]:
+    """按摘要细分候选组，只保留仍有多个成员的组"""
+    flat = [task for group in groups for task in group]
+    digests = iter(executor.map(digest, flat))
+    refined = []
+    for group in groups:
+        buckets = defaultdict(list)
+        for task in group:
+            buckets[next(digests)].append(task)
+        refined.extend(bucket for bucket in buckets.values() if len(bucket) > 1)
+    return refined
+
+
+def _safe(fn: Callable[[BatchTask], str]) -> Callable[[BatchTask], str]:
+    def wrapper(task: BatchTask) -> str:
+        try:
+            return fn(task)
+        except OSError:
+            # 读取失败的文件视为唯一，交给正常流程报错
+            return f"unreadable:{task.input_path}"
+    return wrapper
+
+
+def dedupe_tasks(tasks: List[BatchTask], max_workers: int = None) -> DedupResult:
+    """
+    按内容去重：先按 (大小, 输出格式) 分组，同组再比较首尾部分哈希，最后比较全文哈希
+
+    大小唯一的文件不读取内容；保留扫描顺序中的第一个作为实际处理的任务
+    """
+    by_size = defaultdict(list)
+    for task in tasks:
+        by_size[(task.size, _output_kind(task))].append(task)
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    result = DedupResult(unique=tasks)
+    if not candidates:
+        return result
+
+    workers = max_workers or min(32, (os.cpu_count() or 4) * 2)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as executor:
+        result.partial_hashed = sum(len(group) for group in candidates)
+        groups = _refine(candidates, _safe(_partial_digest), executor)
+        # 小文件的部分哈希已覆盖全文，无需再算
+        small = [group for group in groups if group[0].size <= 2 * PARTIAL_BYTES]
+        large = [group for group in groups if group[0].size > 2 * PARTIAL_BYTES]
+        result.full_hashed = sum(len(group) for group in large)
+        groups = small + _refine(large, _safe(task_digest), executor)
+
+    order = {id(task): i for i, task in enumerate(tasks)}
+    duplicate_ids = set()
+    for group in groups:
+        group.sort(key=lambda task: order[id(task)])
+        result.duplicates.append((group[0], group[1:]))
+        duplicate_ids.update(id(task) for task in group[1:])
+    result.unique = [task for task in tasks if id(task) not in duplicate_ids]
+    return result
+
+
+def link_or_copy(src, dst) -> bool:
+    """以硬链接生成 dst（跨卷等失败时复制），返回是否为硬链接"""
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copyfile(src, dst)
+        return False
@@ -0,0 +1,279 @@
+"""
+输出编码档位
+
+按水印类型在 config.yaml 的 encoder_profiles 下配置 JPEG 质量/色度抽样/优化/渐进、WebP 与 AVIF 参数，
+output_profile 选择使用的档位。jpeg 档位只作用于 JPEG 输出；webp/avif 档位把所有输出转码为该格式
+（两者都支持 alpha），输出扩展名随之改变。PNG 输出（jpeg 档位下的透明/非 RGB 源图）按档位的
+png_* 参数编码：zlib 压缩级别与策略，以及颜色不超过 256 种时无损转调色板。
+"""
+import io
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from PIL import Image, features
+
+from .modes import JPEG_EXTS
+
+logger = logging.getLogger(__name__)
+
+JPEG, WEBP, AVIF, PNG = 'jpeg', 'webp', 'avif', 'png'
+# zlib 压缩策略（对应 Pillow 的 compress_type）
+ZLIB_STRATEGIES = {'default': 0, 'filtered': 1, 'huffman': 2, 'rle': 3, 'fixed': 4}
+PALETTE_MODES = ('off', 'lossless', 'lossy')
+_EXTENSIONS = {WEBP: '.webp', AVIF: '.avif'}
+# 未配置时沿用原有行为（质量 100 的 JPEG）
+LEGACY_PROFILE = 'jpeg-max'
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """单个编码档位"""
+    name: str
+    format: str = JPEG
+    quality: int = 100
+    subsampling: Optional[str] = None  # JPEG 色度抽样：4:4:4 / 4:2:2 / 4:2:0，None 为 Pillow 默认
+    optimize: bool = False  # JPEG 哈夫曼表优化
+    progressive: bool = False  # JPEG 渐进式
+    method: int = 4  # WebP 压缩力度 0（最快）~6（最小）
+    lossless: bool = False  # WebP 无损
+    speed: int = 6  # AVIF 编码速度 0（最慢最小）~10（最快）
+    png_compress_level: int = -1  # PNG zlib 压缩级别 0~9，-1 为 zlib 默认（6）
+    png_strategy: str = 'default'  # PNG zlib 策略：default/filtered/huffman/rle/fixed
+    png_palette: str = 'off'  # off；lossless：不超过 256 色时无损转调色板；lossy：超出时快速八叉树量化到 256 色
+
+    @property
+    def extension(self) -> Optional[str]:
+        """webp/avif 档位的输出扩展名（jpeg 档位不改扩展名，返回 None）"""
+        return _EXTENSIONS.get(self.format)
+
+    def output_paths(self, paths: Sequence[Path]) -> List[Path]:
+        """
+        按档位替换输出扩展名
+
+        同目录同名的输入（如 a.jpg 与 a.png）会撞名：按路径排序后第一个用 a.webp，
+        其余保留原扩展名写为 a.png.webp，结果与扫描顺序无关
+        """
+        ext = self.extension
+        if not ext:
+            return list(paths)
+        groups = defaultdict(list)
+        for index, path in enumerate(paths):
+            groups[path.with_suffix(ext)].append(index)
+        result = list(paths)
+        for target, indices in groups.items():
+            indices.sort(key=lambda i: str(paths[i]))
+            result[indices[0]] = target
+            for i in indices[1:]:
+                result[i] = paths[i].with_name(paths[i].name + ext)
+        return result
+
+    def save_kwargs(self, fmt: str) -> dict:
+        if fmt == JPEG:
+            if self.format != JPEG:
+                # webp/avif 档位下仍显式写 .jpg（单独调用 process_single）时沿用原有参数
+                return {'quality': 100}
+            kwargs = {'quality': self.quality, 'optimize': self.optimize, 'progressive': self.progressive}
+            if self.subsampling:
+                kwargs['subsampling'] = self.subsampling
+            return kwargs
+        if fmt == WEBP:
+            return {'quality': self.quality, 'method': self.method, 'lossless': self.lossless}
+        if fmt == AVIF:
+            return {'quality': self.quality, 'speed': self.speed}
+        if fmt == PNG:
+            return {'compress_level': self.png_compress_level, 'compress_type': ZLIB_STRATEGIES[self.png_strategy]}
+        return {}
+
+    def encode(self, image: Image.Image, fp, fmt: str = None) -> Image.Image:
+        """按档位编码写入 fp（文件路径或文件对象），返回实际编码的图像"""
+        fmt = fmt or self.format
+        if fmt == JPEG and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif fmt == PNG and self.png_palette != 'off':
+            image = to_palette(image, lossy=self.png_palette == 'lossy')
+        image.save(fp, format=fmt.upper(), **self.save_kwargs(fmt))
+        return image
+
+
+def _pack(pixels: np.ndarray) -> np.ndarray:
+    """(..., C) uint8 像素按通道大端拼成 uint32（与颜色元组的字典序一致）"""
+    packed = np.zeros(pixels.shape[:-1], dtype=np.uint32)
+    for channel in range(pixels.shape[-1]):
+        packed = (packed << 8) | pixels[..., channel]
+    return packed
+
+
+def to_palette(image: Image.Image, lossy: bool = False) -> Image.Image:
+    """
+    RGB/RGBA 转调色板
+
+    颜色不超过 256 种时逐像素精确映射（alpha 写入 tRNS），结果与原图像素完全一致；
+    超出时 lossy 以快速八叉树量化（不抖动），否则原样返回
+    """
+    if image.mode not in ("RGB", "RGBA"):
+        return image
+    colors = image.getcolors(256)
+    if colors is None:
+        if lossy:
+            return image.quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        return image
+    palette = np.array(sorted(color for _, color in colors), dtype=np.uint8)
+    indices = np.searchsorted(_pack(palette), _pack(np.asarray(image))).astype(np.uint8)
+    result = Image.frombytes("P", image.size, indices.tobytes())
+    result.putpalette(palette[:, :3].tobytes())
+    if image.mode == "RGBA":
+        result.info['transparency'] = palette[:, 3].tobytes()
+    return result
+
+
+DEFAULT_PROFILES: Dict[str, EncoderProfile] = {
+    LEGACY_PROFILE: EncoderProfile(LEGACY_PROFILE),
+    'jpeg': EncoderProfile('jpeg', quality=90, subsampling='4:2:0', optimize=True,
+                           png_compress_level=1, png_palette='lossless'),
+    'jpeg-progressive': EncoderProfile('jpeg-progressive', quality=85, subsampling='4:2:0', optimize=True,
+                                       progressive=True, png_compress_level=1, png_palette='lossless'),
+    'webp': EncoderProfile('webp', format=WEBP, quality=85, method=4),
+    'avif': EncoderProfile('avif', format=AVIF, quality=60, speed=8),
+}
+
+# PNG 参数对比基准的候选组合（只比较 png_* 参数）
+PNG_CANDIDATES: Dict[str, EncoderProfile] = {
+    'png-legacy': EncoderProfile('png-legacy'),
+    'png-level1': EncoderProfile('png-level1', png_compress_level=1),
+    'png-rle': EncoderProfile('png-rle', png_compress_level=1, png_strategy='rle'),
+    'png-huffman': EncoderProfile('png-huffman', png_compress_level=1, png_strategy='huffman'),
+    'png-level1-palette': EncoderProfile('png-level1-palette', png_compress_level=1, png_palette='lossless'),
+    'png-level1-lossy': EncoderProfile('png-level1-lossy', png_compress_level=1, png_palette='lossy'),
+}
+
+
+def avif_supported() -> bool:
+    return bool(features.check('avif'))
+
+
+def load_profiles(config: Optional[Mapping[str, Mapping]]) -> Dict[str, EncoderProfile]:
+    """内置档位 + 配置中的档位（同名覆盖，未写的字段取默认值）"""
+    names = {f.name for f in fields(EncoderProfile)} - {'name'}
+    profiles = dict(DEFAULT_PROFILES)
+    for name, options in (config or {}).items():
+        unknown = set(options) - names
+        if unknown:
+            raise ValueError(f"编码档位 {name} 含未知字段: {sorted(unknown)}")
+        profile = EncoderProfile(name, **options)
+        if profile.format not in (JPEG, WEBP, AVIF):
+            raise ValueError(f"编码档位 {name} 的格式不受支持: {profile.format}")
+        if profile.png_strategy not in ZLIB_STRATEGIES or profile.png_palette not in PALETTE_MODES:
+            raise ValueError(f"编码档位 {name} 的 PNG 参数无效: {profile.png_strategy} / {profile.png_palette}")
+        profiles[name] = profile
+    return profiles
+
+
+def resolve_profile(profiles: Mapping[str, EncoderProfile], name: str) -> EncoderProfile:
+    """按名称取档位；本机 Pillow 不支持 AVIF 时退回同质量的 WebP"""
+    if name not in profiles:
+        raise ValueError(f"未知的编码档位: {name}（可选: {', '.join(profiles)}）")
+    profile = profiles[name]
+    if profile.format == AVIF and not avif_supported():
+        logger.warning(f"当前 Pillow 不支持 AVIF，编码档位 {name} 改用 WebP")
+        profile = replace(profile, format=WEBP)
+    return profile
+
+
+def format_extension(fmt: str) -> str:
+    """输出格式对应的扩展名"""
+    extensions = {JPEG: '.jpg', PNG: '.png', **_EXTENSIONS}
+    if fmt not in extensions:
+        raise ValueError(f"不支持的输出格式: {fmt}（可选: {', '.join(extensions)}）")
+    return extensions[fmt]
+
+
+def output_format(path) -> Optional[str]:
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in JPEG_EXTS:
+        return JPEG
+    if ext == '.png':
+        return PNG
+    return next((fmt for fmt, fmt_ext in _EXTENSIONS.items() if fmt_ext == ext), None)
+
+
+def benchmark_profiles(images: Iterable[Image.Image], profiles: Mapping[str, EncoderProfile],
+                       repeats: int = 2, fmt: str = None) -> Dict[str, dict]:
+    """
+    在样本图像上测量各档位的编码耗时与输出大小（fmt 为 png 时比较各档位的 PNG 参数）
+
+    返回 {档位: {'seconds': 总耗时(各样本取多次最小值之和), 'bytes': 总字节数, 'mp_per_s': 吞吐}}
+    """
+    images = list(images)
+    megapixels = sum(image.width * image.height for image in images) / 1e6
+    report = {}
+    for name, profile in profiles.items():
+        if (fmt or profile.format) == AVIF and not avif_supported():
+            continue
+        seconds = size = 0
+        for image in images:
+            best = float('inf')
+            for _ in range(repeats):
+                buffer = io.BytesIO()
+                start = time.perf_counter()
+                profile.encode(image, buffer, fmt)
+                best = min(best, time.perf_counter() - start)
+            seconds += best
+            size += buffer.tell()
+        report[name] = {'seconds': seconds, 'bytes': size, 'mp_per_s': megapixels / seconds if seconds else 0.0}
+    return report
+
+
+def format_benchmark(report: Mapping[str, dict]) -> str:
+    lines = [f"{'档位':<18}{'编码耗时':>10}{'输出大小':>12}{'吞吐':>12}"]
+    for name, row in sorted(report.items(), key=lambda item: item[1]['bytes']):
+        lines.append(f"{name:<20}{row['seconds'] * 1000:>8.0f}ms{row['bytes'] / 1024:>10.0f}KB"
+                     f"{row['mp_per_s']:>8.1f}MP/s")
+    return "\n".join(lines)
+
+
+def _sample_images(count: int = 4, size=(1333, 1000)):
+    """合成样本：平滑渐变 + 纹理噪声 + 硬边，近似降质后照片的可压缩性"""
+    rng = np.random.default_rng(0)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    for i in range(count):
+        gradient = np.stack([x / width, y / height, (x + y) / (width + height)], axis=-1) * 255
+        noise = rng.normal(0, 6 + 4 * i, (height, width, 3))
+        pixels = gradient + noise
+        pixels[height // 3:height // 2, width // 4:width // 2] = rng.integers(0, 256, 3)
+        yield Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def _sample_assets(count: int = 2, size=(1333, 1000)):
+    """透明素材样本：纯色块 + 半透明条带（色数少，可无损转调色板）与带噪声的半透明照片区域"""
+    rng = np.random.default_rng(1)
+    width, height = size
+    flat = np.zeros((height, width, 4), dtype=np.uint8)
+    flat[height // 5:height * 4 // 5, width // 4:width * 3 // 4] = (200, 30, 30, 255)
+    flat[height * 2 // 5:height * 3 // 5, :, 3] = 128
+    yield Image.fromarray(flat)
+    for image in _sample_images(count - 1, size):
+        photo = image.convert("RGBA")
+        photo.putalpha(Image.fromarray(rng.integers(0, 2, (height, width), dtype=np.uint8) * 255))
+        yield photo
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        images = [Image.open(Path(arg)) for arg in sys.argv[1:]]
+        samples = [image.convert("RGB") for image in images]
+        assets = [image.convert("RGBA") for image in images if image.mode not in ("RGB", "L")]
+    else:
+        samples, assets = list(_sample_images()), list(_sample_assets())
+    print(format_benchmark(benchmark_profiles(samples, DEFAULT_PROFILES)))
+    if assets:
+        print()
+        print(format_benchmark(benchmark_profiles(assets, PNG_CANDIDATES, fmt=PNG)))
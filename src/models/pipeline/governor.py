@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .arena import set_resident_limit
+from .scanner import BatchTask
+from .streaming import BAND_ROWS, should_stream
+
+_MB = 1024 * 1024
+# 内存预算中留给线程临时缓冲区（全部线程合计的常驻量）的份额，其余用于在途像素
+ARENA_SHARE = 0.25
+
+# 各阶段每像素的工作集估算（字节）
+_DECODE_BYTES_PER_PIXEL = 4      # 源图解码（按 RGBA 上限估计）
+_PLAIN_BYTES_PER_PIXEL = 24      # 普通叠加：缩放图 + 降质副本 + 水印通道拆分
+_ENHANCE_BYTES_PER_PIXEL = 112   # 增强模式：多份 float32 RGBA/亮度/缩放系数临时数组
+
+
+def default_memory_budget() -> int:
+    """默认预算：物理内存的一半（无法获取时取 2GB）"""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        if total > 0:
+            return total // 2
+    except (AttributeError, ValueError, OSError):
+        pass
+    return 2048 * _MB
+
+
+def estimate_working_set(task: BatchTask, output_height: int, enhancement: bool, stream_threshold: int = 0) -> int:
+    """根据预扫描得到的尺寸估算单任务峰值内存（字节）"""
+    if not task.width or not task.height:
+        # 尺寸未知时按压缩文件体积的 10 倍保守估计
+        return max(task.size * 10, 64 * _MB)
+    out_width = max(1, int(task.width * output_height / task.height))
+    out_pixels = out_width * output_height
+    per_pixel = _ENHANCE_BYTES_PER_PIXEL if enhancement else _PLAIN_BYTES_PER_PIXEL
+    src_pixels = task.width * task.height
+    if not should_stream(task.width, task.height, stream_threshold):
+        return src_pixels * _DECODE_BYTES_PER_PIXEL + out_pixels * per_pixel
+    # 条带流式：JPEG 按 DCT 缩放解码（不超过输出的 2x2 倍），临时数组只占一个条带
+    if task.format == "JPEG":
+        src_pixels = min(src_pixels, out_pixels * 4)
+    band_pixels = out_width * min(BAND_ROWS, output_height)
+    return (src_pixels * _DECODE_BYTES_PER_PIXEL + out_pixels * _PLAIN_BYTES_PER_PIXEL
+            + band_pixels * per_pixel)
+
+
+class MemoryBudget:
+    """在途像素内存预算：任务开始前预留估算内存，预算不足时阻塞等待"""
+
+    def __init__(self, budget_bytes: int):
+        self.budget = max(1, int(budget_bytes))
+        self._used = 0
+        self._cond = threading.Condition()
+        self.peak = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def acquire(self, nbytes: int):
+        with self._cond:
+            # 超出总预算的单个任务在无其他任务时允许独占运行
+            if self._used and self._used + nbytes > self.budget:
+                self.waits += 1
+                start = time.perf_counter()
+                while self._used and self._used + nbytes > self.budget:
+                    self._cond.wait()
+                self.wait_time += time.perf_counter() - start
+            self._used += nbytes
+            self.peak = max(self.peak, self._used)
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self._used -= nbytes
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def stats(self) -> dict:
+        return {
+            'budget_mb': self.budget / _MB,
+            'peak_mb': self.peak / _MB,
+            'waits': self.waits,
+            'wait_time': self.wait_time,
+        }
+
+
+def split_memory_budget(budget_bytes: int) -> MemoryBudget:
+    """
+    把内存预算分给线程临时缓冲区与在途像素：前者设为全部线程缓冲区的常驻上限（进程级），
+    其余作为在途像素预算返回。批处理线程池、条带线程池与常驻线程池的缓冲区都计入同一上限
+    """
+    arena_bytes = int(budget_bytes * ARENA_SHARE)
+    set_resident_limit(arena_bytes)
+    return MemoryBudget(budget_bytes - arena_bytes)
@@ -0,0 +1,114 @@
+import numpy as np
+
+from .arena import ScratchArena, thread_arena
+
+# 水印亮度缩放倍率上下限
+_SCALE_MIN, _SCALE_MAX = 1.0, 5.0
+
+
+def gamma_correct(rgb, out=None, arena: ScratchArena = None):
+    """sRGB → 线性光；给定 out 时结果写入 out，临时数组取自 arena"""
+    if out is None:
+        return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    arena = arena or thread_arena()
+    low = arena.get('gamma_low', rgb.shape, rgb.dtype)
+    mask = arena.get('gamma_mask', rgb.shape, np.bool_)
+    np.add(rgb, 0.055, out=out)
+    np.divide(out, 1.055, out=out)
+    np.power(out, 2.4, out=out)
+    np.divide(rgb, 12.92, out=low)
+    np.less_equal(rgb, 0.04045, out=mask)
+    np.copyto(out, low, where=mask)
+    return out
+
+
+def luminance(rgb, out=None, arena: ScratchArena = None):
+    """相对亮度（伽马校正后），支持任意前导维度"""
+    if out is None:
+        return 0.2126 * gamma_correct(rgb[..., 0]) + \
+               0.7152 * gamma_correct(rgb[..., 1]) + \
+               0.0722 * gamma_correct(rgb[..., 2])
+    arena = arena or thread_arena()
+    linear = gamma_correct(rgb, arena.get('lum_linear', rgb.shape, rgb.dtype), arena)
+    term = arena.get('lum_term', out.shape, out.dtype)
+    np.multiply(linear[..., 0], 0.2126, out=out)
+    np.multiply(linear[..., 1], 0.7152, out=term)
+    np.add(out, term, out=out)
+    np.multiply(linear[..., 2], 0.0722, out=term)
+    np.add(out, term, out=out)
+    return out
+
+
+def to_unit_float(pixels, name: str, arena: ScratchArena = None):
+    """uint8 像素 → 0~1 float32（写入复用缓冲区）"""
+    arena = arena or thread_arena()
+    out = arena.get(name, pixels.shape, np.float32)
+    np.copyto(out, pixels, casting='unsafe')
+    np.divide(out, np.float32(255.0), out=out)
+    return out
+
+
+def target_luminance(base_rgb, boost_ratio=1.2, arena: ScratchArena = None):
+    """按背景最大亮度计算目标亮度；base_rgb 为 (..., H, W, 3)，返回 (..., 1, 1)"""
+    arena = arena or thread_arena()
+    lum = luminance(base_rgb, arena.get('base_lum', base_rgb.shape[:-1], base_rgb.dtype), arena)
+    max_bg_lum = np.max(lum, axis=(-2, -1), keepdims=True)
+    return np.minimum(max_bg_lum * boost_ratio, 1.0)
+
+
+def brightness_scale(wm_lum, target_lum, out, arena: ScratchArena = None):
+    """水印亮度缩放因子（仅增强不足的区域，已经足够亮的区域不调整），结果写入 out"""
+    arena = arena or thread_arena()
+    brighter = arena.get('scale_mask', out.shape, np.bool_)
+    np.add(wm_lum, 0.05, out=out)
+    np.divide(target_lum + 0.05, out, out=out)
+    np.less(wm_lum, target_lum, out=brighter)
+    np.copyto(out, 1.0, where=np.logical_not(brighter, out=brighter))
+    np.clip(out, _SCALE_MIN, _SCALE_MAX, out=out)
+    return out
+
+
+def enhance_composite(base_arr, wm_arr, target_lum, wm_lum=None, arena: ScratchArena = None):
+    """
+    增强水印亮度并与背景合成
+
+    base_arr: 背景 (..., H, W, 4) 或无 alpha 的 (..., H, W, 3) float32，取值 0~1；前导维度为批量维
+    wm_arr: 水印 (H, W, 4) float32，批内所有图像共享
+    target_lum: 标量或可广播到 (..., H, W) 的目标亮度
+    wm_lum: 预先计算的水印亮度 (H, W)，缓存水印时可复用
+    中间结果全部写入 arena 中的复用缓冲区，仅返回的 uint8 数组（通道数同 base_arr）为新分配
+    """
+    arena = arena or thread_arena()
+    base_rgb = base_arr[..., :3]
+    wm_rgb = wm_arr[..., :3]
+    wm_alpha = wm_arr[..., 3]
+    pixel_shape = base_arr.shape[:-1]
+
+    # 水印亮度与批内各图无关，只计算一次
+    if wm_lum is None:
+        wm_lum = luminance(wm_rgb, arena.get('wm_lum', wm_rgb.shape[:-1], wm_rgb.dtype), arena)
+
+    scale = brightness_scale(wm_lum, target_lum, arena.get('scale', pixel_shape, base_arr.dtype), arena)
+
+    # 保持色相调整亮度，再按水印透明度与背景合成（RGB 使用连续缓冲区，避免跨步写入）
+    composite_rgb = arena.get('composite_rgb', base_rgb.shape, base_arr.dtype)
+    np.multiply(wm_rgb, scale[..., np.newaxis], out=composite_rgb)
+    np.clip(composite_rgb, 0, 1, out=composite_rgb)
+    alpha = wm_alpha[..., np.newaxis]
+    np.multiply(composite_rgb, alpha, out=composite_rgb)
+    inv_alpha = arena.get('inv_alpha', alpha.shape, alpha.dtype)
+    np.subtract(1, alpha, out=inv_alpha)
+    background = arena.get('background', base_rgb.shape, base_rgb.dtype)
+    np.multiply(base_rgb, inv_alpha, out=background)
+    np.add(composite_rgb, background, out=composite_rgb)
+
+    # 重组 RGB(A) 并输出；无 alpha 的背景视为完全不透明，合成后仍不透明
+    result = np.empty(base_arr.shape, dtype=np.uint8)
+    np.multiply(composite_rgb, 255, out=composite_rgb)
+    np.copyto(result[..., :3], composite_rgb, casting='unsafe')
+    if base_arr.shape[-1] == 4:
+        composite_a = arena.get('composite_a', pixel_shape, base_arr.dtype)
+        np.maximum(base_arr[..., 3], wm_alpha, out=composite_a)
+        np.multiply(composite_a, 255, out=composite_a)
+        np.copyto(result[..., 3], composite_a, casting='unsafe')
+    return result
@@ -0,0 +1,52 @@
+"""
+按输入模式与输出格式选择合成工作模式
+
+合成结果只保留输出格式能表达的信息：JPEG 不含 alpha，灰度图配灰度水印无需展开成彩色。
+工作模式取能无损表达结果的最窄模式，避免 RGBA 展开再丢弃的整帧转换。
+"""
+import os
+
+import numpy as np
+from PIL import Image
+
+from .backends import GRAY_MODES, OVERLAY
+
+JPEG_EXTS = ('.jpg', '.jpeg')
+
+
+def is_jpeg_output(output_path) -> bool:
+    return os.path.splitext(str(output_path))[1].lower() in JPEG_EXTS
+
+
+def has_transparency(image: Image.Image) -> bool:
+    """图像是否带透明信息（alpha 通道或调色板/tRNS 透明色）"""
+    return image.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in image.info
+
+
+def is_gray_watermark(npy_data) -> bool:
+    """水印可见像素是否全部为灰色（R=G=B），灰色水印可直接在灰度模式下合成"""
+    if npy_data.ndim == 2:
+        return True
+    if npy_data.shape[-1] < 3:
+        return True
+    visible = npy_data[..., 3] > 0 if npy_data.shape[-1] == 4 else Ellipsis
+    r, g, b = (npy_data[..., i][visible] for i in range(3))
+    return bool(np.array_equal(r, g) and np.array_equal(g, b))
+
+
+def working_mode(image: Image.Image, op: str, alpha_output: bool, gray_watermark: bool) -> str:
+    """
+    合成使用的最窄模式
+
+    叠加模式在灰度图上沿用 paste 的语义（水印转灰度），增强模式仅在水印为灰色时保持灰度；
+    调色板等其他模式展开为 RGB/RGBA，仅当输出格式保留 alpha 且源图带透明信息时才保留 alpha。
+    """
+    alpha = alpha_output and has_transparency(image)
+    if image.mode in GRAY_MODES and (op == OVERLAY or gray_watermark):
+        return 'LA' if alpha else 'L'
+    return 'RGBA' if alpha else 'RGB'
+
+
+def to_mode(image: Image.Image, mode: str) -> Image.Image:
+    """转换到工作模式（已是该模式时不复制）"""
+    return image if image.mode == mode else image.convert(mode)
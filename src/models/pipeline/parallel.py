@@ -0,0 +1,54 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Tuple
+
+from .arena import current_usage, track_usage
+
+# 单个条带的最少行数（过细的切分会让调度开销超过收益）
+MIN_BAND_ROWS = 64
+# 启用文件内并行的最小输出像素数
+INTRA_MIN_PIXELS = 1_000_000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_band_pool() -> ThreadPoolExecutor:
+    """进程内共享的条带计算线程池（NumPy/Pillow 运算期间会释放 GIL）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="band")
+    return _pool
+
+
+def split_rows(height: int, parts: int) -> List[Tuple[int, int]]:
+    """将行区间均分为不超过 parts 段"""
+    parts = max(1, min(parts, height // MIN_BAND_ROWS))
+    step = -(-height // parts)
+    return [(y0, min(y0 + step, height)) for y0 in range(0, height, step)]
+
+
+def band_map(fn: Callable, items: Iterable, parallel: bool) -> list:
+    """在共享线程池中执行叶子级条带任务（任务内部不得再次提交到该线程池）"""
+    items = list(items)
+    if not parallel or len(items) < 2:
+        return [fn(item) for item in items]
+    # 条带线程的缓冲区命中计入提交方所在批次
+    usage = current_usage()
+
+    def run(item):
+        with track_usage(usage):
+            return fn(item)
+
+    return list(shared_band_pool().map(run, items))
+
+
+def choose_intra_parallelism(task_count: int, max_output_pixels: int, cpu_count: int = None) -> int:
+    """文件数少于核数且图像足够大时，把空闲核分给文件内条带并行"""
+    cpu_count = cpu_count or os.cpu_count() or 4
+    if task_count >= cpu_count or max_output_pixels < INTRA_MIN_PIXELS:
+        return 1
+    return max(1, cpu_count // max(1, task_count))
@@ -0,0 +1,83 @@
+"""
+单文件处理阶段规划
+
+打开图像只读文件头，根据尺寸、模式与 JPEG 量化表提前判定缩放/降质/模式转换是否为空操作，
+空操作阶段直接从计划中去掉。
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+# IJG 标准亮度量化表（自然顺序，与 Pillow quantization 一致）
+_STD_LUMA_QTABLE = np.array([
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+], dtype=np.int32)
+
+
+def _quality_tables() -> np.ndarray:
+    """质量 1~100 对应的亮度量化表 (100, 64)，缩放规则同 libjpeg"""
+    qualities = np.arange(1, 101, dtype=np.int32)[:, np.newaxis]
+    scale = np.where(qualities < 50, 5000 // qualities, 200 - 2 * qualities)
+    return np.clip((_STD_LUMA_QTABLE * scale + 50) // 100, 1, 255)
+
+
+_QUALITY_TABLES = _quality_tables()
+
+
+def estimate_jpeg_quality(image: Image.Image) -> Optional[int]:
+    """按亮度量化表反推 JPEG 质量（取最接近的 IJG 质量；非 JPEG 或表不完整时返回 None）"""
+    tables = getattr(image, 'quantization', None)
+    if image.format != 'JPEG' or not tables:
+        return None
+    luma = np.asarray(tables[min(tables)], dtype=np.int32)
+    if luma.size != 64:
+        return None
+    return int(np.argmin(np.abs(_QUALITY_TABLES - luma).sum(axis=1))) + 1
+
+
+@dataclass
+class StagePlan:
+    """单文件阶段计划：True 表示需要执行"""
+    resize: bool = True
+    degrade: bool = True
+    convert: bool = True
+    notes: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        stages = [('缩放', self.resize), ('降质', self.degrade), ('模式转换', self.convert)]
+        text = " | ".join(f"{name}: {'执行' if run else '跳过'}" for name, run in stages)
+        return f"{text} ({'; '.join(self.notes)})" if self.notes else text
+
+
+def plan_stages(image: Image.Image, output_height: int, quality: int, working_mode: str) -> StagePlan:
+    """
+    根据文件头规划阶段
+
+    缩放：已是目标高度时跳过
+    降质：非 RGB 走无损 PNG 往返，像素不变，直接跳过；RGB 仅在未缩放（像素网格与源 JPEG 相同）
+         且源 JPEG 质量不高于目标质量时跳过——缩放后的重采样会抹掉源图的压缩损失，不能据此判断
+    模式转换：降质不改变模式，源图模式即为工作模式时跳过
+    """
+    plan = StagePlan()
+    if image.height == output_height:
+        plan.resize = False
+        plan.notes.append("已是目标高度")
+    if image.mode != "RGB":
+        plan.degrade = False
+        plan.notes.append("PNG 降质无损")
+    elif not plan.resize:
+        source_quality = estimate_jpeg_quality(image)
+        if source_quality is not None and source_quality <= quality:
+            plan.degrade = False
+            plan.notes.append(f"源 JPEG 质量约 {source_quality} ≤ {quality}")
+    plan.convert = image.mode != working_mode
+    return plan
@@ -0,0 +1,66 @@
+import heapq
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from PIL import Image
+
+from .scanner import BatchTask
+
+logger = logging.getLogger(__name__)
+
+# 输出阶段（合成 + 编码）相对解码的单像素成本权重
+_OUTPUT_WEIGHT = 2.0
+
+
+def read_header(task: BatchTask) -> BatchTask:
+    """仅读取文件头获取尺寸（Image.open 为惰性加载，不触发解码）"""
+    try:
+        with Image.open(task.input_path) as img:
+            task.width, task.height = img.size
+            task.mode = img.mode
+            task.format = img.format
+    except Exception as e:
+        logger.debug(f"文件头读取失败: {task.input_path} | {e}")
+    return task
+
+
+def estimate_cost(task: BatchTask, output_height: int) -> float:
+    """预测处理成本（单位：百万像素当量）"""
+    if not task.width or not task.height:
+        # 文件头不可读时按文件大小粗略估计（约 3 字节/像素的压缩前体积）
+        return task.size / 3 / 1e6
+    src_pixels = task.width * task.height
+    out_pixels = int(task.width * output_height / task.height) * output_height
+    return (src_pixels + _OUTPUT_WEIGHT * out_pixels) / 1e6
+
+
+def prescan_tasks(tasks: Sequence[BatchTask], output_height: int, max_workers: int = None) -> None:
+    """并发读取文件头并填充任务的尺寸与预测成本"""
+    max_workers = max_workers or min(32, (os.cpu_count() or 4) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prescan") as executor:
+        for task in executor.map(read_header, tasks):
+            task.cost = estimate_cost(task, output_height)
+
+
+def simulate_makespan(costs: Sequence[float], workers: int) -> float:
+    """模拟线程池按给定顺序贪心分配任务时的完工时间"""
+    if not costs:
+        return 0.0
+    loads = [0.0] * max(1, min(workers, len(costs)))
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+def schedule_lpt(tasks: List[BatchTask], workers: int) -> Dict[str, float]:
+    """按预测成本降序（LPT）重排任务，返回调度前后的预测完工时间"""
+    before = simulate_makespan([t.cost for t in tasks], workers)
+    tasks.sort(key=lambda t: t.cost, reverse=True)
+    after = simulate_makespan([t.cost for t in tasks], workers)
+    return {
+        'total_cost': sum(t.cost for t in tasks),
+        'makespan_scan_order': before,
+        'makespan_lpt': after,
+    }
@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+OK, FAILED, DUPLICATE = 'ok', 'failed', 'duplicate'
+
+
+@dataclass(slots=True)
+class FileResult:
+    """
+    单个文件的处理结果
+
+    status 为 ok / failed / duplicate（内容与另一输入相同，输出由其链接或复制而来）；
+    timings 为各阶段耗时（秒）：prepare 解码缩放降质、composite 合成、encode 编码写出、total 总计、
+    write 写入输出压缩包（仅压缩包批处理）；批量合成组内的文件只有 total（组耗时均摊）
+    """
+    status: str
+    input_path: Path
+    output_path: Path
+    timings: Dict[str, float] = field(default_factory=dict)
+    bytes_written: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != FAILED
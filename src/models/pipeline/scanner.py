@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+
+@dataclass
+class BatchTask:
+    """单个文件的处理任务（携带扫描阶段已获得的 stat 信息，避免重复系统调用）"""
+    input_path: Path
+    output_path: Path
+    size: int = 0
+    mtime: float = 0.0
+    # 以下字段由文件头预扫描填充
+    width: int = 0
+    height: int = 0
+    mode: Optional[str] = None
+    format: Optional[str] = None
+    cost: float = 0.0
+    mem_bytes: int = 0
+    # 全文内容哈希（去重或底图缓存首次计算后记下，每个任务只读一遍全文）
+    digest: Optional[str] = None
+
+    def __iter__(self):
+        # 兼容旧的 (input_path, output_path) 元组解包写法
+        return iter((self.input_path, self.output_path))
+
+
+@dataclass
+class TaskGroup:
+    """输出尺寸相同、可一次向量化合成的一组任务"""
+    tasks: List[BatchTask]
+
+    @property
+    def cost(self) -> float:
+        return sum(task.cost for task in self.tasks)
+
+    @property
+    def mem_bytes(self) -> int:
+        return sum(task.mem_bytes for task in self.tasks)
+
+
+class OutputDirCache:
+    """输出目录延迟创建（记录已存在的目录，避免重复 mkdir）"""
+
+    def __init__(self):
+        self._known: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, path: Path):
+        with self._lock:
+            self._known.add(str(path))
+
+    def ensure(self, path: Path):
+        key = str(path)
+        if key in self._known:
+            return
+        with self._lock:
+            if key in self._known:
+                return
+            path.mkdir(parents=True, exist_ok=True)
+            # 父目录也一并标记为已存在
+            while key not in self._known:
+                self._known.add(key)
+                parent = os.path.dirname(key)
+                if not parent or parent == key:
+                    break
+                key = parent
+
+
+class ParallelDirScanner:
+    """并发目录遍历器（每个目录一次 scandir，复用 DirEntry 的类型与 stat 信息）"""
+
+    def __init__(self, supported_ext: Iterable[str], max_workers: int = None, logger: logging.Logger = None):
+        self._supported_ext = {ext.lower() for ext in supported_ext}
+        self._max_workers = max_workers or min(32, (os.cpu_count() or 4) * 2)
+        self._logger = logger or logging.getLogger(__name__)
+        self.skipped = 0
+
+    def scan(self, input_dir: Path, output_dir: Path) -> Iterator[BatchTask]:
+        """按目录完成顺序产出任务"""
+        self.skipped = 0
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="scan") as executor:
+            pending = {executor.submit(self._scan_dir, str(input_dir), str(output_dir))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tasks, subdirs, skipped = future.result()
+                    self.skipped += skipped
+                    for src_dir, dest_dir in subdirs:
+                        pending.add(executor.submit(self._scan_dir, src_dir, dest_dir))
+                    yield from tasks
+
+    def _scan_dir(self, src_dir: str, dest_dir: str) -> Tuple[List[BatchTask], List[Tuple[str, str]], int]:
+        tasks, subdirs, skipped = [], [], 0
+        try:
+            entries = os.scandir(src_dir)
+        except OSError as e:
+            self._logger.warning(f"🚫 目录读取失败: {src_dir} | {e}")
+            return tasks, subdirs, skipped
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        if ext in self._supported_ext:
+                            stat = entry.stat()
+                            dest_path = os.path.join(dest_dir, entry.name)
+                            self._logger.debug(f"✅ 添加任务: {entry.path} → {dest_path}")
+                            tasks.append(BatchTask(
+                                Path(entry.path), Path(dest_path),
+                                size=stat.st_size, mtime=stat.st_mtime
+                            ))
+                        else:
+                            skipped += 1
+                            self._logger.debug(f"⏩ 跳过非支持文件: {entry.path}")
+                    elif entry.is_dir():
+                        sub_output = os.path.join(dest_dir, entry.name)
+                        self._logger.debug(f"📂 进入子目录: {entry.path} → {sub_output}")
+                        subdirs.append((entry.path, sub_output))
+                    else:
+                        # 处理非常规文件（如符号链接）
+                        skipped += 1
+                        self._logger.warning(f"🚫 跳过非常规文件: {entry.path}")
+                except OSError as e:
+                    skipped += 1
+                    self._logger.warning(f"🚫 文件读取失败: {entry.path} | {e}")
+        return tasks, subdirs, skipped
@@ -0,0 +1,226 @@
+"""
+目标文件大小编码
+
+在不超过字节上限的前提下为每个输出找最高质量。图像统计量用“探针”：从原图均匀取若干全分辨率小块
+拼成的拼贴图，编码开销约为整图的一成，而每像素比特随质量的变化与整图高度一致。
+批内按格式共享一个线性模型 log(整图每像素比特) ≈ w · [1, log(探针每像素比特), q, q²]，
+以恒等关系为先验，每次整图编码后做岭回归更新。
+
+单个文件在探针上二分查找模型预测不超限的最高质量（瞄准容差带中间），整图编码后用实际大小修正
+该图的偏移量再查找；查找范围始终是已知可行/不可行的质量区间，进入容差带或预测高一级质量会超限时停止。
+
+PNG 没有质量参数：依次尝试档位本身、调色板（无损 → 有损量化）与最高压缩级别，取首个不超限的结果；
+都超限时写出最小的结果并计入超限。
+"""
+import io
+import math
+import threading
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from .encoders import AVIF, JPEG, PALETTE_MODES, WEBP, EncoderProfile
+
+LOSSY_FORMATS = (JPEG, WEBP, AVIF)
+# 探针拼贴：GRID x GRID 个边长 TILE 的全分辨率块，块位置对齐 16 像素（与 4:2:0 的 MCU 一致）
+_GRID, _TILE = 6, 64
+# 先验：整图与探针的每像素比特相同
+_PRIOR = np.array([0.0, 1.0, 0.0, 0.0])
+# 先验的岭回归强度（相当于若干条先验观测）
+_RIDGE = 2.0
+# 大小落在上限的该比例以内即视为已找到最高质量，不再向上试探
+_TOLERANCE = 0.08
+
+
+def probe_image(image: Image.Image) -> Image.Image:
+    """均匀取块拼成探针；图像不足拼贴两倍大小时直接用原图"""
+    side = _GRID * _TILE
+    if image.width < side or image.height < side or image.width * image.height <= 2 * side * side:
+        return image
+    probe = Image.new(image.mode, (side, side))
+    for row in range(_GRID):
+        for col in range(_GRID):
+            x = int((col + 0.5) * image.width / _GRID) - _TILE // 2
+            y = int((row + 0.5) * image.height / _GRID) - _TILE // 2
+            x, y = x - x % 16, y - y % 16
+            probe.paste(image.crop((x, y, x + _TILE, y + _TILE)), (col * _TILE, row * _TILE))
+    return probe
+
+
+def _features(probe_log_bpp: float, quality: int) -> np.ndarray:
+    q = quality / 100.0
+    return np.array([1.0, probe_log_bpp, q, q * q])
+
+
+def _log_bpp(size: int, pixels: int) -> float:
+    return math.log(max(size, 1) * 8 / pixels)
+
+
+class SizeModel:
+    """单一格式的“探针 → 整图”大小模型（线程安全）"""
+
+    def __init__(self):
+        self._weights = _PRIOR.copy()
+        self._gram = np.zeros((4, 4))
+        self._moment = np.zeros(4)
+        self._lock = threading.Lock()
+
+    def predict(self, probe_log_bpp: float, quality: int) -> float:
+        """预测整图 log(每像素比特)"""
+        with self._lock:
+            weights = self._weights
+        return float(_features(probe_log_bpp, quality) @ weights)
+
+    def observe(self, probe_log_bpp: float, quality: int, log_bpp: float):
+        row = _features(probe_log_bpp, quality)
+        with self._lock:
+            self._gram += np.outer(row, row)
+            self._moment += row * log_bpp
+            eye = np.eye(4) * _RIDGE
+            self._weights = np.linalg.solve(self._gram + eye, self._moment + eye @ _PRIOR)
+
+
+class TargetSizeEncoder:
+    """按字节上限编码：每批一个实例，批内各文件共享大小模型"""
+
+    def __init__(self, target_bytes: int, min_quality: int = 5):
+        self.target_bytes = target_bytes
+        self.min_quality = min_quality
+        self._models: Dict[str, SizeModel] = {}
+        self._lock = threading.Lock()
+        self.attempts = Counter()
+        self.qualities = []
+        self.over_budget = 0
+        # 需要调色板量化或提高压缩级别才满足上限的 PNG 输出数
+        self.palette_fallbacks = 0
+
+    def _model(self, fmt: str) -> SizeModel:
+        with self._lock:
+            if fmt not in self._models:
+                self._models[fmt] = SizeModel()
+            return self._models[fmt]
+
+    def encode(self, image: Image.Image, profile: EncoderProfile, fmt: str):
+        """返回 (编码字节, 质量, 整图编码次数)；质量上限为档位质量，最低质量仍超限时返回最低质量的结果"""
+        if fmt not in LOSSY_FORMATS:
+            return self._encode_lossless(image, profile, fmt)
+        model = self._model(fmt)
+        pixels = image.width * image.height
+        limit = _log_bpp(self.target_bytes, pixels)
+        # 瞄准容差带中间，降低预测略偏大时超限重试的概率
+        aim = limit + math.log(1 - _TOLERANCE / 2)
+
+        probe = probe_image(image)
+        probe_pixels = probe.width * probe.height
+        probe_sizes = {}
+
+        def probe_log_bpp(quality: int) -> float:
+            if quality not in probe_sizes:
+                buffer = io.BytesIO()
+                replace(profile, quality=quality).encode(probe, buffer, fmt)
+                probe_sizes[quality] = _log_bpp(buffer.tell(), probe_pixels)
+            return probe_sizes[quality]
+
+        offset = 0.0
+
+        def estimate(quality: int) -> float:
+            return model.predict(probe_log_bpp(quality), quality) + offset
+
+        # low: 已知不超限的最高质量，high: 已知超限的最低质量（初始为区间外的哨兵）
+        low, high = self.min_quality - 1, max(profile.quality, self.min_quality) + 1
+        best, data, attempts = None, None, 0
+        while True:
+            quality = _highest_fitting(estimate, aim, low + 1, high - 1)
+            buffer = io.BytesIO()
+            replace(profile, quality=quality).encode(image, buffer, fmt)
+            data, attempts = buffer.getvalue(), attempts + 1
+            log_bpp = _log_bpp(len(data), pixels)
+            model.observe(probe_log_bpp(quality), quality, log_bpp)
+            # 本图相对（已更新的）模型的偏移，后续预测按此修正
+            offset = 0.0
+            offset = log_bpp - estimate(quality)
+            if len(data) <= self.target_bytes:
+                best, low = (data, quality), quality
+                # 已进入容差带，或预测高一级质量就会超限（低质量区间单级步长常超过容差）时停止
+                if len(data) >= self.target_bytes * (1 - _TOLERANCE) or (
+                        quality + 1 < high and estimate(quality + 1) > limit):
+                    break
+            else:
+                high = quality
+            if high - low <= 1:
+                break
+        with self._lock:
+            self.attempts[attempts] += 1
+            if best is None:
+                self.over_budget += 1
+                best = (data, quality)
+            self.qualities.append(best[1])
+        return best[0], best[1], attempts
+
+    def _encode_lossless(self, image: Image.Image, profile: EncoderProfile, fmt: str):
+        """无质量参数的格式（PNG）：按降级顺序编码，返回 (首个不超限的编码字节, None, 整图编码次数)"""
+        modes = PALETTE_MODES[PALETTE_MODES.index(profile.png_palette) + 1:]
+        if image.mode not in ("RGB", "RGBA"):
+            # 调色板只作用于 RGB/RGBA
+            modes = ()
+        elif image.getcolors(256) is None:
+            # 超过 256 色时无损调色板即原图，跳过这一级
+            modes = tuple(mode for mode in modes if mode != 'lossless')
+        ladder = [profile] + [replace(profile, png_palette=mode) for mode in modes]
+        if ladder[-1].png_compress_level != 9:
+            ladder.append(replace(ladder[-1], png_compress_level=9))
+        smallest = None
+        for attempts, step in enumerate(ladder, 1):
+            buffer = io.BytesIO()
+            step.encode(image, buffer, fmt)
+            data = buffer.getvalue()
+            if smallest is None or len(data) < len(smallest):
+                smallest = data
+            if len(data) <= self.target_bytes:
+                break
+        with self._lock:
+            self.attempts[attempts] += 1
+            if len(smallest) > self.target_bytes:
+                self.over_budget += 1
+            elif attempts > 1:
+                self.palette_fallbacks += 1
+        return smallest, None, attempts
+
+    def save(self, image: Image.Image, fp, profile: EncoderProfile, fmt: str) -> Optional[int]:
+        """编码并写出到 fp（文件路径或文件对象），返回使用的质量（PNG 为 None）"""
+        data, quality, _ = self.encode(image, profile, fmt)
+        if hasattr(fp, 'write'):
+            fp.write(data)
+        else:
+            Path(fp).write_bytes(data)
+        return quality
+
+    def stats(self) -> dict:
+        with self._lock:
+            files = sum(self.attempts.values())
+            return {
+                'target_kb': self.target_bytes / 1024,
+                'files': files,
+                'over_budget': self.over_budget,
+                'palette_fallbacks': self.palette_fallbacks,
+                'attempts': dict(sorted(self.attempts.items())),
+                'mean_attempts': sum(k * v for k, v in self.attempts.items()) / files if files else 0.0,
+                'mean_quality': sum(self.qualities) / len(self.qualities) if self.qualities else 0.0,
+            }
+
+
+def _highest_fitting(estimate: Callable[[int], float], aim: float, low: int, high: int) -> int:
+    """[low, high] 内估计值不超过 aim 的最高质量（假定随质量单调递增；都超过时取 low）"""
+    if estimate(high) <= aim:
+        return high
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate(middle) <= aim:
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,50 @@
+import threading
+from typing import Iterator, Tuple
+
+from PIL import Image
+
+# 条带高度取 16 的倍数，与 JPEG 4:2:0 的 MCU 对齐，降质重编码不会在条带边界引入额外块效应
+BAND_ROWS = 256
+# JPEG 4:2:0 的 MCU 行数：降质时条带上下各带一个 MCU 的上下文行
+MCU_ROWS = 16
+# 缩放时先按整数倍 reduce 的阈值（大幅缩小时显著减少重采样计算量）
+_REDUCING_GAP = 3.0
+
+_limit_lock = threading.Lock()
+
+
+def allow_large_images(max_pixels: int) -> None:
+    """放宽 Pillow 解压炸弹上限（只放宽不收紧；超大图由流式路径与内存预算兜底）"""
+    with _limit_lock:
+        current = Image.MAX_IMAGE_PIXELS
+        if current is not None and current < max_pixels:
+            Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+def should_stream(width: int, height: int, threshold_pixels: int) -> bool:
+    return threshold_pixels > 0 and width * height > threshold_pixels
+
+
+def draft_for_output(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """JPEG 在 DCT 域按 1/2~1/8 直接缩小解码，解码内存与输出尺寸而非原图面积相关"""
+    if image.format == "JPEG":
+        image.draft(image.mode, size)
+    return image
+
+
+def iter_bands(height: int, band_rows: int = BAND_ROWS) -> Iterator[Tuple[int, int]]:
+    for y0 in range(0, height, band_rows):
+        yield y0, min(y0 + band_rows, height)
+
+
+def with_context(y0: int, y1: int, height: int, rows: int = MCU_ROWS) -> Tuple[int, int]:
+    """条带行区间上下各扩展 rows 行（不超出图像），上端仍保持 MCU 对齐"""
+    return max(0, y0 - rows), min(height, y1 + rows)
+
+
+def resize_band(source: Image.Image, size: Tuple[int, int], y0: int, y1: int) -> Image.Image:
+    """从源图中重采样出输出图的第 y0~y1 行"""
+    width, height = size
+    scale_y = source.height / height
+    box = (0, y0 * scale_y, source.width, y1 * scale_y)
+    return source.resize((width, y1 - y0), box=box, reducing_gap=_REDUCING_GAP)
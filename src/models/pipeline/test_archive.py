@@ -0,0 +1,89 @@
+# test_archive.py
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.models.conftest import write_image
+
+
+def _images(root):
+    return {
+        'a.jpg': write_image(root / "a.jpg").read_bytes(),
+        'sub/b.png': write_image(root / "sub" / "b.png", size=(200, 260), mode="RGBA", seed=1).read_bytes(),
+    }
+
+
+def _write_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return path
+
+
+def _write_tar(path, members):
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _read_zip(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def _read_tar(path):
+    with tarfile.open(path) as archive:
+        return {info.name: archive.extractfile(info).read() for info in archive.getmembers()}
+
+
+@pytest.mark.parametrize("source, sink", [
+    (("in.zip", _write_zip), ("out.tar.gz", _read_tar)),
+    (("in.tar.gz", _write_tar), ("out.zip", _read_zip)),
+])
+def test_archive_round_trip_matches_directory_batch(tmp_path, make_processor, source, sink):
+    images = _images(tmp_path / "in")
+    expected_dir = tmp_path / "expected"
+    make_processor('normal').process_batch(tmp_path / "in", expected_dir)
+    # 不支持的扩展名与越界路径的成员被跳过
+    members = {**images, 'notes.txt': b'skip', '../escape.jpg': images['a.jpg']}
+    (source_name, write), (sink_name, read) = source, sink
+    archive = write(tmp_path / source_name, members)
+    processor = make_processor('normal')
+
+    outputs = processor.process_batch(archive, tmp_path / sink_name)
+
+    assert sorted(outputs) == sorted(tmp_path / sink_name / name for name in images)
+    written = read(tmp_path / sink_name)
+    assert list(written) == list(images)
+    for name, data in written.items():
+        assert data == (expected_dir / name).read_bytes()
+    assert processor._archive_stats['members'] == 2 and processor._archive_stats['skipped'] == 2
+
+
+def test_archive_to_directory_renames_for_profile(tmp_path, make_processor):
+    images = _images(tmp_path / "in")
+    archive = _write_zip(tmp_path / "in.zip", images)
+
+    outputs = make_processor('normal').process_batch(archive, tmp_path / "out", output_profile='webp')
+
+    assert sorted(path.relative_to(tmp_path / "out").as_posix() for path in outputs) == ['a.webp', 'sub/b.webp']
+    assert all(path.exists() for path in outputs)
+
+
+def test_archive_members_reserve_memory_budget(tmp_path, make_processor):
+    members = {f"{i}.jpg": write_image(tmp_path / "in" / f"{i}.jpg", size=(400, 300), seed=i).read_bytes()
+               for i in range(6)}
+    archive = _write_zip(tmp_path / "in.zip", members)
+    processor = make_processor('normal')
+
+    outputs = processor.process_batch(archive, tmp_path / "out.zip", memory_budget_mb=4)
+
+    assert len(outputs) == 6
+    memory = processor._memory_stats
+    # 预算的 1/4 留给线程临时缓冲区；单个成员的工作集约 0.5MB，在途预留不超过剩余的 3MB
+    assert memory['budget_mb'] == 3 and 0 < memory['peak_mb'] <= 3
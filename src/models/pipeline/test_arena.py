@@ -0,0 +1,74 @@
+# test_arena.py
+import threading
+
+import numpy as np
+
+from src.models.pipeline.arena import STATS, ArenaUsage, set_resident_limit, thread_arena, track_usage
+from src.models.pipeline.governor import split_memory_budget
+from src.models.pipeline.parallel import band_map
+
+
+def test_usage_is_counted_per_batch():
+    first, second = ArenaUsage(), ArenaUsage()
+
+    def work(usage, name):
+        with track_usage(usage):
+            for _ in range(3):
+                thread_arena().get(name, (4, 4), np.float32)
+
+    threads = [threading.Thread(target=work, args=(first, 'a')), threading.Thread(target=work, args=(second, 'b'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    thread_arena().get('untracked', (4, 4))
+
+    assert first.snapshot()['misses'] == 1 and first.snapshot()['hits'] == 2
+    assert second.snapshot()['misses'] == 1 and second.snapshot()['hits'] == 2
+
+
+def test_band_threads_count_into_submitting_batch():
+    usage = ArenaUsage()
+    with track_usage(usage):
+        band_map(lambda i: thread_arena().get('band', (8, 8)), range(6), parallel=True)
+
+    stats = usage.snapshot()
+    assert stats['hits'] + stats['misses'] == 6
+
+
+def test_resident_memory_is_bounded_across_threads():
+    mb = 1024 * 1024
+    baseline = STATS.resident
+    limit = baseline + 4 * mb
+    set_resident_limit(limit)
+    usage, shapes = ArenaUsage(), []
+    ready, done = threading.Barrier(9), threading.Event()
+
+    def work():
+        with track_usage(usage):
+            # 每个线程 3 个 1MB 缓冲区，8 个线程合计 24MB，远超 4MB 上限
+            for _ in range(2):
+                shapes.extend(thread_arena().get(f"buf{i}", (512, 512)).shape for i in range(3))
+        # 线程存活期间缓冲区保持常驻
+        ready.wait()
+        done.wait(30)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    try:
+        assert baseline < STATS.resident <= limit
+        assert usage.snapshot()['peak_resident_mb'] <= limit / mb
+        assert shapes == [(512, 512)] * 48
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_memory_budget_reserves_arena_share():
+    budget = split_memory_budget(400 * 1024 * 1024)
+
+    assert STATS.limit == 100 * 1024 * 1024
+    assert budget.budget == 300 * 1024 * 1024
@@ -0,0 +1,57 @@
+# test_autotune.py
+import os
+import threading
+import time
+
+from src.models.conftest import write_image
+from src.models.pipeline.autotune import AdaptiveConcurrencyController, ConcurrencyGate, WorkerTuningStore
+
+
+def test_tuning_key_covers_cores_and_cost_params(tmp_path, monkeypatch):
+    key = WorkerTuningStore.key('normal', tmp_path, True, 'numpy-fixed')
+    assert key != WorkerTuningStore.key('normal', tmp_path, False, 'numpy-fixed')
+    assert key != WorkerTuningStore.key('normal', tmp_path, True, 'pillow-native')
+    cores = os.cpu_count() or 1
+    monkeypatch.setattr(os, 'cpu_count', lambda: cores + 64)
+    assert key != WorkerTuningStore.key('normal', tmp_path, True, 'numpy-fixed')
+
+
+def test_remembered_workers_are_start_not_ceiling(tmp_path, make_processor, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    processor = make_processor('normal')
+    input_dir = tmp_path / "in"
+    for i in range(8):
+        write_image(input_dir / f"{i}.jpg", seed=i)
+    params, final_params, _ = processor._start_batch(input_dir, tmp_path / "out", {'dedup_inputs': False})
+    key = processor._tuning_store.key('normal', input_dir, params.enhancement, processor._backend_stats['name'])
+    processor._tuning_store.put(key, 1, 10.0)
+
+    plan = processor._plan_batch(input_dir, tmp_path / "out", params, final_params)
+
+    assert plan.tuning_key == key
+    assert processor._concurrency_gate.limit == 1
+    assert plan.pool_size == 8
+
+
+def test_controller_climbs_above_starting_limit():
+    gate = ConcurrencyGate(1)
+    controller = AdaptiveConcurrencyController(gate, 1, 4, interval=0.05)
+    stop = threading.Event()
+
+    def feed():
+        # 吞吐量与并发上限成正比，且几乎不占 CPU
+        while not stop.is_set():
+            time.sleep(0.002)
+            for _ in range(gate.limit):
+                controller.task_done()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    controller.start()
+    deadline = time.monotonic() + 5
+    while gate.limit == 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    controller.stop()
+    stop.set()
+    feeder.join()
+    assert gate.limit > 1
@@ -0,0 +1,74 @@
+# test_base_cache.py
+import os
+import shutil
+import time
+from collections import Counter
+
+from src.models.conftest import write_image
+from src.models.interfaces import base_processor
+from src.models.pipeline import dedup
+from src.models.pipeline.base_cache import BaseImageCache, content_hash
+
+
+def _key(cache, name):
+    return cache.key(name, 100, 30)
+
+
+def test_cache_hits_and_evicts_least_recently_used(tmp_path):
+    cache = BaseImageCache(tmp_path / "cache", max_bytes=3500)
+    image = write_image(tmp_path / "a.png", size=(8, 8)).read_bytes()
+    entry = image + b"\0" * (1000 - len(image))
+    assert cache.get(_key(cache, "a")) is None
+
+    for name in ("a", "b", "c"):
+        cache.put(_key(cache, name), entry)
+        time.sleep(0.01)
+    assert cache.get(_key(cache, "a")) is not None  # 刷新 a 的使用时间
+    cache.put(_key(cache, "d"), entry)
+
+    assert cache.get(_key(cache, "b")) is None
+    assert all(cache.get(_key(cache, name)) is not None for name in ("a", "c", "d"))
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['stores'] == 4 and stats['hits'] == 4 and stats['misses'] == 2
+
+
+def test_rerun_hits_cache_with_identical_output(tmp_path, make_processor):
+    processor = make_processor('normal', base_cache_mb=64)
+    input_dir = tmp_path / "in"
+    for i in range(3):
+        write_image(input_dir / f"{i}.jpg", seed=i)
+
+    processor.process_batch(input_dir, tmp_path / "first")
+    assert processor._base_cache_stats['misses'] == 3 and processor._base_cache_stats['stores'] == 3
+    processor.process_batch(input_dir, tmp_path / "second", opacity=40)
+    processor.process_batch(input_dir, tmp_path / "third")
+
+    assert processor._base_cache_stats['hits'] == 3 and processor._base_cache_stats['misses'] == 0
+    for i in range(3):
+        assert (tmp_path / "first" / f"{i}.jpg").read_bytes() == (tmp_path / "third" / f"{i}.jpg").read_bytes()
+
+
+def test_content_hashed_once_per_task_for_dedup_and_cache(tmp_path, make_processor, monkeypatch):
+    calls = Counter()
+
+    def counting_hash(path):
+        calls[os.fspath(path)] += 1
+        return content_hash(path)
+
+    monkeypatch.setattr(dedup, 'content_hash', counting_hash)
+    monkeypatch.setattr(base_processor, 'content_hash', counting_hash)
+    processor = make_processor('normal', base_cache_mb=64)
+    input_dir = tmp_path / "in"
+    # 噪声 PNG 大于部分哈希覆盖的首尾字节，去重需要全文哈希
+    source = write_image(tmp_path / "big.png", size=(400, 300), fmt="PNG")
+    assert source.stat().st_size > 2 * dedup.PARTIAL_BYTES
+    input_dir.mkdir()
+    for name in ("a.png", "b.png"):
+        shutil.copy(source, input_dir / name)
+    write_image(input_dir / "c.png", size=(300, 200), seed=1, fmt="PNG")
+
+    processor.process_batch(input_dir, tmp_path / "out")
+
+    assert processor._dedup.duplicate_count == 1
+    assert processor._base_cache_stats['stores'] == 2
+    assert calls and max(calls.values()) == 1
@@ -0,0 +1,63 @@
+# test_sizefit.py
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.models.conftest import write_image
+from src.models.pipeline.encoders import JPEG, PNG, EncoderProfile
+from src.models.pipeline.sizefit import TargetSizeEncoder
+
+
+def _noise(mode, size=(240, 160), seed=0):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], len(mode)), dtype=np.uint8), mode)
+
+
+def test_jpeg_batch_outputs_stay_under_target(tmp_path, make_processor):
+    processor = make_processor('normal', target_size_kb=12)
+    input_dir = tmp_path / "in"
+    for i in range(4):
+        write_image(input_dir / f"{i}.jpg", size=(400, 300), seed=i)
+
+    outputs = processor.process_batch(input_dir, tmp_path / "out")
+
+    assert len(outputs) == 4
+    assert all(path.stat().st_size <= 12 * 1024 for path in outputs)
+    assert processor._size_fitter.stats()['over_budget'] == 0
+
+
+def test_png_falls_back_to_palette_to_meet_target():
+    image = _noise("RGBA")
+    profile = EncoderProfile('jpeg', png_compress_level=1, png_palette='lossless')
+    plain = io.BytesIO()
+    profile.encode(image, plain, PNG)
+    fitter = TargetSizeEncoder(plain.tell() // 2)
+
+    data, quality, attempts = fitter.encode(image, profile, PNG)
+
+    assert quality is None and attempts > 1
+    assert len(data) <= fitter.target_bytes
+    assert Image.open(io.BytesIO(data)).mode == "P"
+    assert fitter.stats()['palette_fallbacks'] == 1 and fitter.stats()['over_budget'] == 0
+
+
+def test_png_over_budget_is_counted_and_smallest_result_kept():
+    image = _noise("RGB")
+    fitter = TargetSizeEncoder(1024)
+
+    data, _, attempts = fitter.encode(image, EncoderProfile('jpeg'), PNG)
+
+    assert len(data) > 1024
+    assert fitter.stats()['over_budget'] == 1
+    # 无损调色板对超过 256 色的图像无效，跳过：档位本身 → 有损调色板 → 最高压缩级别
+    assert attempts == 3
+
+
+def test_lossy_search_respects_profile_quality_ceiling():
+    image = _noise("RGB", size=(64, 64))
+    fitter = TargetSizeEncoder(10 * 1024 * 1024)
+
+    _, quality, _ = fitter.encode(image, EncoderProfile('jpeg', JPEG, quality=70), JPEG)
+
+    assert quality == 70
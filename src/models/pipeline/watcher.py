@@ -0,0 +1,107 @@
+"""
+监视目录：stat 快照对比轮询
+
+每次轮询用并发目录遍历（每个目录一次 scandir，复用 DirEntry 的 stat）取得 路径 → (大小, 修改时间) 快照，
+与上次交付的签名对比找出新增/修改的文件。文件可能仍在写入（复制工具常保留源文件修改时间，不能只看 mtime），
+只有连续多次轮询签名不变且持续 settle_seconds 以上才交付；写入中的文件签名每次变化会重新计时。
+"""
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from .scanner import ParallelDirScanner
+
+Signature = Tuple[int, float]
+
+
+@dataclass
+class ReadyFile:
+    """已写入完成、待处理的文件"""
+    path: Path
+    size: int
+    mtime: float
+    detected: float  # 首次发现（或最近一次变化）的时间，time.time()
+    settled: float  # 判定写入完成的时间
+
+
+@dataclass
+class _Pending:
+    signature: Signature
+    detected: float
+    changed: float
+
+
+class StatSnapshotPoller:
+    """stat 快照对比轮询器：只交付新增/修改且大小、修改时间已稳定的文件"""
+
+    def __init__(self, root: Path, supported_ext: Iterable[str], settle_seconds: float = 2.0,
+                 logger: logging.Logger = None):
+        self.root = Path(root)
+        self._scanner = ParallelDirScanner(supported_ext, logger=logger)
+        self._settle = settle_seconds
+        # 已交付（或启动时已存在）文件的签名
+        self._delivered: Dict[Path, Signature] = {}
+        self._pending: Dict[Path, _Pending] = {}
+        self.polls = 0
+        self.scan_seconds = 0.0
+        self.files = 0
+
+    def _snapshot(self) -> Dict[Path, Signature]:
+        start = time.perf_counter()
+        snapshot = {task.input_path: (task.size, task.mtime) for task in self._scanner.scan(self.root, self.root)}
+        self.scan_seconds += time.perf_counter() - start
+        self.polls += 1
+        self.files = len(snapshot)
+        return snapshot
+
+    def baseline(self, include_existing: bool = False):
+        """建立初始快照：include_existing 为 False 时已存在的文件视为已处理，只交付之后的新增/修改"""
+        snapshot = self._snapshot()
+        if include_existing:
+            now = time.time()
+            self._pending = {path: _Pending(signature, now, now) for path, signature in snapshot.items()}
+        else:
+            self._delivered = snapshot
+
+    def poll(self) -> List[ReadyFile]:
+        """轮询一次，返回本次判定写入完成的文件"""
+        snapshot = self._snapshot()
+        now = time.time()
+        ready = []
+        for path, signature in snapshot.items():
+            if self._delivered.get(path) == signature:
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending.signature != signature:
+                # 新出现或仍在变化：重新计时（空文件多为刚创建、尚未写入）
+                detected = pending.detected if pending else now
+                self._pending[path] = _Pending(signature, detected, now)
+                continue
+            if signature[0] > 0 and now - pending.changed >= self._settle:
+                ready.append(ReadyFile(path, signature[0], signature[1], pending.detected, now))
+                self._delivered[path] = signature
+                del self._pending[path]
+        # 已删除的文件不再跟踪
+        for path in self._pending.keys() - snapshot.keys():
+            del self._pending[path]
+        for path in self._delivered.keys() - snapshot.keys():
+            del self._delivered[path]
+        return ready
+
+    def forget(self, path: Path):
+        """撤销交付记录：下次轮询按新文件重新判定（交付时该文件仍在处理中，稍后再交）"""
+        self._delivered.pop(path, None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            'polls': self.polls,
+            'files': self.files,
+            'pending': len(self._pending),
+            'mean_scan_ms': self.scan_seconds / self.polls * 1000 if self.polls else 0.0,
+        }
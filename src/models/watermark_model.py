@@ -6,6 +6,11 @@ from typing import Iterable, Tuple
 
 from src.config import ModelParams
 from src.factory.processor_factory import ProcessorFactory
+from src.models.interfaces.fanout import FanOutBatch, FanOutVariant
+from src.models.interfaces.scheduler import JobScheduler
+from src.models.interfaces.service import WatermarkService
+from src.models.interfaces.watch import WatchFolder
+from src.models.pipeline.archive import is_archive_input
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +19,8 @@ class WatermarkModel:
     def __init__(self):
         self.config = None
         self.processor_factory = None
+        self._watch = None
+        self._scheduler = None
 
     def dependency_inject_after_init(self, model_config: ModelParams):
         self.config=model_config
@@ -31,7 +38,8 @@ class WatermarkModel:
     def process_normal_watermark(self, input_folder, output_folder,  **kwargs):
         processor = self.processor_factory.create_processor("normal")
         input_folder = Path(input_folder)
-        input_folder.mkdir(parents=True, exist_ok=True)
+        if not is_archive_input(input_folder):
+            input_folder.mkdir(parents=True, exist_ok=True)
         output_folder = Path(output_folder)
         return processor.process_batch(input_folder, output_folder, **kwargs)
 
@@ -39,10 +47,88 @@ class WatermarkModel:
         """根据类型处理文件"""
         processor = self.processor_factory.create_processor("foggy")
         input_folder = Path(input_folder)
-        input_folder.mkdir(parents=True, exist_ok=True)
+        if not is_archive_input(input_folder):
+            input_folder.mkdir(parents=True, exist_ok=True)
         output_folder = Path(output_folder)
         return processor.process_batch(input_folder, output_folder)
 
+    def process_fanout(self, input_folder, variants: Iterable[Tuple[str, dict, str]]):
+        """
+        多输出扇出：variants 为 (水印类型, 参数, 输出目录) 列表，每个输入只解码一次
+
+        返回各变体成功输出的路径列表（与 variants 顺序一致）
+        """
+        variants = [FanOutVariant(wm_type, dict(params or {}), Path(output_dir))
+                    for wm_type, params, output_dir in variants]
+        processors = {wm_type: self.processor_factory.create_processor(wm_type)
+                      for wm_type in dict.fromkeys(v.wm_type for v in variants)}
+        input_folder = Path(input_folder)
+        input_folder.mkdir(parents=True, exist_ok=True)
+        return FanOutBatch(processors).run(input_folder, variants)
+
+    def benchmark_encoders(self, wm_type, input_folder, limit=8):
+        """用输入目录中的样本测量该水印类型各编码档位的耗时与输出大小"""
+        processor = self.processor_factory.create_processor(wm_type)
+        return processor.benchmark_encoders(Path(input_folder), limit)
+
+    def benchmark_memory_api(self, wm_type, input_folder, limit=8):
+        """比较该水印类型单张处理的临时文件方式与内存接口（process_bytes / process_array）的耗时"""
+        processor = self.processor_factory.create_processor(wm_type)
+        return processor.benchmark_memory_api(Path(input_folder), limit)
+
+    @property
+    def scheduler(self) -> JobScheduler:
+        """多任务调度器（首次使用时创建，各任务共享工作线程池）"""
+        if self._scheduler is None:
+            self._scheduler = JobScheduler(self.processor_factory.create_processor)
+        return self._scheduler
+
+    def submit_job(self, wm_type, input_folder, output_folder, priority=0, name=None, **kwargs) -> int:
+        """提交批处理任务到调度队列，立即返回任务编号；priority 越大越先执行"""
+        return self.scheduler.submit(wm_type, Path(input_folder), Path(output_folder), priority, name, **kwargs)
+
+    def job_status(self, job_id=None):
+        """查询任务状态：给定编号返回该任务的 JobStatus，否则返回全部任务"""
+        return self.scheduler.status(job_id) if job_id is not None else self.scheduler.jobs()
+
+    def cancel_job(self, job_id) -> bool:
+        return self.scheduler.cancel(job_id)
+
+    def create_service(self, wm_types: Iterable[str] = None, warm_up: bool = True, **options) -> WatermarkService:
+        """
+        创建本地 HTTP 水印服务：wm_types 为提供的水印类型（默认配置中的全部类型），每种类型一个常驻处理器
+
+        options 透传给 WatermarkService（max_concurrency、queue_timeout、max_body_mb、path_root、idle_timeout）；
+        服务同时提供调度任务接口（/jobs），与界面共用同一个调度器
+        """
+        processors = {wm_type: self.processor_factory.create_processor(wm_type)
+                      for wm_type in (wm_types or self.config.watermark_types)}
+        service = WatermarkService(processors, scheduler=self.scheduler, **options)
+        if warm_up:
+            service.warm_up()
+        return service
+
+    def start_watch(self, wm_type, input_folder, output_folder, **kwargs) -> WatchFolder:
+        """
+        监视输入目录：新增/修改且写入完成的文件由常驻处理器自动处理（同一时间只监视一个目录）
+
+        kwargs 为处理参数；监视选项 interval、settle_seconds、process_existing、on_result 透传给 WatchFolder
+        """
+        self.stop_watch()
+        processor = self.processor_factory.create_processor(wm_type)
+        self._watch = WatchFolder(processor, Path(input_folder), Path(output_folder), **kwargs)
+        self._watch.start()
+        return self._watch
+
+    def stop_watch(self):
+        """停止监视并返回统计（未在监视时返回 None）"""
+        watch, self._watch = self._watch, None
+        return watch.stop() if watch else None
+
+    @property
+    def watching(self) -> bool:
+        return self._watch is not None
+
     # def _prepare_output_dir(self) -> Path:
     #     """创建输出目录（复用逻辑）"""
     #     output_dir = Path("output")
@@ -13,7 +13,10 @@ class MainPresenter(QObject):
         ('generate_triggered', 'handle_selection'),
         ('folder_selected', 'handle_folder_selection'),
         # ('toggle_topmost', 'toggle_window_topmost'),
-        ('menu_clicked', 'on_menu_click')
+        ('menu_clicked', 'on_menu_click'),
+        ('watch_toggled', 'toggle_watch'),
+        ('job_queued', 'queue_job'),
+        ('jobs_requested', 'show_jobs')
     ]
     _handler_map: Dict[str, Callable]
 
@@ -85,6 +88,49 @@ class MainPresenter(QObject):
         # 更新视图
         self.view.show_info(f"批量生成{len(result)}个降低品质图片")
 
+    def toggle_watch(self, enabled: bool):
+        """开启/关闭输入目录监视（使用当前选择的水印类型与参数）"""
+        try:
+            if not enabled:
+                stats = self.model.stop_watch()
+                if stats:
+                    self.view.show_info(f"已停止监视，共处理{stats['ok']}个图片（失败{stats['failed']}个）")
+                return
+            wm_type = self.view.get_selected_watermark_type()
+            params = self._collect_params(wm_type)
+            self.model.start_watch(
+                wm_type, self.view.get_input_folder_path(), self.view.get_output_folder_path(), **params
+            )
+            self.view.show_info("已开始监视输入文件夹，新放入的图片将自动添加水印")
+        except Exception as e:
+            logger.exception(e)
+            self.view.set_watch_checked(False)
+            self.view.show_error(f"监视启动失败: {str(e)}")
+
+    def queue_job(self, index, priority=0):
+        """把当前选择加入调度队列（不阻塞界面），可连续加入多个目录"""
+        wm_type = list(self.model.config.watermark_types)[index]
+        try:
+            job_id = self.model.submit_job(
+                wm_type, self.view.get_input_folder_path(), self.view.get_output_folder_path(), priority,
+                **self._collect_params(wm_type)
+            )
+            self.view.show_info(f"已加入任务队列，任务编号: {job_id}")
+        except Exception as e:
+            logger.exception(e)
+            self.view.show_error(f"{wm_type} 加入队列失败: {str(e)}")
+
+    def show_jobs(self):
+        jobs = self.model.job_status()
+        if not jobs:
+            self.view.show_info("任务队列为空")
+            return
+        self.view.show_info("\n".join(
+            f"#{job.id} {job.name} | {job.state} | {job.succeeded + job.failed}/{job.total} ({job.progress:.0%})"
+            f"{' | 失败 ' + str(job.failed) if job.failed else ''}"
+            for job in jobs
+        ))
+
     def handle_folder_selection(self):
         selected_path = self.view.show_folder_dialog("resources/input")
         if selected_path:
@@ -0,0 +1,50 @@
+"""
+本地 HTTP 水印服务入口（无界面常驻运行）
+
+    python -m src.serve --port 8765 --types normal foggy --max-concurrency 4 --path-root D:/照片
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from src.config import AppConfig
+from src.config_loader import ConfigLoader
+from src.models.watermark_model import WatermarkModel
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - [%(levelname)s] - %(message)s",
+    handlers=[
+        logging.FileHandler("service.log", encoding="utf-8"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 HTTP 水印服务")
+    parser.add_argument("--config", type=Path, default=Path(__file__).parent / "config.yaml", help="配置文件路径")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认仅本机）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--types", nargs="*", help="提供的水印类型（默认配置中的全部类型）")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="同时处理的请求数上限（默认 CPU 核数）")
+    parser.add_argument("--queue-timeout", type=float, default=30.0, help="排队等待超过该秒数返回 503")
+    parser.add_argument("--max-body-mb", type=int, default=200, help="请求体大小上限（MB）")
+    parser.add_argument("--path-root", type=Path, default=None, help="允许以 path 参数读取的本地目录（不设置则只接受上传）")
+    parser.add_argument("--no-warm-up", action="store_true", help="启动时不预热处理器")
+    args = parser.parse_args()
+
+    config = ConfigLoader.load_config(args.config, AppConfig)
+    model = WatermarkModel()
+    model.dependency_inject_after_init(config.model_params)
+    service = model.create_service(
+        args.types, warm_up=not args.no_warm_up, max_concurrency=args.max_concurrency,
+        queue_timeout=args.queue_timeout, max_body_mb=args.max_body_mb, path_root=args.path_root
+    )
+    logger.info(f"水印服务监听 http://{args.host}:{args.port}（Ctrl+C 退出）")
+    service.serve_forever(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
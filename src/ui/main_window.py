@@ -37,6 +37,9 @@ class MainWindow(IMainWindow):
     opacity_changed = Signal(int)
     generate_triggered = Signal(int)
     menu_clicked = Signal(str)
+    watch_toggled = Signal(bool)
+    job_queued = Signal(int)
+    jobs_requested = Signal()
     toggle_topmost = Signal(bool)
 
     def __init__(self):
@@ -171,6 +174,12 @@ class MainWindow(IMainWindow):
                 print(f"参数 {param_key} 获取错误: {str(e)}")
         return values
 
+    def get_selected_watermark_type(self):
+        return self.combo.currentData()
+
+    def set_watch_checked(self, checked):
+        self.watch_action.setChecked(checked)
+
     def get_watermark_params(self, wm_type):
         return {
             param: self.get_param_values(self.params_inputs[wm_type])[param]
@@ -195,6 +204,20 @@ class MainWindow(IMainWindow):
         file_action.triggered.connect(lambda: self.menu_clicked.emit("文件"))
         menu_bar.addAction(file_action)
 
+        # 监视输入文件夹（新放入的图片自动处理）
+        self.watch_action = QAction("监视输入文件夹", self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.triggered.connect(lambda checked: self.watch_toggled.emit(checked))
+        menu_bar.addAction(self.watch_action)
+
+        # 任务队列：当前选择加入调度队列 / 查看各任务进度
+        queue_action = QAction("加入任务队列", self)
+        queue_action.triggered.connect(lambda: self.job_queued.emit(self.combo.currentIndex()))
+        menu_bar.addAction(queue_action)
+        jobs_action = QAction("任务状态", self)
+        jobs_action.triggered.connect(lambda: self.jobs_requested.emit())
+        menu_bar.addAction(jobs_action)
+
         # # 窗口置顶
         # self.always_on_top_action = QAction("取消始终置顶", self)
         # self.always_on_top_action.setCheckable(True)